@@ -0,0 +1,399 @@
+__doc__ = \
+"""Contains micro-benchmarks for the parts of the clitools package that can
+be run without arcpy.  Each benchmark builds its own synthetic data in a
+temporary directory, so nothing in the CLI_GIS directory is touched.
+
+Run the module directly from the scripts directory to run all of them:
+
+python -m clitools.benchmarks
+"""
+
+import os
+import csv
+import time
+import random
+import shutil
+import tempfile
+import multiprocessing
+import xlrd
+import xlwt
+
+from .readers import CSVTableReader
+from .lookups import UnitLookupRegistry, region_dict
+from .crtables import ReconcileCRLinkRows, ApplyCRLinkUpdates
+from .validation import (
+    MandatoryFields,
+    CheckRowsForNulls,
+    CheckNullsInFeatureClass,
+    )
+
+def _Timed(func,*args):
+    '''Returns the result of func(*args) and the number of seconds it took.'''
+
+    t0 = time.time()
+    result = func(*args)
+    return result, time.time() - t0
+
+class ListCursor(object):
+    """Stands in for an arcpy.da update cursor on a list of row lists.
+    Iterating yields a copy of each row; updateRow() and deleteRow() act on
+    the row that was yielded last, and the result is left in self.rows."""
+
+    def __init__(self,rows):
+
+        self.rows = [list(r) for r in rows]
+
+    def __iter__(self):
+
+        source = self.rows
+        self.rows = []
+        for row in source:
+            self.rows.append(row)
+            yield list(row)
+
+    def updateRow(self,row):
+        self.rows[-1] = list(row)
+
+    def deleteRow(self):
+        self.rows.pop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        return False
+
+def WriteSyntheticUnitTable(csv_path,n_landscapes=10000,per_park=20):
+    '''Writes a csv copy of the UnitInfoLookup table with n_landscapes rows,
+    spread evenly across the regions, per_park landscapes to each park.'''
+
+    regions = sorted(region_dict.keys())
+    with open(csv_path,"wb") as f:
+        writer = csv.writer(f)
+        writer.writerow(UnitLookupRegistry.fields)
+        for i in xrange(n_landscapes):
+            park = i / per_park
+            alpha = "P{0:03d}".format(park)
+            region = regions[park % len(regions)]
+            writer.writerow([alpha,region,"Park {0}".format(park),
+                "{0:06d}".format(i),"Landscape {0}".format(i)])
+    return csv_path
+
+def _ScanParkLandscapes(lu,alpha):
+    '''The pre-index approach: scan every landscape to find a park's.'''
+
+    land_tuples = []
+    for cli_num in lu.cli_num_and_region_dict.keys():
+        if lu.cli_num_and_alpha_dict[cli_num] == alpha:
+            land_tuples.append((cli_num,lu.cli_num_and_name_dict[cli_num]))
+    land_tuples.sort(key=lambda tup: tup[0])
+    return land_tuples
+
+def _ScanRegionLandscapes(lu,region_code):
+    '''The pre-index approach: scan every park, then every landscape for
+    each park.'''
+
+    land_tuples = []
+    parks = [a for a in lu.alpha_and_region_dict.keys()
+        if lu.alpha_and_region_dict[a] == region_code]
+    for alpha in sorted(parks):
+        land_tuples += _ScanParkLandscapes(lu,alpha)
+    return land_tuples
+
+def BenchmarkUnitHierarchy(n_landscapes=10000):
+    '''Times the unit lookups against a synthetic UnitInfoLookup table:
+    building them from the table, loading them again from the snapshot, and
+    looking up the landscapes of every park and region with the hierarchy
+    index versus the old scan of every key.'''
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        csv_path = os.path.join(temp_dir,"UnitInfoLookup.csv")
+        WriteSyntheticUnitTable(csv_path,n_landscapes)
+
+        registry = UnitLookupRegistry(CSVTableReader(csv_path),temp_dir)
+        lu, cold = _Timed(registry.Get)
+        registry.Invalidate()
+        lu, warm = _Timed(registry.Get)
+
+        parks = sorted(lu.alpha_and_region_dict.keys())
+        regions = sorted(lu.region_parks.keys())
+
+        def indexed():
+            for alpha in parks:
+                list(lu.park_landscapes.get(alpha,[]))
+            for region_code in regions:
+                list(lu.region_landscapes.get(region_code,[]))
+
+        def scanned():
+            for alpha in parks:
+                _ScanParkLandscapes(lu,alpha)
+            for region_code in regions:
+                _ScanRegionLandscapes(lu,region_code)
+
+        for alpha in parks[:5]:
+            assert lu.park_landscapes[alpha] == _ScanParkLandscapes(lu,alpha)
+        for region_code in regions:
+            assert lu.region_landscapes[region_code] == \
+                _ScanRegionLandscapes(lu,region_code)
+
+        i_result, i_time = _Timed(indexed)
+        s_result, s_time = _Timed(scanned)
+
+        print "\nunit hierarchy: {0} landscapes, {1} parks, {2} regions".format(
+            len(lu.cli_num_and_name_dict),len(parks),len(regions))
+        print "  build from table:    {0:.4f} s".format(cold)
+        print "  load from snapshot:  {0:.4f} s".format(warm)
+        print "  indexed lookups:     {0:.4f} s".format(i_time)
+        print "  scanned lookups:     {0:.4f} s".format(s_time)
+
+        return {"build":cold,"snapshot":warm,"indexed":i_time,
+            "scanned":s_time}
+
+    finally:
+        shutil.rmtree(temp_dir,ignore_errors=True)
+
+def MakeSyntheticCRLinkRows(n_rows=50000,dup_rate=0.3,conflict_rate=0.01,
+                            seed=0):
+    '''Returns a list of CR Link rows in the layout of the full table
+    (OBJECTID,CR_ID,GEOM_ID,CLI_ID,LCS_ID,FMSS_ID), where roughly dup_rate
+    of the rows repeat an earlier CR_ID, and some of those repeats carry a
+    conflicting program id.'''
+
+    rand = random.Random(seed)
+    rows = []
+    for oid in xrange(1,n_rows+1):
+        if rows and rand.random() < dup_rate:
+            prev = rand.choice(rows)
+            row = [oid,prev[1],"{{G{0}}}".format(oid)] + prev[3:]
+            if rand.random() < conflict_rate / dup_rate:
+                row[4] = "LCS{0}".format(oid)
+            elif rand.random() < 0.5:
+                row[5] = None
+        else:
+            cr_id = "{{C{0}}}".format(oid)
+            row = [oid,cr_id,"{{G{0}}}".format(oid),"{0:06d}".format(oid),
+                "LCS{0}".format(oid),None]
+        rows.append(row)
+    return rows
+
+def BenchmarkCRLinkConsolidation(n_rows=50000):
+    '''Times the reconcile and update passes of ConsolidateCRLinkTable
+    against synthetic CR Link rows, using a ListCursor in place of the
+    arcpy cursors.'''
+
+    rows = MakeSyntheticCRLinkRows(n_rows)
+    id_fields = ("CR_ID","CLI_ID","LCS_ID","FMSS_ID")
+
+    (link_dict,conflicts), r_time = _Timed(ReconcileCRLinkRows,
+        [r[1:2] + r[3:] for r in rows],id_fields)
+
+    cursor = ListCursor(rows)
+    (removed,remain), u_time = _Timed(ApplyCRLinkUpdates,cursor,link_dict)
+    assert remain == len(link_dict) == len(cursor.rows)
+
+    print "\nCR Link consolidation: {0} rows, {1} unique CR_IDs, "\
+        "{2} conflicts".format(n_rows,len(link_dict),len(conflicts))
+    print "  reconcile:  {0:.4f} s ({1:,.0f} rows/sec)".format(
+        r_time,n_rows/max(r_time,1e-9))
+    print "  update:     {0:.4f} s ({1:,.0f} rows/sec), {2} removed".format(
+        u_time,n_rows/max(u_time,1e-9),removed)
+
+    return {"reconcile":r_time,"update":u_time}
+
+def WriteSyntheticStandardsGDB(dir_path,n_features=100000,null_rate=0.02,
+                               seed=0):
+    '''Writes csv copies of the attribute tables of a standards geodatabase,
+    one per feature class, with n_features spread across them.  About
+    null_rate of the mandatory values are left empty or filled with spaces.
+    Returns the list of csv paths.'''
+
+    rand = random.Random(seed)
+    names = ["{0}_{1}".format(t,g) for t in ["crbldg","crsite","crstru",
+        "crobj","crothr"] for g in ["pt","ln","py"]]
+    paths = []
+    for n,name in enumerate(names):
+        fields = MandatoryFields(name,check_guids=True)
+        csv_path = os.path.join(dir_path,name + ".csv")
+        with open(csv_path,"wb") as f:
+            writer = csv.writer(f)
+            writer.writerow(["OBJECTID"] + fields)
+            for oid in xrange(1,n_features/len(names)+1):
+                row = [oid]
+                for field in fields:
+                    r = rand.random()
+                    if r < null_rate / 2:
+                        row.append("")
+                    elif r < null_rate:
+                        row.append("  ")
+                    else:
+                        row.append("{0} {1}".format(field,oid))
+                writer.writerow(row)
+        paths.append(csv_path)
+    return paths
+
+def _CheckNullsPerField(rows,fields):
+    '''The old approach: look up each field by name on every row.'''
+
+    counts = dict((f,0) for f in fields)
+    for row in rows:
+        values = dict(zip(fields,row[1:]))
+        for field in fields:
+            val = values[field]
+            if val == None or val.encode('ascii','ignore').rstrip() == "":
+                counts[field] += 1
+    return counts
+
+def BenchmarkNullCheck(n_features=100000,processes=4):
+    '''Times the mandatory field null check against a synthetic standards
+    geodatabase.  The rows are read into memory first to compare the old
+    lookup of each field by name with the single pass that uses tuple
+    indexing, and then the full check (reading included) is timed with the
+    feature classes done in turn and in a pool of worker processes.'''
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        paths = WriteSyntheticStandardsGDB(temp_dir,n_features)
+        jobs = [(CSVTableReader(p),MandatoryFields(p,True),"OBJECTID")
+            for p in paths]
+        tables = [(list(r.ReadRows([o] + f)),f) for r,f,o in jobs]
+
+        def by_name():
+            return [_CheckNullsPerField(rows,f) for rows,f in tables]
+
+        def indexed():
+            return [CheckRowsForNulls(rows,f) for rows,f in tables]
+
+        def serial():
+            return [CheckNullsInFeatureClass(*j) for j in jobs]
+
+        def pooled():
+            pool = multiprocessing.Pool(processes)
+            try:
+                pending = [pool.apply_async(CheckNullsInFeatureClass,j)
+                    for j in jobs]
+                return [p.get() for p in pending]
+            finally:
+                pool.close()
+                pool.join()
+
+        n_result, n_time = _Timed(by_name)
+        i_result, i_time = _Timed(indexed)
+        s_result, s_time = _Timed(serial)
+        p_result, p_time = _Timed(pooled)
+
+        assert s_result == p_result
+        for counts,(ct,fields) in zip(n_result,i_result):
+            assert counts == dict((f,len(o)) for f,o in fields)
+
+        total = sum([r["count"] for r in s_result])
+        empty = sum([len(o) for r in s_result for f,o in r["fields"]])
+        print "\nnull check: {0} features in {1} feature classes, {2} empty "\
+            "values".format(total,len(paths),empty)
+        for label,t in [("by field name:",n_time),("tuple indexing:",i_time),
+                        ("full, serial:",s_time),
+                        ("full, {0} processes:".format(processes),p_time)]:
+            print "  {0}{1}{2:.4f} s ({3:,.0f} features/sec)".format(label,
+                (22-len(label))*" ",t,total/max(t,1e-9))
+
+        return {"by_name":n_time,"indexed":i_time,"serial":s_time,
+            "pooled":p_time}
+
+    finally:
+        shutil.rmtree(temp_dir,ignore_errors=True)
+
+## a few of the styles from clitools.summarize, which can't be imported here
+## because it needs arcpy
+BENCHMARK_STYLE_STRINGS = [
+    'font: name Calibri, height 220;'
+        'alignment: horizontal center, vertical center;',
+    'font: name Calibri, height 220;'
+        'alignment: horizontal left, vertical center;',
+    'font: name Calibri, height 240, bold true;'
+        'alignment: horizontal center, vertical center;'
+        'pattern: pattern solid, fore_color coral;',
+    'font: name Calibri, height 240, bold true;'
+        'alignment: horizontal center, vertical center;'
+        'pattern: pattern solid, fore_color lime;',
+    'font: name Calibri;'
+        'pattern: pattern solid, fore_color light_yellow',
+    ]
+
+def _WriteStyledCells(book,styles,n_cells,n_cols=10):
+    '''Writes n_cells text cells through Row.set_cell_text, cycling through
+    the styles, and returns the workbook's BIFF data.'''
+
+    sheet = book.add_sheet("cells")
+    n_styles = len(styles)
+    for rowx in xrange(n_cells / n_cols):
+        row = sheet.row(rowx)
+        for colx in xrange(n_cols):
+            row.set_cell_text(colx,"r{0}".format(rowx),
+                styles[(rowx + colx) % n_styles])
+    return book.get_biff_data()
+
+def BenchmarkStyledCells(n_cells=100000):
+    '''Times writing n_cells styled text cells to an xlwt workbook, with the
+    workbook's own style collection (with and without style compression)
+    and with a frozen style collection that is shared by all workbooks.'''
+
+    styles = [xlwt.easyxf(s) for s in BENCHMARK_STYLE_STRINGS]
+    shared = xlwt.StyleCollection(style_compression=2)
+    shared.freeze(styles)
+
+    plain, p_time = _Timed(_WriteStyledCells,xlwt.Workbook(),styles,n_cells)
+    compressed, c_time = _Timed(_WriteStyledCells,
+        xlwt.Workbook(style_compression=2),styles,n_cells)
+    frozen, f_time = _Timed(_WriteStyledCells,xlwt.Workbook(styles=shared),
+        styles,n_cells)
+
+    ## the shared collection writes the same records as a compressed one
+    assert frozen == compressed
+
+    print "\nstyled cells: {0} cells in {1} styles".format(n_cells,len(styles))
+    for label,t in [("own styles:",p_time),("own styles, compressed:",c_time),
+                    ("frozen, shared styles:",f_time)]:
+        print "  {0}{1}{2:.4f} s ({3:,.0f} cells/sec)".format(label,
+            (25-len(label))*" ",t,n_cells/max(t,1e-9))
+
+    return {"plain":p_time,"compressed":c_time,"frozen":f_time}
+
+def CheckFlushedSheetRoundTrip(n_rows=3000,flush_row_count=1000,
+                               n_cols=5):
+    '''Writes a sheet of n_rows rows with flush_row_count, so that the rows
+    are flushed to the temp file in several batches, and reads it back with
+    the streaming xlrd reader, which fails on any row out of order.  The
+    values must all come back in the right cells.'''
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir,"flushed.xls")
+        book = xlwt.Workbook(flush_row_count=flush_row_count)
+        sheet = book.add_sheet("rows")
+        for rowx in xrange(n_rows):
+            sheet.write(rowx,0,"r{0}".format(rowx))
+            for colx in xrange(1,n_cols):
+                sheet.write(rowx,colx,rowx*colx)
+        book.save(path)
+
+        bookrd = xlrd.open_workbook(path,on_demand=True)
+        n = 0
+        for rowx,row in enumerate(bookrd.iter_sheet_rows(0)):
+            assert row[0] == "r{0}".format(rowx)
+            assert list(row[1:]) == [rowx*colx for colx in xrange(1,n_cols)]
+            n+=1
+        assert n == n_rows
+    finally:
+        shutil.rmtree(temp_dir)
+
+    print "\nflushed sheet: {0} rows in batches of {1} read back in "\
+        "order".format(n_rows,flush_row_count)
+    return n
+
+if __name__ == "__main__":
+
+    CheckFlushedSheetRoundTrip()
+    BenchmarkUnitHierarchy()
+    BenchmarkCRLinkConsolidation()
+    BenchmarkNullCheck()
+    BenchmarkStyledCells()
@@ -0,0 +1,152 @@
+__doc__ = \
+"""Contains the checkpoint manifests that let an enterprise extract (see
+ExtractFromEnterpriseQuery and ExtractFromEnterpriseSelection in
+clitools.enterprise) pick up where a failed run left off.  Nothing in this
+module uses arcpy.
+
+The manifest is a json file written next to the output geodatabase.  It
+holds a hash of the input query and the row count of each stage (CR_Link,
+CR_Catalog, and each layer) that has been completed.  A run with
+resume=True looks in the output location for an unfinished manifest with
+the same query hash, reuses its geodatabase, and skips the stages that are
+already done.
+
+from clitools.checkpoints import ExtractManifest, HashQuery
+
+manifest = ExtractManifest("Ent500003_manifest.json",
+    HashQuery("500003",False),"Ent500003.gdb")
+manifest.Done("CR_Link",42)
+print manifest.IsDone("CR_Link"), manifest.Count("CR_Link")
+>> True 42
+"""
+
+import os
+import json
+import time
+import hashlib
+
+## increment this number whenever the content of a manifest changes, so
+## that old manifests are not resumed
+MANIFEST_VERSION = 1
+
+## the end of the name of every manifest file
+MANIFEST_SUFFIX = "_manifest.json"
+
+def HashQuery(*parts):
+    '''Returns a hash of everything that decides what an extract contains
+    (the query code or selection, and the output options).'''
+
+    text = json.dumps(parts,sort_keys=True)
+    return hashlib.md5(text).hexdigest()
+
+def ManifestPath(geodatabase):
+    '''Returns the path to the manifest for an output geodatabase, in the
+    same folder as the geodatabase.'''
+
+    return os.path.splitext(geodatabase)[0] + MANIFEST_SUFFIX
+
+class ExtractManifest(object):
+    """The completed stages of one extract.  Every change is saved to the
+    manifest file right away, so it is up to date if the extract fails."""
+
+    def __init__(self,path,query_hash,geodatabase,stages=None,
+                 finished=False):
+
+        self.path = path
+        self.query_hash = query_hash
+        self.geodatabase = geodatabase
+        self.stages = stages or {}
+        self.finished = finished
+
+    @classmethod
+    def Load(cls,path):
+        '''Returns the manifest stored in a file, or None if the file can't
+        be read or was written by a different manifest version.'''
+
+        try:
+            with open(path,"rb") as f:
+                info = json.load(f)
+        except (IOError,ValueError):
+            return None
+        if not info.get("version") == MANIFEST_VERSION:
+            return None
+        return cls(path,info["query_hash"],info["geodatabase"],
+            info["stages"],info["finished"])
+
+    def Save(self):
+        '''Writes the manifest to a temporary file first and then moves it
+        into place, so a half-written manifest is never read.'''
+
+        temp_path = self.path + ".tmp"
+        with open(temp_path,"wb") as f:
+            json.dump({"version":MANIFEST_VERSION,
+                "query_hash":self.query_hash,
+                "geodatabase":self.geodatabase,
+                "stages":self.stages,"finished":self.finished},f,indent=1)
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+        os.rename(temp_path,self.path)
+
+    def IsDone(self,stage):
+        '''Returns True if the stage has been completed.'''
+
+        return stage in self.stages
+
+    def Count(self,stage):
+        '''Returns the number of rows written by a completed stage.'''
+
+        return self.stages[stage]["count"]
+
+    def Done(self,stage,count):
+        '''Records a completed stage and the number of rows it wrote.'''
+
+        self.stages[stage] = {"count":count,
+            "time":time.strftime("%Y-%m-%d %H:%M:%S")}
+        self.Save()
+
+    def Finish(self):
+        '''Marks the whole extract as finished, so it is never resumed.'''
+
+        self.finished = True
+        self.Save()
+
+    def ResetTargets(self,stage_targets):
+        '''Takes a list of (stage,target path) tuples, where more than one
+        stage may write to the same target.  Any target that still has a
+        stage left to do may hold part of that stage's rows, so it has to
+        be emptied and all of its stages run again.  The completed stages
+        for those targets are forgotten, and the set of targets to empty is
+        returned.'''
+
+        targets = set([t for s,t in stage_targets if not self.IsDone(s)])
+        forget = [s for s,t in stage_targets if t in targets
+            and self.IsDone(s)]
+        for stage in forget:
+            del self.stages[stage]
+        if len(forget) > 0:
+            self.Save()
+        return targets
+
+def FindManifest(folder,query_hash):
+    '''Returns the most recently changed unfinished manifest in a folder
+    that was made with the same query hash and whose geodatabase still
+    exists, or None if there isn't one.'''
+
+    if not os.path.isdir(folder):
+        return None
+    found = []
+    for name in os.listdir(folder):
+        if not name.endswith(MANIFEST_SUFFIX):
+            continue
+        path = os.path.join(folder,name)
+        manifest = ExtractManifest.Load(path)
+        if manifest is None or manifest.finished:
+            continue
+        if not manifest.query_hash == query_hash:
+            continue
+        if not os.path.isdir(manifest.geodatabase):
+            continue
+        found.append((os.path.getmtime(path),path,manifest))
+    if len(found) == 0:
+        return None
+    return max(found)[2]
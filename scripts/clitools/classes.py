@@ -31,78 +31,32 @@ directory.
 their contents into the site-packages folder.
 """
 
-import arcpy
-from general import TakeOutTrash
 from .config import settings
 from paths import FeatureLookupTable
 from paths import UnitLookupTable
+from .readers import ArcpyTableReader
+from .lookups import UnitLookupRegistry, FeatureLookupRegistry, region_dict
 
+## the reference dictionaries are built from the UnitLookupTable the first
+## time they are needed, not when this module is imported.  a snapshot is
+## kept in the cache directory so later sessions can skip the table read.
+unit_lookups = UnitLookupRegistry(ArcpyTableReader(UnitLookupTable),
+    settings.get('cache') if settings else None)
 
-#small dictionary for region codes and names
-region_dict = {
-    "AKR":"Alaska Region",
-    "IMR":"Intermountain Region",
-    "MWR":"Midwest Region",
-    "NCR":"National Capital Region",
-    "NER":"Northeast Region",
-    "PWR":"Pacific West Region",
-    "SER":"Southeast Region"
-    }
-
-#create reference dictionaries from tables
-alpha_and_region_dict = {}
-alpha_and_name_dict = {}
-cli_num_and_alpha_dict = {}
-cli_num_and_region_dict = {}
-cli_num_and_name_dict = {}
-
-## new cursor operation (using arcpy.da.SearchCursor)
-fields = ["ALPHA_CODE","REGION_NAME","PARK_NAME","CLI_NUM","CLI_NAME"]
-sql_clause = (None,"ORDER BY ALPHA_CODE, CLI_NUM")
-
-## use try/except statements in case the sql_clause argument makes trouble
-try:
-    rows = arcpy.da.SearchCursor(UnitLookupTable,fields,sql_clause=sql_clause)
-except:
-    rows = arcpy.da.SearchCursor(UnitLookupTable,fields)
-
-for row in rows:
-    alpha = row[0]
-    region_code = row[1]
-    park_name = row[2]
-    cli_num = row[3]
-    cli_name = row[4].encode('ascii','ignore')
+## likewise, the FeatureLookupTable is read once into a columnar index that
+## serves the feature lists and dictionaries for every unit
+feature_lookups = FeatureLookupRegistry(ArcpyTableReader(FeatureLookupTable),
+    settings.get('cache') if settings else None)
 
-    try:
-        alpha_and_region_dict[alpha]
-    except KeyError:
-        alpha_and_region_dict[alpha] = region_code
-
-    try:
-        alpha_and_name_dict[alpha]
-    except KeyError:
-        alpha_and_name_dict[alpha] = park_name
-
-    try:
-        cli_num_and_alpha_dict[cli_num]
-    except KeyError:
-        cli_num_and_alpha_dict[cli_num] = alpha
-
-    try:
-        cli_num_and_region_dict[cli_num]
-    except KeyError:
-        cli_num_and_region_dict[cli_num] = region_code
-
-    try:
-        cli_num_and_name_dict[cli_num]
-    except KeyError:
-        cli_num_and_name_dict[cli_num] = cli_name
-
-del rows, row
+## memoized unit objects, keyed by the input code given to MakeUnit
+_unit_cache = {}
 
-print "regions: {}".format(len(region_dict))
-print "parks: {}".format(len(alpha_and_region_dict))
-print "landscapes: {}".format(len(cli_num_and_name_dict))
+def InvalidateLookups():
+    '''Forces the reference dictionaries to be rebuilt the next time they
+    are used.  Call this after the local lookup tables have been rewritten.'''
+    unit_lookups.Invalidate()
+    feature_lookups.Invalidate()
+    _unit_cache.clear()
 
 
 class Landscape(object):
@@ -124,87 +78,38 @@ class Landscape(object):
     def __init__(self,in_code):
 
         in_code = str(in_code)
+        lu = unit_lookups.Get()
 
-        if not in_code in cli_num_and_alpha_dict.keys():
+        if not in_code in lu.cli_num_and_alpha_dict:
             raise ValueError
         
         object.__setattr__(self, "type", "landscape")
         object.__setattr__(self, "code", in_code)
-        object.__setattr__(self, "name", cli_num_and_name_dict[in_code])
+        object.__setattr__(self, "name", lu.cli_num_and_name_dict[in_code])
 
-        a = cli_num_and_alpha_dict[in_code]
-        object.__setattr__(self, "park", (a,alpha_and_name_dict[a]))
-        r = cli_num_and_region_dict[in_code]
+        a = lu.cli_num_and_alpha_dict[in_code]
+        object.__setattr__(self, "park", (a,lu.alpha_and_name_dict[a]))
+        r = lu.cli_num_and_region_dict[in_code]
 
         object.__setattr__(self, "region", (r,region_dict[r]))
         object.__setattr__(self, "query", ('"CLI_NUM" = \'{0}\''.format(
             in_code)))
 
     def GetFeatureList(self):
-        '''This method creates a cursor on the master table using the query
-        for this landscape, and returns a list of CLI_IDs for all features 
-        in the landscape.  The list of CLI_IDs is ordered first by Landscape
-        Characteristic and then by Resource Name.'''
-
-        #table_query = '"CLI_NUM" = \'' + self.code + "'"
-        table_query = self.query
-
-        ## new cursor operation (using arcpy.da.SearchCursor)
-        feat_fields = [
-            "CLI_ID","REGION_NAME","ALPHA_CODE","LAND_CHAR","RESNAME"]
-        tv = "tv"
-        TakeOutTrash(tv)
-        arcpy.management.MakeTableView(FeatureLookupTable,tv,table_query)
-        if int(arcpy.management.GetCount(tv).getOutput(0)) == 0:
-            return []
-        sql = (None, "ORDER BY REGION_NAME,ALPHA_CODE,LAND_CHAR,RESNAME")
-        
-        ## use try/except statements in case the sql_clause argument makes trouble
-        try:
-            rows = arcpy.da.SearchCursor(tv,feat_fields,sql_clause=sql)
-            arcpy.AddMessage("~~feature list is sorted~~")
-        except:
-            rows = arcpy.da.SearchCursor(tv,feat_fields)
-            arcpy.AddMessage("~~feature list is not sorted~~")
-
-        f_sort_list = [row[0] for row in rows]
-        del rows, row
+        '''Returns a list of CLI_IDs for all features in the landscape.  The
+        list of CLI_IDs is ordered first by Landscape Characteristic and then
+        by Resource Name.'''
 
-        return f_sort_list
+        return feature_lookups.Get().FeatureList("CLI_NUM",self.code)
 
     def GetFeatureDict(self):
-        '''This method creates a cursor on the master table using the query
-        for this landscape, and returns a comprehensive dictionary of
-        feature info for all features.  The format of the output dictionary:
+        '''Returns a comprehensive dictionary of feature info for all
+        features in the landscape.  The format of the output dictionary:
 
         {CLI_ID:["RESNAME","CONTRIB_STATUS",
                 "LAND_CHAR","CLI_NUM","LCS_ID","HS_ID"]'''
 
-        #table_query = '"CLI_NUM" = \'' + self.code + "'"
-        table_query = self.query
-
-        ## new cursor operation (using arcpy.da.SearchCursor)
-        f_dict = {}
-        feat_fields = ["RESNAME","CONTRIB_STATUS","LAND_CHAR",
-            "CLI_NUM","LCS_ID","HS_ID","CLI_ID","REGION_NAME","ALPHA_CODE"]
-        for f in feat_fields:
-            if not f in [i.name for i in arcpy.ListFields(FeatureLookupTable)]:
-                print "error: " + f
-        sql = (None, "ORDER BY REGION_NAME,ALPHA_CODE,LAND_CHAR,RESNAME")
-
-        ## use try/except statements in case the sql_clause argument makes trouble
-        try:
-            rows = arcpy.da.SearchCursor(FeatureLookupTable,feat_fields,table_query,
-            sql_clause=sql)
-            arcpy.AddMessage("~~feature dictionary is sorted~~")
-        except:
-            rows = arcpy.da.SearchCursor(FeatureLookupTable,feat_fields,table_query)
-            arcpy.AddMessage("~~feature dictionary is not sorted~~")
-
-        for row in rows:
-            f_dict[row[6]] = [row[i] for i in range(6)]
-
-        return f_dict
+        return feature_lookups.Get().FeatureDict("CLI_NUM",self.code)
 
 class Park(object):
     """This object holds information about a park that relates to the
@@ -225,25 +130,35 @@ class Park(object):
     def __init__(self,in_code):
 
         in_code_up = in_code.upper()
-        if not in_code_up in alpha_and_region_dict.keys():
+        lu = unit_lookups.Get()
+        if not in_code_up in lu.alpha_and_region_dict:
             raise ValueError
 
         object.__setattr__(self, "type", "park")
         object.__setattr__(self, "code", in_code_up)
-        object.__setattr__(self, "name", alpha_and_name_dict[in_code_up])
+        object.__setattr__(self, "name", lu.alpha_and_name_dict[in_code_up])
 
-        ## make and sort list of tuples for landscapes
-        land_list = [i for i in cli_num_and_region_dict.keys()\
-                           if cli_num_and_alpha_dict[i] == in_code_up]
-        land_tuples = [(i,cli_num_and_name_dict[i]) for i in land_list]
-        land_tuples.sort(key=lambda tup: tup[0])
+        ## sorted list of tuples for landscapes, from the hierarchy index
+        land_tuples = list(lu.park_landscapes.get(in_code_up,[]))
         object.__setattr__(self, "landscapes", land_tuples)
 
-        r = alpha_and_region_dict[in_code_up]
+        r = lu.alpha_and_region_dict[in_code_up]
         object.__setattr__(self, "region", (r,region_dict[r]))
         object.__setattr__(self, "query", '"ALPHA_CODE" = \'{0}\''.format(
             in_code_up))
 
+    def GetFeatureList(self):
+        '''Returns a list of CLI_IDs for all features in all landscapes in
+        the park, ordered by Landscape Characteristic and Resource Name.'''
+
+        return feature_lookups.Get().FeatureList("ALPHA_CODE",self.code)
+
+    def GetFeatureDict(self):
+        '''Returns the feature dictionary (see Landscape.GetFeatureDict) for
+        all features in all landscapes in the park.'''
+
+        return feature_lookups.Get().FeatureDict("ALPHA_CODE",self.code)
+
 class Region(object):
     """ This object holds information about an NPS region pertaining to 
     the cultural landscapes and parks within it. The input for instantiation
@@ -264,8 +179,9 @@ class Region(object):
     def __init__(self,in_code):
 
         in_code_up = in_code.upper()
+        lu = unit_lookups.Get()
 
-        if not in_code_up in region_dict.keys():
+        if not in_code_up in region_dict:
             raise ValueError
 
         object.__setattr__(self, "type", "region")
@@ -275,36 +191,40 @@ class Region(object):
         ## this is a redundant property, but useful in some situations
         object.__setattr__(self, "region", (in_code,region_dict[in_code_up]))
 
-        ## make and sort list of tuples for parks
-        park_list = [i for i in alpha_and_region_dict.keys()\
-                           if alpha_and_region_dict[i] == in_code_up]
-        park_tuples = [(i,alpha_and_name_dict[i]) for i in park_list]
-        park_tuples.sort(key=lambda tup: tup[0])
+        ## sorted list of tuples for parks, from the hierarchy index
+        park_tuples = list(lu.region_parks.get(in_code_up,[]))
         object.__setattr__(self, "parks", park_tuples)
         object.__setattr__(self, "query", '"REGION_CODE" = \'{0}\''.format(
             in_code_up))
 
-        ## make and sort list of tuples for landscapes
-        land_list = []
-        park_list.sort()
-        for p in park_list:
-            p_unit = MakeUnit(p)
-            land_list+=[i[0] for i in p_unit.landscapes]
-        land_tuples = [(i,cli_num_and_name_dict[i]) for i in land_list if\
-                         i in cli_num_and_name_dict.keys()]
-        #land_tuples.sort(key=lambda tup: tup[0])
+        ## list of tuples for landscapes, ordered park by park
+        land_tuples = list(lu.region_landscapes.get(in_code_up,[]))
         object.__setattr__(self, "landscapes", land_tuples)
 
+    def GetFeatureList(self):
+        '''Returns a list of CLI_IDs for all features in the region, ordered
+        by park, Landscape Characteristic, and Resource Name.'''
+
+        return feature_lookups.Get().FeatureList("REGION_NAME",self.code)
+
+    def GetFeatureDict(self):
+        '''Returns the feature dictionary (see Landscape.GetFeatureDict) for
+        all features in the region.'''
+
+        return feature_lookups.Get().FeatureDict("REGION_NAME",self.code)
+
 def AllCLINumbers():
     '''This function returns a list of all the cli numbers that are in the
     master table'''
-    return cli_num_and_name_dict.keys()
+    lu = unit_lookups.Get()
+    return lu.cli_num_and_name_dict.keys()
 
 def AllGoodInputs():
     '''This function returns a list of all the valid alpha, landscape and 
     region codes, mainly used as a list to check input against if necessary'''
 
-    return cli_num_and_name_dict.keys() + alpha_and_name_dict.keys() + region_dict.keys()
+    lu = unit_lookups.Get()
+    return lu.cli_num_and_name_dict.keys() + lu.alpha_and_name_dict.keys() + region_dict.keys()
 
 def MakeUnit(user_input):
     '''This function will take any input code and attempt to make a landscape,
@@ -323,14 +243,20 @@ def MakeUnit(user_input):
     usage.'''
 
     try:
-        if len(str(user_input)) == 3:
-            return Region(str(user_input))
+        code = str(user_input)
 
-        elif len(str(user_input)) == 4:
-            return Park(str(user_input))
+        ## units are immutable, so the same object is handed out every time
+        if code in _unit_cache:
+            return _unit_cache[code]
 
-        elif len(str(user_input)) == 6:
-            return Landscape(str(user_input))
+        if len(code) == 3:
+            unit = Region(code)
+
+        elif len(code) == 4:
+            unit = Park(code)
+
+        elif len(code) == 6:
+            unit = Landscape(code)
         
         else:
             return False
@@ -338,3 +264,6 @@ def MakeUnit(user_input):
     except:
         return False
 
+    _unit_cache[code] = unit
+    return unit
+
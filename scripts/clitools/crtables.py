@@ -0,0 +1,292 @@
+__doc__ = \
+"""Contains the pure python parts of the CR Link and CR Catalog table
+operations in clitools.management.  Nothing in this module uses arcpy; the
+management functions open the cursors and pass them (or the rows from them)
+in here, which means the same code can be run against plain lists of rows.
+
+Any object that can be iterated for row lists and has updateRow() and
+deleteRow() methods can stand in for an arcpy.da.UpdateCursor.  See
+clitools.benchmarks.ListCursor for an example.
+"""
+
+def IsBlank(value):
+    '''Returns True for None and for strings that are empty or only contain
+    whitespace.'''
+
+    if value is None:
+        return True
+    if isinstance(value,basestring) and value.rstrip() == "":
+        return True
+    return False
+
+def ReconcileCRLinkRows(rows,id_fields):
+    '''Collapses CR Link rows down to one set of program ids per CR_ID, in a
+    single pass.  Each row must hold the CR_ID followed by the program ids,
+    in the same order as id_fields (whose first item is "CR_ID").
+
+    Returns a tuple of (link_dict,conflicts), where link_dict is
+    {CR_ID:[program ids]} and conflicts is a list of
+    (CR_ID,field name,new value,existing value,index) tuples, one for each
+    time two different non-empty values were found for the same program.
+    When there is a conflict the value from the later row is kept.'''
+
+    link_dict = {}
+    conflicts = []
+    n = len(id_fields) - 1
+
+    for row in rows:
+        cr_id = row[0]
+
+        ## skip empty cr_ids
+        if IsBlank(cr_id):
+            continue
+
+        new_ids = row[1:n+1]
+        old_ids = link_dict.get(cr_id)
+
+        ## if it's a new cr_id, add to dictionary with all program ids
+        if old_ids is None:
+            link_dict[cr_id] = list(new_ids)
+            continue
+
+        ## if it's already in the dictionary, compare program ids
+        for i in xrange(n):
+            x = new_ids[i]
+            y = old_ids[i]
+            if IsBlank(x):
+                x = None
+            if IsBlank(y):
+                y = None
+            if y is None:
+                old_ids[i] = x
+            elif x is None or x == y:
+                old_ids[i] = y
+            else:
+                conflicts.append((cr_id,id_fields[i+1],x,y,i))
+                old_ids[i] = x
+
+    return link_dict, conflicts
+
+def ConflictLines(conflicts,link_dict):
+    '''Returns one line of text for each unique conflict, in the order they
+    were found, indicating the value that was chosen.'''
+
+    lines = []
+    seen = set()
+    for c in conflicts:
+        line = "{0}: {1}, {2} or {3}? {4} chosen".format(
+            c[0],c[1],c[2],c[3],link_dict[c[0]][c[4]])
+        if not line in seen:
+            seen.add(line)
+            lines.append(line)
+    return lines
+
+def ConflictDefinitionQuery(conflicts):
+    '''Returns a definition query that selects all of the CR_IDs that have
+    conflicts.'''
+
+    cr_ids = sorted(set([c[0] for c in conflicts]))
+    return '"CR_ID" IN (\'{0}\')'.format("','".join(cr_ids))
+
+def ApplyCRLinkUpdates(cursor,link_dict,keep_cr_ids=None,cr_id_index=1,
+                       first_id_index=3):
+    '''Uses an update cursor on the full CR Link table to write the
+    consolidated program ids from link_dict, keeping only the first row
+    for each CR_ID.  Rows with an empty or unknown CR_ID are deleted, as
+    are rows whose CR_ID is not in keep_cr_ids (if it is provided).
+
+    Returns a tuple of (removed,remain) row counts.'''
+
+    covered = set()
+    removed = 0
+    remain = 0
+    for row in cursor:
+        cr_id = row[cr_id_index]
+        if keep_cr_ids is not None and not cr_id in keep_cr_ids:
+            cursor.deleteRow()
+            removed+=1
+            continue
+        if not cr_id in link_dict or cr_id in covered:
+            cursor.deleteRow()
+            removed+=1
+            continue
+        for i,v in enumerate(link_dict[cr_id]):
+            row[i+first_id_index] = v
+        covered.add(cr_id)
+        cursor.updateRow(row)
+        remain+=1
+
+    return removed, remain
+
+def DiffCRLink(existing_rows,fc_rows,id_fields,keep_cr_ids=None):
+    '''Computes the changes needed to bring the CR Link table in line with
+    the feature classes, giving the same result as appending all of the
+    feature class rows to the table and running ConsolidateCRLinkTable.
+
+    existing_rows holds (OBJECTID,CR_ID,program ids...) tuples from the
+    table, and fc_rows holds (CR_ID,program ids...) tuples from the feature
+    classes, with program ids in the same order as id_fields[1:].
+
+    Returns a dictionary with these keys:
+        "update"    {OBJECTID:[program ids]} for rows whose ids change
+        "delete"    set of OBJECTIDs for duplicate, empty, or unused rows
+        "insert"    list of CR_IDs that need a new row, in the order
+                    they were first found in fc_rows
+        "link_dict" the consolidated {CR_ID:[program ids]}
+        "conflicts" the conflicts, as returned by ReconcileCRLinkRows'''
+
+    fc_rows = list(fc_rows)
+    link_dict, conflicts = ReconcileCRLinkRows(
+        [r[1:] for r in existing_rows] + fc_rows,id_fields)
+
+    update = {}
+    delete = set()
+    covered = set()
+    for row in existing_rows:
+        oid, cr_id = row[0], row[1]
+        if keep_cr_ids is not None and not cr_id in keep_cr_ids:
+            delete.add(oid)
+            continue
+        if not cr_id in link_dict or cr_id in covered:
+            delete.add(oid)
+            continue
+        covered.add(cr_id)
+        if not list(row[2:]) == link_dict[cr_id]:
+            update[oid] = link_dict[cr_id]
+
+    insert = []
+    for row in fc_rows:
+        cr_id = row[0]
+        if cr_id in covered or not cr_id in link_dict:
+            continue
+        if keep_cr_ids is not None and not cr_id in keep_cr_ids:
+            continue
+        covered.add(cr_id)
+        insert.append(cr_id)
+
+    return {"update":update,"delete":delete,"insert":insert,
+        "link_dict":link_dict,"conflicts":conflicts}
+
+def DiffCatalog(catalog_info,existing_rows,key_index=2):
+    '''Computes the changes needed to bring the CR Catalog in line with
+    catalog_info, which is {GEOM_ID:(full catalog row)}.  existing_rows holds
+    (OBJECTID,full catalog row) tuples from the table, where the GEOM_ID is
+    at key_index in the catalog row.
+
+    Returns a dictionary with these keys:
+        "update"    {OBJECTID:(catalog row)} for rows that have changed
+        "delete"    set of OBJECTIDs whose GEOM_ID is not in catalog_info
+        "insert"    list of catalog rows for GEOM_IDs not in the table
+        "unchanged" count of rows that are already correct'''
+
+    update = {}
+    delete = set()
+    found = set()
+    unchanged = 0
+    for oid, row in existing_rows:
+        g_id = row[key_index]
+        new_row = catalog_info.get(g_id)
+        if new_row is None:
+            delete.add(oid)
+            continue
+        found.add(g_id)
+        if tuple(row) == tuple(new_row):
+            unchanged+=1
+        else:
+            update[oid] = tuple(new_row)
+
+    insert = [tuple(v) for k,v in catalog_info.iteritems() if not k in found]
+
+    return {"update":update,"delete":delete,"insert":insert,
+        "unchanged":unchanged}
+
+def ApplyRowChanges(cursor,update,delete,oid_index=0,first_index=1):
+    '''Applies the "update" and "delete" parts of a diff in a single pass
+    of an update cursor whose rows hold the OBJECTID at oid_index.  Updated
+    values are written starting at first_index.  Returns a tuple of
+    (updated,deleted) row counts.'''
+
+    updated = 0
+    deleted = 0
+    for row in cursor:
+        oid = row[oid_index]
+        if oid in delete:
+            cursor.deleteRow()
+            deleted+=1
+        elif oid in update:
+            for i,v in enumerate(update[oid]):
+                row[i+first_index] = v
+            cursor.updateRow(row)
+            updated+=1
+    return updated, deleted
+
+def MakeFeatureDict(cli_number,rows):
+    '''Makes the feature dictionary for one landscape from CLI Feature table
+    rows of (CLI_ID,RESNAME,CONTRIB_STATUS,LAND_CHAR), which should be in
+    LAND_CHAR, RESNAME order.  Returns a tuple of (order_cli_ids,feat_dict),
+    where feat_dict is {CLI_ID:[RESNAME,CONTRIB_STATUS,LAND_CHAR]} and
+    order_cli_ids lists the boundary (the CLI number) first, followed by
+    the other CLI_IDs in the order of the rows.  The boundary is added to
+    the dictionary if it is missing from the rows.'''
+
+    feat_dict = {}
+    order_cli_ids = [cli_number]
+    for cid,resname,contrib,land_char in rows:
+        if cid is None or cid in feat_dict:
+            continue
+        if not land_char == "Boundary":
+            order_cli_ids.append(cid)
+        feat_dict[cid] = [resname,contrib,land_char]
+
+    if not cli_number in feat_dict:
+        feat_dict[cli_number] = ["CLI Boundary for [...]","Not Applicable",
+            "Boundary"]
+    return order_cli_ids, feat_dict
+
+def JoinEnterpriseTables(landscapes,link_rows,catalog_rows):
+    '''Joins the CR Link and CR Catalog rows to the feature dictionaries of
+    any number of landscapes, in one pass through each set of rows.
+    landscapes is {CLI number:(order_cli_ids,feat_dict)} as returned by
+    MakeFeatureDict(), link_rows holds (CLI_ID,CR_ID) tuples, and
+    catalog_rows holds (CR_ID,RESOURCE_TYPE) tuples.
+
+    Each CLI_ID is joined to the first CR_ID that is linked to it, and each
+    CR_ID to the RESOURCE_TYPE of its first catalog row.  The RESOURCE_TYPE
+    is appended to the feature's list in feat_dict, so features that have
+    a spatial feature end up with four values.  Returns landscapes.'''
+
+    ## hash the CLI_IDs of every landscape, a CLI_ID may be in more than one
+    owners = {}
+    for cli_number,(order_cli_ids,feat_dict) in landscapes.iteritems():
+        for cid in order_cli_ids:
+            owners.setdefault(cid,[]).append(cli_number)
+
+    ## {CLI number:{CR_ID:CLI_ID}}, with one CR_ID per CLI_ID.  linked
+    ## counts the CR_IDs held by each CLI_ID, as a CR_ID that is linked to
+    ## a second CLI_ID is moved to the later one
+    links = dict((k,{}) for k in landscapes)
+    linked = dict((k,{}) for k in landscapes)
+    for cid,cr_id in link_rows:
+        if IsBlank(cr_id):
+            continue
+        for cli_number in owners.get(cid,[]):
+            held = linked[cli_number]
+            if held.get(cid,0) > 0:
+                continue
+            old_cid = links[cli_number].get(cr_id)
+            if old_cid is not None:
+                held[old_cid]-=1
+            links[cli_number][cr_id] = cid
+            held[cid] = held.get(cid,0) + 1
+
+    res_types = {}
+    for cr_id,res_type in catalog_rows:
+        if not cr_id in res_types:
+            res_types[cr_id] = res_type
+
+    for cli_number,cr_links in links.iteritems():
+        feat_dict = landscapes[cli_number][1]
+        for cr_id,cid in cr_links.iteritems():
+            if cr_id in res_types and len(feat_dict[cid]) == 3:
+                feat_dict[cid].append(res_types[cr_id])
+    return landscapes
@@ -37,16 +37,43 @@ import shutil
 import sys
 import traceback
 import time
+import itertools
 import xlrd
 import logging
 from .config import settings
+from .classes import InvalidateLookups
+from .lookups import DiffTables, SplitLookupRows, WriteSyncManifest
 
 from .general import (
     TakeOutTrash,
     MakePathList,
     GetParkTypeDictionary,
     FieldCalculateRegionCode,
-    StartLog
+    StartLog,
+    SelectByIDs,
+    ReadRowsByIDs,
+    ReportRate,
+    ReportLayerTimes,
+    MakeProcessPool,
+    RunJobs
+    )
+
+from .queries import (
+    ChunkValues,
+    MakeRangeQueries
+    )
+
+from .routing import (
+    CopyableFields,
+    MatchFields,
+    MatchDataSource
+    )
+
+from .checkpoints import (
+    ExtractManifest,
+    HashQuery,
+    ManifestPath,
+    FindManifest
     )
 
 from .paths import (
@@ -54,6 +81,7 @@ from .paths import (
     GDBstandard_link,
     GDBstandard_WGS84,
     NAD83prj,
+    BinDir,
     BinGDB,
     FeatureLookupTable,
     UnitLookupTable
@@ -155,6 +183,60 @@ def GetTableFieldsList(template_table):
         fields.append((f.name,f.length))
     return fields
 
+def CollectXLSRows(rows,value_fields):
+    """Reads the rows of a prepared CLI Feature Table workbook (after the
+    header row), with the columns used by ConvertFeatureXLSToGDBTable, into
+    dictionaries of FMSS info, feature values, and boundary values, keyed
+    by CLI_ID.  All values are cast as strings.  Returns a tuple of
+    (fmss_dict,f_table_dict,b_table_dict)."""
+
+    fmss_dict = {}
+    f_table_dict = {}
+    b_table_dict = {}
+    for row in rows:
+
+        cli_id_cell_val = str(row[0])
+        cli_id = cli_id_cell_val[:6].rstrip(".")
+
+        ## skip empty rows
+        if cli_id == "":
+            continue
+
+        fmss_type = row[2]
+        fmss_id = str(row[3]).split(".")[0]
+        if not fmss_id == "":
+            if not cli_id in fmss_dict:
+                fmss_dict[cli_id] = {"LOCATION":"","ASSET":""}
+            if fmss_type == "Asset":
+                fmss_dict[cli_id]["ASSET"] = fmss_id
+            elif fmss_type == "Location":
+                fmss_dict[cli_id]["LOCATION"] = fmss_id
+
+        val_dict = {}
+        for i, colname in enumerate(value_fields):
+            val = row[i+4]
+            try:
+                val2 = val.encode('ascii','ignore').rstrip()
+            except:
+                val2 = str(val).split(".")[0]
+            
+            val_dict[colname] = val2
+
+        ## add the list of values to the correct dictionary, based on
+        ## whether it is a feature or a boundary
+        land_char_cell_val = str(row[1])
+        if land_char_cell_val == "Boundary":
+            if cli_id in b_table_dict:
+                arcpy.AddWarning("CLI_NUM {0} encountered twice. Best "\
+            "practice is to remake the input XLS file following documentation.".format(cli_id))
+            b_table_dict[cli_id] = val_dict
+        else:
+            if cli_id in f_table_dict:
+                arcpy.AddWarning("CLI_ID {0} encountered twice. Best "\
+            "practice is to remake the input XLS file following documentation.".format(cli_id))
+            f_table_dict[cli_id] = val_dict
+    return fmss_dict, f_table_dict, b_table_dict
+
 def ConvertFeatureXLSToGDBTable(input_xls,retain_copy=False,update_local=False):
     """
     Takes an excel workbook that has been created using the "Updating
@@ -174,14 +256,16 @@ def ConvertFeatureXLSToGDBTable(input_xls,retain_copy=False,update_local=False):
         arcpy.AddMessage("\nInput MS Excel spreadsheet:")
         arcpy.AddMessage(input_xls)
 
-        ## create workbook object for input workbook.
-        bookrd = xlrd.open_workbook(input_xls, formatting_info=True)
-        sheet = bookrd.sheet_by_index(0)
-        
+        ## open the workbook without loading the sheet; its rows are streamed
+        ## from the file below, and only the columns that are used are kept.
+        ## the shared strings are only decoded for the cells in those columns.
+        bookrd = xlrd.open_workbook(input_xls, on_demand=True,
+            lazy_shared_strings=True)
+
         ## get field names from workbook (and their index number)
         xls_fields_dict = {}
-        for col_x in range(sheet.ncols):
-            colname = sheet.cell(0,col_x).value
+        header = bookrd.iter_sheet_rows(0).next()
+        for col_x, colname in enumerate(header):
             xls_fields_dict[colname] = col_x
 
         expected_fields = ['CLI_ID',
@@ -213,56 +297,40 @@ def ConvertFeatureXLSToGDBTable(input_xls,retain_copy=False,update_local=False):
         else:
             arcpy.AddMessage("  all good.")
         
-        ## read all the FMSS info into a dictionary for use later
-        fmss_dict = {}
-        for row in range(1,sheet.nrows):
-            cli_id_cell_val = str(sheet.cell(row,0).value)
-            cli_id = cli_id_cell_val[:6].rstrip(".")
-            fmss_type = sheet.cell(row,xls_fields_dict["Type of FMSS Record"]).value
-            fmss_id_raw = sheet.cell(row,xls_fields_dict["FMSS Record Number"]).value
-            fmss_id = str(fmss_id_raw).split(".")[0]
-            if fmss_id == "":
-                continue
-            if not cli_id in fmss_dict.keys():
-                fmss_dict[cli_id] = {"LOCATION":"","ASSET":""}
-            if fmss_type == "Asset":
-                fmss_dict[cli_id]["ASSET"] = fmss_id
-            elif fmss_type == "Location":
-                fmss_dict[cli_id]["LOCATION"] = fmss_id
-
-        ## read all information from table into dictionaries, one for features
-        ## and one for boundaries, cast all values as strings.
+        ## get the fields of the new table from the existing
+        ## CLIFeatureTable_CREnterprise in the BinGDB, and find the columns
+        ## in the workbook that will be needed to fill them
+        new_table_fields = GetTableFieldsList(os.path.join(BinGDB,"CLIFeatureTable_CREnterprise"))
+        table_field_names = [f[0] for f in new_table_fields] + ["ALPHA_CODE"]
+        value_fields = [f for f in xls_fields_dict.keys() if
+            xls_fields_dict[f] > 0 and f in table_field_names]
+        columns = [0,
+                   xls_fields_dict["LAND_CHAR"],
+                   xls_fields_dict["Type of FMSS Record"],
+                   xls_fields_dict["FMSS Record Number"],
+                   ] + [xls_fields_dict[f] for f in value_fields]
+
+        ## read the FMSS info and all other values from the table in a single
+        ## pass, into dictionaries, one for features and one for boundaries,
+        ## cast all values as strings.
         arcpy.AddMessage("\nCollecting all values from input table...")
-        f_table_dict = {}
-        b_table_dict = {}
-        for row in range(1,sheet.nrows):
-            
-            cli_id_cell_val = str(sheet.cell(row,0).value)
-            cli_id = cli_id_cell_val[:6].rstrip(".")
-            val_dict = {}
-            for i in range(1,sheet.ncols):
-                colname = sheet.cell(0,i).value
-                val = sheet.cell(row,i).value
-                try:
-                    val2 = val.encode('ascii','ignore').rstrip()
-                except:
-                    val2 = str(val).split(".")[0]
-                
-                val_dict[colname] = val2
-
-            ## add the list of values to the correct dictionary, based on
-            ## whether it is a feature or a boundary
-            land_char_cell_val = str(sheet.cell(row,xls_fields_dict["LAND_CHAR"]).value)
-            if land_char_cell_val == "Boundary":
-                if cli_id in b_table_dict.keys():
-                    arcpy.AddWarning("CLI_NUM {0} encountered twice. Best "\
-                "practice is to remake the input XLS file following documentation.")
-                b_table_dict[cli_id] = val_dict
-            else:
-                if cli_id in f_table_dict.keys():
-                    arcpy.AddWarning("CLI_ID {0} encountered twice. Best "\
-                "practice is to remake the input XLS file following documentation.")
-                f_table_dict[cli_id] = val_dict
+        rows = bookrd.iter_sheet_rows(0,columns)
+        rows.next()
+        try:
+            fmss_dict, f_table_dict, b_table_dict = CollectXLSRows(rows,
+                value_fields)
+        except xlrd.XLRDRowOrderError:
+            ## rows can only be streamed if their cells are stored in row
+            ## order, which not every program that writes xls files does.
+            ## load the whole sheet and read it again.
+            arcpy.AddMessage("  rows are stored out of order, loading the "\
+                "whole sheet instead...")
+            bookrd.sheet_by_index(0)
+            rows = bookrd.iter_sheet_rows(0,columns)
+            rows.next()
+            fmss_dict, f_table_dict, b_table_dict = CollectXLSRows(rows,
+                value_fields)
+        bookrd.release_resources()
         arcpy.AddMessage("  all values collected.")
 
         arcpy.AddMessage("\nWriting all data to new CLI Feature Table...")
@@ -272,7 +340,6 @@ def ConvertFeatureXLSToGDBTable(input_xls,retain_copy=False,update_local=False):
 
         ## add all fields to the new table based on the existing CLIFeatureTable_CREnterprise
         ## in the BinGDB
-        new_table_fields = GetTableFieldsList(os.path.join(BinGDB,"CLIFeatureTable_CREnterprise"))
         for f in new_table_fields:
             arcpy.management.AddField(new_table,f[0],"TEXT",
                 field_length=f[1])
@@ -361,12 +428,63 @@ def ConvertFeatureXLSToGDBTable(input_xls,retain_copy=False,update_local=False):
         arcpy.AddMessage(pymsg)
         arcpy.AddMessage(arcpy.GetMessages(1))
 
+def StartExtractGDB(output_location,new_gdb,blank_gdb,query_hash,
+    resume=False):
+    """Returns a tuple of (geodatabase path,ExtractManifest) for an
+    enterprise extract.  If resume is True and the output location holds an
+    unfinished extract of the same query, its geodatabase and manifest are
+    returned.  Otherwise, the blank geodatabase is copied to the new_gdb
+    path (without the .gdb extension), and a new manifest is started."""
+
+    if resume:
+        manifest = FindManifest(output_location,query_hash)
+        if manifest:
+            n = len(manifest.stages)
+            arcpy.AddMessage("\nResuming extract, {0} stage{1} already "\
+                "completed".format(n,'' if n == 1 else 's'))
+            return manifest.geodatabase, manifest
+        arcpy.AddMessage("\nNo unfinished extract found to resume")
+
+    ## if gdb already exists, add integer to end of new name
+    new_name = new_gdb
+    r = 1
+    while os.path.isdir(new_name+ ".gdb"):
+        new_name = new_gdb+"_"+str(r)
+        r+=1
+
+    ## copy template over to new geodatabase
+    new_gdb = new_name + ".gdb"
+    os.makedirs(new_gdb)
+    for f in os.listdir(blank_gdb):
+        if not f.endswith(".lock"):
+            shutil.copy2(os.path.join(blank_gdb,f), new_gdb)
+
+    manifest = ExtractManifest(ManifestPath(new_gdb),query_hash,new_gdb)
+    manifest.Save()
+    return new_gdb, manifest
+
+def ClearPartialRows(table):
+    """Deletes any rows left in an output table by a stage that did not
+    finish, before the stage is run again on resume."""
+
+    ct = int(arcpy.management.GetCount(table).getOutput(0))
+    if ct > 0:
+        arcpy.AddMessage("    removing {0} row{1} left in {2} by the "\
+            "failed run".format(ct,'' if ct == 1 else 's',
+            os.path.basename(table)))
+        arcpy.management.DeleteRows(table)
+
 def ExtractFromEnterpriseSelection(map_document,output_location,
-    only_cr_link=False,transform=False,trans_type='NAD_1983_To_WGS_1984_1'):
+    only_cr_link=False,transform=False,trans_type='NAD_1983_To_WGS_1984_1',
+    resume=False):
     """This function must be used from the CR Enterprise Access map
     document.  Any currently selected features are downloaded to a new
     geodatabase.  The user can chose to only download the CR Link table
-    records for all selected features."""
+    records for all selected features.
+
+    The completed stages are recorded in a manifest next to the new
+    geodatabase.  With resume=True, the last unfinished extract of the same
+    selection in the output location is picked up where it stopped."""
 
     try:
         InspectMXD(map_document)
@@ -378,33 +496,36 @@ def ExtractFromEnterpriseSelection(map_document,output_location,
             cr_link_table = tables[1]
             cr_catalog = tables[2]
 
+        ## get the selected features in each layer up front, they are
+        ## part of the query hash for the manifest
+        selections = {}
+        for layer in arcpy.mapping.ListLayers(map_document):
+            if not layer.supports("DATASOURCE"):
+                continue
+            try:
+                selections[layer.name] = arcpy.Describe(layer).FIDSet
+            except:
+                selections[layer.name] = ""
+        query_hash = HashQuery(sorted(selections.items()),only_cr_link,
+            transform,trans_type)
+
         ## make new gdb to hold extract
         if only_cr_link:
             blank_gdb = GDBstandard_link
             new_gdb = os.path.join(output_location,time.strftime(
-                "EntSelect_CRLink_%Y%b%d_%H%M".format(query_code)))
+                "EntSelect_CRLink_%Y%b%d_%H%M"))
         elif not transform:
             blank_gdb = GDBstandard_WGS84
             new_gdb = os.path.join(output_location,time.strftime(
-                "EntSelect_Spatial_%Y%b%d_%H%M".format(query_code)))
+                "EntSelect_Spatial_%Y%b%d_%H%M"))
         else:
             blank_gdb = GDBstandard
             new_gdb = os.path.join(output_location,time.strftime(
-                "EntSelect_Spatial_%Y%b%d_%H%M_NAD83".format(query_code)))
+                "EntSelect_Spatial_%Y%b%d_%H%M_NAD83"))
         
-        ## if gdb already exists, add integer to end of new name
-        new_name = new_gdb
-        r = 1
-        while os.path.isdir(new_name+ ".gdb"):
-            new_name = new_gdb+"_"+str(r)
-            r+=1
-
-        ## copy template over to new geodatabase
-        new_gdb = new_name + ".gdb"
-        os.makedirs(new_gdb)
-        for f in os.listdir(blank_gdb):
-            if not f.endswith(".lock"):
-                shutil.copy2(os.path.join(blank_gdb,f), new_gdb)
+        ## make the new gdb, or find the one to resume
+        new_gdb, manifest = StartExtractGDB(output_location,new_gdb,
+            blank_gdb,query_hash,resume)
 
         arcpy.AddMessage("\nOutput Geodatabase:\n{0}\n".format(new_gdb))
         dest_paths = MakePathList(new_gdb)
@@ -417,6 +538,22 @@ def ExtractFromEnterpriseSelection(map_document,output_location,
         ## make path list for all potential destination feature classes in new gdb
         dest_paths = MakePathList(new_gdb,True)
 
+        ## a feature class that is still waiting on any of its layers is
+        ## emptied, and all of the layers that go into it are appended again
+        if not only_cr_link:
+            dest_map = dict((os.path.basename(p).lower(),p)
+                for p in dest_paths)
+            stage_targets = []
+            for layer in arcpy.mapping.ListLayers(map_document):
+                if not selections.get(layer.name):
+                    continue
+                dest_name = MatchDataSource(layer.dataSource,dest_map)
+                if dest_name:
+                    stage_targets.append(("layer:"+layer.name,
+                        dest_map[dest_name]))
+            for target in manifest.ResetTargets(stage_targets):
+                ClearPartialRows(target)
+
         ## iterate through layers and export any selected features
         copy = r"in_memory\copy"
         cr_ids_in_fcs = []
@@ -438,12 +575,7 @@ def ExtractFromEnterpriseSelection(map_document,output_location,
             arcpy.AddMessage(layer)
 
             ## skip if there's no selection on feature class
-            desc = arcpy.Describe(layer)
-            selection = []
-            try:
-                selection = desc.FIDSet
-            except:
-                selection = []
+            selection = selections.get(layer.name,"")
             if len(selection) == 0:
                 arcpy.AddMessage("    ...no features")
                 continue
@@ -480,6 +612,14 @@ def ExtractFromEnterpriseSelection(map_document,output_location,
                     cnt, '' if cnt == 1 else "s"))
                 continue
 
+            ## skip features that were appended before the last run failed
+            if manifest.IsDone("layer:"+layer.name):
+                ct = manifest.Count("layer:"+layer.name)
+                arcpy.AddMessage("    {0} feature{1} already exported".format(
+                    ct, '' if ct == 1 else "s"))
+                total_feat+=ct
+                continue
+
             ## print count of features
             ct = int(arcpy.management.GetCount(layer).getOutput(0))
             arcpy.AddMessage("    {0} spatial feature{1} selected".format(
@@ -508,6 +648,7 @@ def ExtractFromEnterpriseSelection(map_document,output_location,
                 '' if ct == 1 else "s",os.path.basename(dpath)))
                 
             total_feat+=ct
+            manifest.Done("layer:"+layer.name,ct)
 
             ss = time.time()-a
             sss = str(ss).split(".")[0]
@@ -533,23 +674,36 @@ def ExtractFromEnterpriseSelection(map_document,output_location,
 
         ## append Link table to new gdb table
         new_cr_link = os.path.join(new_gdb,"CR_Link")
-        arcpy.management.Append(cr_link_table,new_cr_link,"NO_TEST")
-        arcpy.AddMessage("    {0} row{1} exported".format(len(cr_ids_in_fcs),
-            "" if len(cr_ids_in_fcs) == 1 else "s"))
+        if manifest.IsDone("CR_Link"):
+            arcpy.AddMessage("    {0} row{1} already exported".format(
+                len(cr_ids_in_fcs),"" if len(cr_ids_in_fcs) == 1 else "s"))
+        else:
+            ClearPartialRows(new_cr_link)
+            arcpy.management.Append(cr_link_table,new_cr_link,"NO_TEST")
+            arcpy.AddMessage("    {0} row{1} exported".format(len(cr_ids_in_fcs),
+                "" if len(cr_ids_in_fcs) == 1 else "s"))
+            manifest.Done("CR_Link",len(cr_ids_in_fcs))
 
         ## append Catalog table to new gdb table
         if not only_cr_link:
             arcpy.AddMessage("\nCR Catalog")
             new_cr_catalog = os.path.join(new_gdb,"CR_Catalog")
 
-            geom_id_qry = '"GEOM_ID" IN (\'{0}\')'.format(
-                "','".join(geom_ids_in_fcs))
-            arcpy.management.SelectLayerByAttribute(
-                cr_catalog,"NEW_SELECTION",geom_id_qry)
-            arcpy.management.Append(cr_catalog,new_cr_catalog,"NO_TEST")
-            ct = int(arcpy.management.GetCount(new_cr_catalog).getOutput(0))
-            arcpy.AddMessage("    {0} row{1} exported".format(ct,
-                "" if ct == 1 else "s"))
+            if manifest.IsDone("CR_Catalog"):
+                ct = manifest.Count("CR_Catalog")
+                arcpy.AddMessage("    {0} row{1} already exported".format(ct,
+                    "" if ct == 1 else "s"))
+            else:
+                ClearPartialRows(new_cr_catalog)
+                geom_id_qry = '"GEOM_ID" IN (\'{0}\')'.format(
+                    "','".join(geom_ids_in_fcs))
+                arcpy.management.SelectLayerByAttribute(
+                    cr_catalog,"NEW_SELECTION",geom_id_qry)
+                arcpy.management.Append(cr_catalog,new_cr_catalog,"NO_TEST")
+                ct = int(arcpy.management.GetCount(new_cr_catalog).getOutput(0))
+                arcpy.AddMessage("    {0} row{1} exported".format(ct,
+                    "" if ct == 1 else "s"))
+                manifest.Done("CR_Catalog",ct)
 
         ## print statement
         arcpy.AddMessage("\n---POPULATING CLI FIELDS IN EXPORTED DATA---")
@@ -594,6 +748,7 @@ def ExtractFromEnterpriseSelection(map_document,output_location,
 
         ## finish function if only the cr link table is needed
         if only_cr_link:
+            manifest.Finish()
             arcpy.AddMessage("\nexport complete\n")
             return
 
@@ -620,6 +775,7 @@ def ExtractFromEnterpriseSelection(map_document,output_location,
                     row[6] = cinfo[3]
                     cursor.updateRow(row)
 
+        manifest.Finish()
         arcpy.AddMessage("\nexport complete\n")
         return
     
@@ -636,12 +792,93 @@ def ExtractFromEnterpriseSelection(map_document,output_location,
         arcpy.AddError(pymsg)
         arcpy.AddError(arcpy.GetMessages(1))    
 
+def ReadEnterpriseLayer(source,fields,cr_ids,cr_id_qry,definition_query,
+    out_sr,transformation=None):
+    """Reads the features for one layer of the CR Enterprise map document
+    (or one part of a layer, see SplitEnterpriseLayer) from its data source, with the geometry as WKB, projected to the
+    spatial reference string out_sr (using the geographic transformation if
+    one is given).  If cr_id_qry is None, the features are read by the list
+    of cr_ids instead.  This runs in the worker processes of
+    ExtractFromEnterpriseQuery, so it only takes paths, strings, and lists.
+    Returns a tuple of (rows,seconds)."""
+
+    a = time.time()
+    sr = arcpy.SpatialReference()
+    sr.loadFromString(out_sr)
+    fields = list(fields)+["SHAPE@WKB"]
+    old_trans = arcpy.env.geographicTransformations
+    if transformation:
+        arcpy.env.geographicTransformations = transformation
+    try:
+        if cr_id_qry is None:
+            rows = ReadRowsByIDs(source,fields,"CR_ID",cr_ids,
+                definition_query,spatial_reference=sr)
+        else:
+            qry = cr_id_qry
+            if definition_query:
+                qry = "({0}) AND ({1})".format(cr_id_qry,definition_query)
+            with arcpy.da.SearchCursor(source,fields,qry,sr) as cursor:
+                rows = [tuple(row) for row in cursor]
+    finally:
+        arcpy.env.geographicTransformations = old_trans
+    return rows, time.time()-a
+
+## the most features (or CR_IDs) that are read from a layer in one job, so
+## that no job's rows have to be held in memory all at once
+MAX_FEATURES_PER_READ = 5000
+
+def SplitEnterpriseLayer(source,fields,cr_ids,cr_id_qry,definition_query,
+    out_sr,transformation=None):
+    """Splits the read for one layer (the arguments of ReadEnterpriseLayer)
+    into a list of argument tuples that each read no more than
+    MAX_FEATURES_PER_READ features.  A read by cr_ids is split into chunks
+    of the list.  A read by query is split into OBJECTID ranges, from a
+    first pass over the OBJECTIDs that match the query.  There is always at
+    least one part."""
+
+    if cr_id_qry is None:
+        parts = [(source,fields,ids,None,definition_query,out_sr,
+            transformation) for ids in ChunkValues(cr_ids,
+            MAX_FEATURES_PER_READ)]
+    else:
+        qry = cr_id_qry
+        if definition_query:
+            qry = "({0}) AND ({1})".format(cr_id_qry,definition_query)
+        with arcpy.da.SearchCursor(source,["OID@"],qry) as cursor:
+            oids = [row[0] for row in cursor]
+        oid_field = arcpy.Describe(source).OIDFieldName
+        parts = [(source,fields,cr_ids,"({0}) AND ({1})".format(rng,
+            cr_id_qry),definition_query,out_sr,transformation)
+            for rng in MakeRangeQueries(oid_field,oids,MAX_FEATURES_PER_READ)]
+    if len(parts) <= 1:
+        return [(source,fields,cr_ids,cr_id_qry,definition_query,out_sr,
+            transformation)]
+    return parts
+
+def EnterpriseReadJobs(jobs):
+    """Yields a (layer number,arguments) tuple for each part of each layer
+    job of ExtractFromEnterpriseQuery, in layer order.  The layers are only
+    split as the parts are needed."""
+
+    for n,(name,dpath,fields,job) in enumerate(jobs):
+        for part in SplitEnterpriseLayer(*job):
+            yield n, part
+
 def ExtractFromEnterpriseQuery(map_document,query_code,output_location,
-    only_cr_link=False,transform=False,trans_type="NAD_1983_To_WGS_1984_1"):
+    only_cr_link=False,transform=False,trans_type="NAD_1983_To_WGS_1984_1",
+    processes=1,resume=False):
     """This function must be used from the CR Enterprise Access map
     document.  It will take the input query code and extract all data that
     matches it from each layer in the table of contents.  The user may only
-    download the CR Link table for these records, if desired."""
+    download the CR Link table for these records, if desired.
+
+    The layers are read from the enterprise database in parts by a pool of
+    the given number of worker processes, while the parts that have already
+    been read are written to the new geodatabase here, in layer order.
+
+    The completed stages are recorded in a manifest next to the new
+    geodatabase.  With resume=True, the last unfinished extract of the same
+    query in the output location is picked up where it stopped."""
 
     try:
         log = StartLog(name='ExtractFromEnterpriseQuery')
@@ -697,21 +934,12 @@ def ExtractFromEnterpriseQuery(map_document,query_code,output_location,
             new_gdb = os.path.join(output_location,time.strftime(
                 "Ent{0}_Spatial_%Y%b%d_%H%M_NAD83".format(query_code)))
         
-        ## if gdb already exists, add integer to end of new name
-        new_name = new_gdb
-        r = 1
-        while os.path.isdir(new_name+ ".gdb"):
-            new_name = new_gdb+"_"+str(r)
-            r+=1
-            
-        ## copy template over to new geodatabase
-        new_gdb = new_name + ".gdb"
-        os.makedirs(new_gdb)
-        for f in os.listdir(blank_gdb):
-            if not f.endswith(".lock"):
-                shutil.copy2(os.path.join(blank_gdb,f), new_gdb)
+        ## make the new gdb, or find the one to resume
+        query_hash = HashQuery(query_code,only_cr_link,transform,trans_type)
+        new_gdb, manifest = StartExtractGDB(output_location,new_gdb,
+            blank_gdb,query_hash,resume)
                 
-        log.debug("blank output gdb created: "+new_gdb)
+        log.debug("output gdb: "+new_gdb)
         arcpy.AddMessage("\nOutput Geodatabase:\n{0}".format(new_gdb))
 
         ## make path list for all potential destination feature classes in new gdb
@@ -733,7 +961,7 @@ def ExtractFromEnterpriseQuery(map_document,query_code,output_location,
         log.debug("cursor fields: "+",".join(fields))
         with arcpy.da.SearchCursor(cli_table,fields) as cursor:
             for row in cursor:
-                if not row[0] in id_dict.keys():
+                if not row[0] in id_dict:
                     id_dict[row[0]] = [row[i] for i in range(1,len(fields))]
                 else:
                     arcpy.AddWarning("    {0}, this CLI_ID occurs TWICE "\
@@ -741,6 +969,7 @@ def ExtractFromEnterpriseQuery(map_document,query_code,output_location,
 
         ## make list from dictionary keys
         id_list = id_dict.keys()
+        id_set = set(id_list)
         n = len(id_list)
         arcpy.AddMessage("    {0} CLI_ID{1} found".format(
             n,'' if n == 1 else 's'))
@@ -752,38 +981,46 @@ def ExtractFromEnterpriseQuery(map_document,query_code,output_location,
         ## download CR Link table new gdb table
         arcpy.AddMessage("CR Link")
         new_cr_link = os.path.join(new_gdb,"CR_Link")
-        cli_id_qry = '"CLI_ID" IN (\'{0}\')'.format("','".join(id_list))
-        log.debug("cli_id_qry: "+cli_id_qry)
-        log.debug(len(cli_id_qry))
-        log.debug("selecting from the cr link table based on cli_id_query")
-        arcpy.management.SelectLayerByAttribute(cr_link_table,"NEW_SELECTION",
-            cli_id_qry)
-        log.debug("selection made. appending cr_link_table to new_cr_link table.")
-        arcpy.management.Append(cr_link_table,new_cr_link,"NO_TEST")
-        log.debug("append completed")
-        ct = int(arcpy.management.GetCount(new_cr_link).getOutput(0))
-        arcpy.AddMessage("    {0} row{1} exported".format(ct,
-            "" if ct == 1 else "s"))
-        log.debug("append completed")
-        log.debug("fields in new CR Link table:")
-        for field in arcpy.ListFields(new_cr_link):
-            log.debug(field.name)
 
-        ## add CLI information to records in CR Link with CLI_ID
-        arcpy.AddMessage("    writing CLI_NUM and LAND_CHAR values to CR Link")
-        fields = ["CLI_ID","CLI_NUM","LAND_CHAR","RESNAME"]
-        with arcpy.da.UpdateCursor(new_cr_link,fields) as cursor:
-            for row in cursor:
-                cid = row[0]
+        ## the selection is made even if CR Link is already exported, since
+        ## the CR_IDs are read from it below
+        log.debug("selecting from the cr link table based on {0} "\
+            "cli_ids".format(len(id_list)))
+        SelectByIDs(cr_link_table,"CLI_ID",id_list)
+        if manifest.IsDone("CR_Link"):
+            ct = manifest.Count("CR_Link")
+            arcpy.AddMessage("    {0} row{1} already exported".format(ct,
+                "" if ct == 1 else "s"))
+        else:
+            ClearPartialRows(new_cr_link)
+            log.debug("selection made. appending cr_link_table to new_cr_link table.")
+            arcpy.management.Append(cr_link_table,new_cr_link,"NO_TEST")
+            log.debug("append completed")
+            ct = int(arcpy.management.GetCount(new_cr_link).getOutput(0))
+            arcpy.AddMessage("    {0} row{1} exported".format(ct,
+                "" if ct == 1 else "s"))
+            log.debug("append completed")
+            log.debug("fields in new CR Link table:")
+            for field in arcpy.ListFields(new_cr_link):
+                log.debug(field.name)
+
+            ## add CLI information to records in CR Link with CLI_ID
+            arcpy.AddMessage("    writing CLI_NUM and LAND_CHAR values to CR Link")
+            fields = ["CLI_ID","CLI_NUM","LAND_CHAR","RESNAME"]
+            with arcpy.da.UpdateCursor(new_cr_link,fields) as cursor:
+                for row in cursor:
+                    cid = row[0]
 
-                if cid in id_dict.keys():
-                    row[1] = id_dict[cid][0]
-                    row[2] = id_dict[cid][1]
-                    row[3] = id_dict[cid][4]
-                cursor.updateRow(row)
+                    if cid in id_dict:
+                        row[1] = id_dict[cid][0]
+                        row[2] = id_dict[cid][1]
+                        row[3] = id_dict[cid][4]
+                    cursor.updateRow(row)
+            manifest.Done("CR_Link",ct)
 
         ## stop early if only CR Link is needed
         if only_cr_link:
+            manifest.Finish()
             arcpy.AddMessage("\nexport finished\n")
             return
         
@@ -797,9 +1034,9 @@ def ExtractFromEnterpriseQuery(map_document,query_code,output_location,
                 cr = str(row[0])
                 ci = str(row[1])
                 ## don't mess with null values
-                if ci == "None" or cr == "None" or not ci in id_list:
+                if ci == "None" or cr == "None" or not ci in id_set:
                     continue
-                if not cr in cr_id_cli_id_dict.keys():
+                if not cr in cr_id_cli_id_dict:
                     cr_id_cli_id_dict[cr] = [ci,row[2],row[3],row[4]]
         cr_id_list = cr_id_cli_id_dict.keys()
         cr_id_list.sort()
@@ -817,17 +1054,21 @@ def ExtractFromEnterpriseQuery(map_document,query_code,output_location,
 ##        cr_id_list = [i for i in cr_id_list if i in cr_ids_in_cat]
 ##        arcpy.AddMessage("CR ID list sanitized")
 
+        ## landscape selections are made from the list of cr_ids, in chunks
         if qry_lvl == "region":
             cr_id_qry = '"REG_CODE" = \''+query_code.upper()+"'"
         elif qry_lvl == "park":
             cr_id_qry = tbl_query
         else:
-            cr_id_qry = '"CR_ID" IN (\'{0}\')'.format("','".join(cr_id_list))
+            cr_id_qry = None
             
-        log.debug("cr_id_qry: "+cr_id_qry)
+        log.debug("cr_id_qry: "+str(cr_id_qry))
         
-        arcpy.management.SelectLayerByAttribute(cr_catalog,
-            "NEW_SELECTION",cr_id_qry)
+        if cr_id_qry is None:
+            SelectByIDs(cr_catalog,"CR_ID",cr_id_list)
+        else:
+            arcpy.management.SelectLayerByAttribute(cr_catalog,
+                "NEW_SELECTION",cr_id_qry)
         with arcpy.da.SearchCursor(cr_catalog,"FEATURE_CLASS_NAME") as c:
             fclasses = [row[0] for row in c]
         unique_fcs = set(fclasses)
@@ -838,88 +1079,112 @@ def ExtractFromEnterpriseQuery(map_document,query_code,output_location,
 
         ## download CR Catalog table new gdb table
         new_cr_catalog = os.path.join(new_gdb,"CR_Catalog")
-        arcpy.management.Append(cr_catalog,new_cr_catalog,"NO_TEST")
-        arcpy.AddMessage("    {0} row{1} exported".format(ct,
-            "" if ct == 1 else "s"))
+        if manifest.IsDone("CR_Catalog"):
+            ct = manifest.Count("CR_Catalog")
+            arcpy.AddMessage("    {0} row{1} already exported".format(ct,
+                "" if ct == 1 else "s"))
+        else:
+            ClearPartialRows(new_cr_catalog)
+            arcpy.management.Append(cr_catalog,new_cr_catalog,"NO_TEST")
+            arcpy.AddMessage("    {0} row{1} exported".format(ct,
+                "" if ct == 1 else "s"))
+            manifest.Done("CR_Catalog",ct)
 
         arcpy.AddMessage("\n---DOWNLOADING SPATIAL DATA---\n")
 
-        ## iterate through layers and apply cr_id query
-        log.debug("iterating through layers and apply cr_id query")
-        totaltime = 0
+        ## match each layer to its destination feature class, and make one
+        ## read job for each layer that has cli features in it
+        log.debug("matching layers to destination feature classes")
+        dest_map = dict((os.path.basename(p).lower(),p) for p in dest_paths)
+        fc_names = set([str(f).lower() for f in unique_fcs if f])
+        transformation = trans_type if transform else None
+        jobs = []
         for layer in arcpy.mapping.ListLayers(map_document):
-
-        ## get datasource name for layer
             if not layer.supports("DATASOURCE"):
                 continue
-            lyr_src = layer.dataSource.lower()
-           
+            lyr_src = layer.dataSource
+
             ## skip the feature class if no cli features are in it.
             log.debug(layer.name)
-            arcpy.AddMessage(layer)
-            a = time.time()
-            skip = True           
-            for f in unique_fcs:
-                if lyr_src.find(f) != -1:
-                    skip = False
-            if skip:
+            if MatchDataSource(lyr_src,fc_names) is None:
                 log.debug("    ...no features")
-                arcpy.AddMessage("    ...no features")
+                arcpy.AddMessage("{0}\n    ...no features".format(
+                    layer.name))
                 continue
 
             ## find appropriate path in destination geodatabase
-            out_path = False
-            for dpath in dest_paths:
-                if lyr_src.find(os.path.basename(dpath)) != -1:
-                    out_path = dpath
-                    break
-            if not out_path:
-                arcpy.AddWarning("    there is no appropriate path match "\
-                    "for this layer")
-                ss = time.time()-a
-                sss = str(ss).split(".")[0]
-                arcpy.AddMessage("      {0} seconds elapsed".format(sss))
+            dest_name = MatchDataSource(lyr_src,dest_map)
+            if dest_name is None:
+                arcpy.AddWarning("{0}\n    there is no appropriate path "\
+                    "match for this layer".format(layer.name))
                 continue
-
-            ## make selection on layer based on cr id query
-            
-            arcpy.management.SelectLayerByAttribute(layer,"NEW_SELECTION",cr_id_qry)
-            ct = int(arcpy.management.GetCount(layer).getOutput(0))
-            arcpy.AddMessage("    {0} feature{1}".format(ct,'' if ct == 1 else 's'))
-            
-            ## transform feature class if desired
-            if transform:
-                ## copy features before projecting them
-                copy = r"in_memory\copy"
-                TakeOutTrash(copy)
-                arcpy.management.CopyFeatures(layer,copy)
-
-                ## project copied layer to temporary NAD83 version
-                proj = r"{0}\proj".format(new_gdb)
-                TakeOutTrash(proj)
-                arcpy.management.Project(copy,proj,NAD83prj,trans_type)
-                
-                src = proj
-            
-            else:
-                src = layer
- 
-            ## finally, append the features to the destination path
-            arcpy.management.Append(src,dpath,"NO_TEST")
-            arcpy.AddMessage("    feature{0} exported to {1}".format(
-                '' if ct == 1 else "s",os.path.basename(dpath)))
-
-            ss = time.time()-a
-            sss = str(ss).split(".")[0]
-            arcpy.AddMessage("      {0} seconds elapsed".format(sss))
-            totaltime += time.time()-a
-
-        a = totaltime/60
-        mins = str(a).split(".")[0]
-        decsecs = str(a).split(".")[1]
-        secs = str(int(float("0."+decsecs)*60))[:2]
-        arcpy.AddMessage(
-            "\nTotal time: {0} minute(s), {1} seconds\n".format(mins,secs))
+            dpath = dest_map[dest_name]
+
+            ## read the fields that are in both the layer and destination
+            src_fields = CopyableFields([(f.name,f.type,f.editable)
+                for f in arcpy.ListFields(lyr_src)])
+            dest_fields = CopyableFields([(f.name,f.type,f.editable)
+                for f in arcpy.ListFields(dpath)])
+            indices, names = MatchFields(src_fields,dest_fields)
+            read_fields = [src_fields[i] for i in indices]
+            def_qry = None
+            if layer.supports("DEFINITIONQUERY"):
+                def_qry = layer.definitionQuery or None
+            out_sr = arcpy.Describe(dpath).spatialReference.exportToString()
+            jobs.append((layer.name,dpath,names,(lyr_src,read_fields,
+                cr_id_list,cr_id_qry,def_qry,out_sr,transformation)))
+
+        ## skip the layers that are already downloaded.  a feature class
+        ## that is still waiting on any of its layers is emptied, and all of
+        ## the layers that go into it are downloaded again.
+        for dpath in manifest.ResetTargets([("layer:"+j[0],j[1])
+                for j in jobs]):
+            ClearPartialRows(dpath)
+        for name,dpath,fields,job in jobs:
+            if manifest.IsDone("layer:"+name):
+                ct = manifest.Count("layer:"+name)
+                arcpy.AddMessage("{0}\n    {1} feature{2} already "\
+                    "exported".format(name,ct,'' if ct == 1 else 's'))
+        jobs = [j for j in jobs if not manifest.IsDone("layer:"+j[0])]
+
+        ## read the layers in parts in worker processes, and write each part
+        ## as soon as it is ready, in layer order.  only a few parts are
+        ## read ahead of the one being written.
+        log.debug("reading {0} layers with {1} process(es)".format(
+            len(jobs),processes))
+        t0 = time.time()
+        pool = None
+        if processes > 1 and len(jobs) > 1:
+            pool = MakeProcessPool(processes)
+        try:
+            times = []
+            results = RunJobs(pool,ReadEnterpriseLayer,
+                EnterpriseReadJobs(jobs),processes)
+            for n,parts in itertools.groupby(results,lambda r: r[0]):
+                name,dpath,fields,job = jobs[n]
+                arcpy.AddMessage(name)
+                ct, read_secs, write_secs = 0, 0, 0
+                with arcpy.da.InsertCursor(dpath,fields+["SHAPE@WKB"]) as c:
+                    for n,(rows,secs) in parts:
+                        a = time.time()
+                        for row in rows:
+                            c.insertRow(row)
+                        ct += len(rows)
+                        read_secs += secs
+                        write_secs += time.time()-a
+                ## report the time spent writing, not waiting for the reads
+                ReportRate("feature{0} exported to {1}".format(
+                    '' if ct == 1 else 's',os.path.basename(dpath)),
+                    ct,time.time()-write_secs)
+                times.append((name,ct,read_secs,write_secs))
+                manifest.Done("layer:"+name,ct)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+        arcpy.AddMessage("")
+        ReportLayerTimes(times,time.time()-t0)
 
         ## add CLI information to all features in all new feature classes
         ## make new list of paths that excludes survey feature classes
@@ -931,7 +1196,7 @@ def ExtractFromEnterpriseQuery(map_document,query_code,output_location,
             fields = ["CR_ID","CLI_ID","CLI_NUM","LAND_CHAR","LCS_ID","FMSS_ID","FMSS_Asset_ID"]
             with arcpy.da.UpdateCursor(path,fields) as cursor:
                 for row in cursor:
-                    if not row[0] in cr_id_list:
+                    if not row[0] in cr_id_cli_id_dict:
                         continue
 
                     ## write to rows
@@ -945,6 +1210,7 @@ def ExtractFromEnterpriseQuery(map_document,query_code,output_location,
                     row[6] = cinfo[3]
                     cursor.updateRow(row)
 
+        manifest.Finish()
         arcpy.AddMessage("\nexport finished\n")
         return
 
@@ -1022,6 +1288,9 @@ def MakeLocalTablesFromCLIFeatureTable(table_geodatabase):
         TakeOutTrash(feat_tv)
         TakeOutTrash(bound_tv)
 
+        ## drop the in-memory lookups so they are rebuilt from the new tables
+        InvalidateLookups()
+
     except:
         tb = sys.exc_info()[2]
         tbinfo = traceback.format_tb(tb)[0]
@@ -1035,13 +1304,99 @@ def MakeLocalTablesFromCLIFeatureTable(table_geodatabase):
         arcpy.AddMessage(pymsg)
         arcpy.AddMessage(arcpy.GetMessages(1))
 
-def UpdateCLITables(map_document):
+def ApplyTableDelta(table,fields,delta):
+    """Applies a TableDelta (see clitools.lookups) to a local table, whose
+    first field must be the key field.  The rows for deleted keys are
+    deleted and the rows for changed keys are overwritten in one update
+    cursor pass, and the rows for new keys (and any extra rows for changed
+    keys) are added with one insert cursor."""
+
+    pending = dict((k,list(rows)) for k,rows in delta.updates.iteritems())
+    if len(delta.deletes) > 0 or len(pending) > 0:
+        with arcpy.da.UpdateCursor(table,fields) as cursor:
+            for row in cursor:
+                key = row[0]
+                if key in delta.deletes:
+                    cursor.deleteRow()
+                elif key in pending:
+                    if len(pending[key]) > 0:
+                        cursor.updateRow(pending[key].pop(0))
+                    else:
+                        cursor.deleteRow()
+
+    new_rows = [r for rows in delta.inserts.itervalues() for r in rows]
+    new_rows+= [r for rows in pending.itervalues() for r in rows]
+    if len(new_rows) > 0:
+        with arcpy.da.InsertCursor(table,fields) as cursor:
+            for row in new_rows:
+                cursor.insertRow(row)
+
+def SyncFields(source_table,target_table,key_field="CLI_ID"):
+    """Returns the names of the fields that can be copied from one table to
+    the other, as named in the source table, with the key field first."""
+
+    source_fields = CopyableFields([(f.name,f.type,f.editable)
+        for f in arcpy.ListFields(source_table)])
+    target_fields = CopyableFields([(f.name,f.type,f.editable)
+        for f in arcpy.ListFields(target_table)])
+    indices, names = MatchFields(source_fields,target_fields)
+    fields = [source_fields[i] for i in indices]
+    key = [f for f in fields if f.upper() == key_field]
+    return key + [f for f in fields if not f.upper() == key_field]
+
+def SyncLocalCLITables(cli_table,dry_run=False):
+    """Brings the local copy of the CLI Feature Table and the
+    FeatureInfoLookup and UnitInfoLookup tables up to date with the CR
+    Enterprise CLI Feature Table, by writing only the CLI_IDs whose rows are
+    new, changed, or deleted.  With dry_run=True, the changes are counted
+    but not written.  The counts are written to a sync manifest in the bin
+    directory.  Returns a dictionary of {table name:TableDelta}."""
+
+    local_table = os.path.join(BinGDB,"CLIFeatureTable_CREnterprise")
+    fields = SyncFields(cli_table,local_table)
+
+    ## the remote table is read once, and the rows for the two lookup
+    ## tables are split out of it locally
+    a = time.time()
+    with arcpy.da.SearchCursor(cli_table,fields) as cursor:
+        remote_rows = [tuple(row) for row in cursor]
+    ReportRate("rows read from the CR Enterprise table",len(remote_rows),a)
+    land_char = [f.upper() for f in fields].index("LAND_CHAR")
+    feature_rows, unit_rows = SplitLookupRows(remote_rows,land_char)
+
+    deltas = {}
+    for table,rows in [(local_table,remote_rows),
+                       (FeatureLookupTable,feature_rows),
+                       (UnitLookupTable,unit_rows)]:
+        name = os.path.basename(table)
+        indices, table_fields = MatchFields(fields,[f.name
+            for f in arcpy.ListFields(table)])
+        rows = [tuple([r[i] for i in indices]) for r in rows]
+        with arcpy.da.SearchCursor(table,table_fields) as cursor:
+            delta = DiffTables(rows,cursor)
+        arcpy.AddMessage(delta.Summary(name))
+        if not dry_run and len(delta) > 0:
+            a = time.time()
+            ApplyTableDelta(table,table_fields,delta)
+            ReportRate("CLI_IDs written to "+name,len(delta),a)
+        deltas[name] = delta
+
+    manifest_path = os.path.join(BinDir,"CLITableSync_manifest.json")
+    WriteSyncManifest(manifest_path,deltas,dry_run)
+    return deltas
+
+def UpdateCLITables(map_document,delta=False,dry_run=False):
     """This tool takes no parameters.  It must be run from the CR Enterprise
     Access map document.  It uses the table view in the map document
     of the CLI Feature Table to pull information to the local lookup tables
     that are used in all of these functions throughout the clitools package.
     This tool should be run by the user every time the CR Enterprise
-    version of the CLI Feature Table is updated."""
+    version of the CLI Feature Table is updated.
+
+    With delta=True, only the rows that have changed are written to the
+    local tables (see SyncLocalCLITables), and dry_run=True reports those
+    changes without making them.  The full copy is still made if any of
+    the local tables doesn't exist yet."""
 
     result = CheckForEnterpriseTables(map_document)
     cli_table = result[0]
@@ -1052,11 +1407,31 @@ def UpdateCLITables(map_document):
             "Access.mxd map document when you run this tool.")
         return False
 
+    new_table = os.path.join(BinGDB,"CLIFeatureTable_CREnterprise")
+
+    ## sync only the changed rows if the local tables are already there
+    if delta or dry_run:
+        if all([arcpy.Exists(t) for t in
+                [new_table,FeatureLookupTable,UnitLookupTable]]):
+            arcpy.AddMessage("\nSyncing changed CLI Feature Table rows "\
+                "from CR Enterprise to local toolbox geodatabase{0}...".format(
+                " (dry run)" if dry_run else ""))
+            SyncLocalCLITables(cli_table,dry_run)
+            if not dry_run:
+                InvalidateLookups()
+            arcpy.AddMessage("\n--process finished--\n")
+            return
+        if dry_run:
+            arcpy.AddMessage("\nThe local tables don't exist yet, so "\
+                "there is nothing to compare against.")
+            return
+        arcpy.AddMessage("\nThe local tables don't exist yet, making a "\
+            "full copy instead.")
+
     ## copy table to local geodatabase
     arcpy.AddMessage("\nCopying CLI Feature Table from CR Enterprise to "\
         "local toolbox geodatabase...")
 
-    new_table = os.path.join(BinGDB,"CLIFeatureTable_CREnterprise")
     TakeOutTrash(new_table)
     arcpy.management.CopyRows(cli_table, new_table)
     arcpy.AddMessage("  table copied.")
@@ -1064,4 +1439,7 @@ def UpdateCLITables(map_document):
     ## make local tables from newly downloaded table
     MakeLocalTablesFromCLIFeatureTable(BinGDB)
 
+    ## make sure nothing stale is served, even if the rebuild failed partway
+    InvalidateLookups()
+
     arcpy.AddMessage("\n--process finished--\n")
@@ -21,11 +21,35 @@ their contents into the site-packages folder.
 import arcpy
 import time
 import os
+import sys
 import shutil
 import logging
+import uuid
+import random
+import hashlib
+import multiprocessing
+import collections
 
 from .paths import BinGDB
 from .config import settings
+from .readers import ArcpyTableReader
+from .validation import (
+    MakeDomainChecks,
+    ValidateFeatureClass,
+    WriteDomainReport,
+    MandatoryFields,
+    CheckNullsInFeatureClass,
+    FormatNullReport,
+    )
+from .queries import (
+    MAX_IDS_IN_QUERY,
+    MAX_QUERY_CHUNKS,
+    UniqueValues,
+    ChunkValues,
+    MakeINQuery,
+    MakeINQueries,
+    FilterRowsByValues,
+    )
 
 def StartLog(level=settings['log-level'],name="output"):
     ## remove any existing handlers
@@ -158,6 +182,101 @@ def TimeDiff(start_time):
     arcpy.AddMessage(msg)
     return secs
 
+def ReportRate(description,count,start_time):
+    """Prints the number of items processed since the start time, the
+    elapsed time, and the rate in items per second.  The message is sent
+    to arcpy.AddMessage() and the elapsed seconds are returned."""
+    secs = time.time()-start_time
+    rate = count/secs if secs > 0 else 0
+    msg = "  {0} {1} in {2:.2f} seconds ({3:,.0f}/sec)".format(
+        count,description,secs,rate)
+    arcpy.AddMessage(msg)
+    return secs
+
+def ReportLayerTimes(times,total_secs):
+    """Prints a table of the time taken by each layer of an extract, from a
+    list of (layer name,feature count,read seconds,write seconds) tuples,
+    followed by the total count and rate over total_secs of wall time.  The
+    read times may overlap when the layers are read by worker processes."""
+    if len(times) == 0:
+        return
+    width = max([len(t[0]) for t in times]+[5])
+    line = "  {0:<"+str(width)+"} {1:>9} {2:>9} {3:>9} {4:>10}"
+    arcpy.AddMessage(line.format("layer","features","read s","write s",
+        "per sec"))
+    for name,count,read_secs,write_secs in times:
+        secs = read_secs+write_secs
+        rate = count/secs if secs > 0 else 0
+        arcpy.AddMessage(line.format(name,count,"{0:.2f}".format(read_secs),
+            "{0:.2f}".format(write_secs),"{0:,.0f}".format(rate)))
+    count = sum([t[1] for t in times])
+    rate = count/total_secs if total_secs > 0 else 0
+    arcpy.AddMessage("\n  {0} feature{1} from {2} layer{3} in {4:.2f} "\
+        "seconds ({5:,.0f}/sec)".format(count,'' if count == 1 else 's',
+        len(times),'' if len(times) == 1 else 's',total_secs,rate))
+
+def ReportQueryChunk(number,total,start_time,count=None):
+    """Prints the time taken by one chunk of an ID list query (see
+    SelectByIDs and ReadRowsByIDs), with the number of rows it returned if
+    a count is given."""
+    secs = time.time()-start_time
+    rows = ""
+    if count is not None:
+        rows = ", {0} row{1}".format(count,"s" if not count == 1 else "")
+    arcpy.AddMessage("    query {0} of {1}{2} in {3:.2f} seconds".format(
+        number+1,total,rows,secs))
+    return secs
+
+def MakeProcessPool(processes=None):
+    """Returns a multiprocessing.Pool with the given number of worker
+    processes.  Inside of ArcGIS, sys.executable is the ArcGIS application,
+    not python, so the workers are pointed at the python executable in the
+    same installation before the pool is started."""
+    if os.name == "nt":
+        exe = os.path.join(sys.exec_prefix,"pythonw.exe")
+        if not os.path.isfile(exe):
+            exe = os.path.join(sys.exec_prefix,"python.exe")
+        multiprocessing.set_executable(exe)
+    return multiprocessing.Pool(processes)
+
+def RunJobs(pool,function,jobs,ahead=1):
+    """Yields a (key,result) tuple for each (key,args) tuple in jobs, in the
+    same order, where result is function(*args).  If a pool is given, the
+    jobs are run in its worker processes, with no more than ahead of them
+    queued past the one being handled, so finished results don't pile up
+    in memory.  Without a pool, each job is run when it is needed."""
+    if pool is None:
+        for key,args in jobs:
+            yield key, function(*args)
+        return
+    pending = collections.deque()
+    for key,args in jobs:
+        pending.append((key,pool.apply_async(function,args)))
+        if len(pending) > max(ahead,1):
+            k, result = pending.popleft()
+            yield k, result.get()
+    while len(pending) > 0:
+        k, result = pending.popleft()
+        yield k, result.get()
+
+def MakeGUID(rand=None):
+    """Returns a new GUID string in the same format that the old VB
+    Scriptlet.Typelib field calculation produced, e.g.
+    {C3E1B9A4-6F1D-4E3B-9C1A-2B7D5E8F0A11}.  A random.Random object can be
+    provided to make a repeatable series of GUIDs."""
+    if rand is None:
+        u = uuid.uuid4()
+    else:
+        u = uuid.UUID(int=rand.getrandbits(128),version=4)
+    return "{" + str(u).upper() + "}"
+
+def MakeSeededRandom(seed,name):
+    """Returns a random.Random object seeded from a base seed and a name
+    (like a feature class name), so each name gets its own repeatable
+    series no matter what order or process it is handled in."""
+    digest = hashlib.md5("{0}|{1}".format(seed,name)).hexdigest()
+    return random.Random(int(digest,16))
+
 def TakeOutTrash(trash):
     """Quick little function to delete a dataset if it already exists.
     code is:    
@@ -225,6 +344,149 @@ def GetDirPath(unit,walk_path):
             dir_path = os.path.join(walk_path, unit.park[0], unit.code)
     return dir_path
 
+## above this many landscapes, the CLI_NUM filter is applied in python
+## rather than in the where clause of each cursor
+MAX_CLI_NUMS_IN_QUERY = 250
+
+def CountDraftedFeatures(landscape_ids,gdb_path,exclude_arch=False,
+                scratch=False):
+    """Counts the drafted features for any number of landscapes in one pass
+    through the geodatabase.  The landscape_ids argument is a dictionary of
+    {cli_number:[list of cli_ids]}, and the result is a dictionary of
+    {cli_number:[ct_all,ct_contrib,boundary]}, where ct_all is the number
+    of the cli_ids that are included, ct_contrib is the number of those
+    that are contributing, and boundary indicates whether or not a boundary
+    has been created.
+
+    Each feature class is read with a single cursor.  In a standards
+    geodatabase features are matched on CLI_NUM and CLI_ID, while in a
+    scratch geodatabase (scratch=True) all features with an fclass value
+    in the imp_ and scratch_ feature classes are matched on CLI_ID alone."""
+
+    id_sets = dict((k,set(v)) for k,v in landscape_ids.iteritems())
+    all_feat = dict((k,set()) for k in id_sets)
+    contrib_feat = dict((k,set()) for k in id_sets)
+    boundaries = set()
+
+    arch_qry = 'UPPER("LAND_CHAR") <> \'ARCHEOLOGICAL SITES\''
+
+    if scratch:
+        qry = '"fclass" IS NOT NULL'
+        if exclude_arch:
+            qry = qry + ' AND ' + arch_qry
+        fields = ["CLI_ID","CONTRIBRES"]
+        paths = [i for i in MakePathList(gdb_path)
+            if "imp_" in i or "scratch_" in i]
+
+        ## a cli_id may be expected in more than one of the landscapes
+        owners = {}
+        for cli_number,ids in id_sets.iteritems():
+            for cli_id in ids:
+                owners.setdefault(cli_id,[]).append(cli_number)
+    else:
+        qry = None
+        if len(id_sets) <= MAX_CLI_NUMS_IN_QUERY:
+            qry = '"CLI_NUM" IN ({0})'.format(
+                ",".join(["'{0}'".format(i) for i in sorted(id_sets)]))
+        if exclude_arch:
+            qry = arch_qry if qry is None else qry + ' AND ' + arch_qry
+        fields = ["CLI_ID","CONTRIBRES","CLI_NUM"]
+        paths = MakePathList(gdb_path)
+
+    for p in paths:
+
+        for row in arcpy.da.SearchCursor(p,fields,qry):
+            ## in a standards geodatabase, the boundary must also carry its
+            ## own landscape's CLI_NUM
+            cli_id = row[0]
+            if cli_id in id_sets and (scratch or row[2] == cli_id):
+                boundaries.add(cli_id)
+
+            if scratch:
+                cli_numbers = owners.get(cli_id,[])
+            elif row[2] in id_sets and cli_id in id_sets[row[2]]:
+                cli_numbers = [row[2]]
+            else:
+                continue
+
+            ## the first occurrence of a feature decides whether it counts
+            ## as contributing
+            for cli_number in cli_numbers:
+                if cli_id in all_feat[cli_number]:
+                    continue
+                all_feat[cli_number].add(cli_id)
+                if row[1] == "Yes":
+                    contrib_feat[cli_number].add(cli_id)
+
+    return dict((k,[len(all_feat[k]),len(contrib_feat[k]),k in boundaries])
+        for k in id_sets)
+
+def SelectByIDs(layer,field,values,extra_query=None,
+                chunk_size=MAX_IDS_IN_QUERY):
+    """Selects the rows in a layer or table view whose value in the field
+    is one of the values.  The values are split into chunks (see
+    clitools.queries), the first chunk makes a new selection and each of
+    the others is added to it, so the result is the same as one selection
+    with the full IN (...) list.  The time for each chunk is printed if
+    there is more than one.  Returns the number of selected rows."""
+
+    queries = MakeINQueries(field,values,extra_query,chunk_size)
+    t0 = time.time()
+    for n,qry in enumerate(queries):
+        a = time.time()
+        sel_type = "NEW_SELECTION" if n == 0 else "ADD_TO_SELECTION"
+        arcpy.management.SelectLayerByAttribute(layer,sel_type,qry)
+        if len(queries) > 1:
+            ReportQueryChunk(n,len(queries),a)
+    ct = int(arcpy.management.GetCount(layer).getOutput(0))
+    if len(queries) > 1:
+        ReportRate("rows selected",ct,t0)
+    return ct
+
+def ReadRowsByIDs(table,fields,id_field,values,extra_query=None,
+                chunk_size=MAX_IDS_IN_QUERY,max_chunks=MAX_QUERY_CHUNKS,
+                spatial_reference=None):
+    """Returns a list of the rows (tuples of the fields) in a table or
+    feature class whose id_field value is one of the values.  The values are
+    split into chunks and each chunk is read with its own cursor.  Past
+    max_chunks chunks, the table is read once with only the extra_query,
+    and the rows are matched against the values in python instead.
+
+    Use this on the path to a table; the rows from a layer or table view
+    would also be limited by its current selection.  If a spatial_reference
+    is given, the geometries are projected to it by the cursors."""
+
+    fields = list(fields)
+    strip = not id_field in fields
+    if strip:
+        fields.append(id_field)
+    index = fields.index(id_field)
+
+    chunks = ChunkValues(values,chunk_size)
+    rows = []
+    t0 = time.time()
+    if len(chunks) > max_chunks:
+        arcpy.AddMessage("    {0} IDs in {1} queries, reading full table "\
+            "instead".format(sum([len(c) for c in chunks]),len(chunks)))
+        with arcpy.da.SearchCursor(table,fields,extra_query,
+                spatial_reference) as cursor:
+            rows = FilterRowsByValues(cursor,UniqueValues(values),index)
+        ReportRate("rows read",len(rows),t0)
+    else:
+        for n,chunk in enumerate(chunks):
+            a = time.time()
+            qry = MakeINQuery(id_field,chunk,extra_query)
+            with arcpy.da.SearchCursor(table,fields,qry,
+                    spatial_reference) as cursor:
+                chunk_rows = [tuple(r) for r in cursor]
+            rows+=chunk_rows
+            if len(chunks) > 1:
+                ReportQueryChunk(n,len(chunks),a,len(chunk_rows))
+
+    if strip:
+        rows = [r[:-1] for r in rows]
+    return rows
+
 def GetDraftedFeatureCountsScratch(cli_number,cli_ids,scratch_gdb,
                 exclude_arch=False):
     """Iterates through all of the features in a scratch geodatabase, 
@@ -232,38 +494,8 @@ def GetDraftedFeatureCountsScratch(cli_number,cli_ids,scratch_gdb,
     many are contributing, and a boolean indicating whether or not a
     boundary has been created."""
 
-    ## set query for features that will be included, modify if arch sites
-    ## should be excluded
-    qry = '"fclass" IS NOT NULL'
-    if exclude_arch:
-        qry = qry + ' AND UPPER("LAND_CHAR") <> \'ARCHEOLOGICAL SITES\''
-
-    all_feat = []
-    contrib_feat = []
-    boundary = False
-
-    fc_list = MakePathList(scratch_gdb)
-    for p in [i for i in fc_list if "imp_" in i or "scratch_" in i]:
-
-        TakeOutTrash("fl")
-        arcpy.management.MakeFeatureLayer(p,"fl",qry)
-        if int(arcpy.management.GetCount("fl").getOutput(0)) == 0:
-            continue
-
-        for row in arcpy.da.SearchCursor(p,["CLI_ID","CONTRIBRES"],qry):
-            if row[0] in all_feat:
-                continue
-            if row[0] in cli_ids:
-                all_feat.append(row[0])
-            if row[0] in cli_ids and row[1] == "Yes":
-                contrib_feat.append(row[0])
-            if row[0] == cli_number:
-                boundary = True
-
-    ct_all = len(all_feat)
-    ct_contrib = len(contrib_feat)
-        
-    return [ct_all,ct_contrib,boundary]
+    return CountDraftedFeatures({cli_number:cli_ids},scratch_gdb,
+        exclude_arch,scratch=True)[cli_number]
 
 def GetDraftedFeatureCounts(cli_number,cli_ids,gdb_path,
                   exclude_arch=False):
@@ -271,86 +503,38 @@ def GetDraftedFeatureCounts(cli_number,cli_ids,gdb_path,
     and returns a count of all cli_ids that are included, a count of how
     many are contributing, and a boolean indicating whether or not a
     boundary has been created."""
-    
-    ## set query to empty, modify if arch sites should be excluded
-    qry = '"CLI_NUM" = \'' + cli_number +"'"
-    if exclude_arch:
-        qry = qry + 'AND UPPER("LAND_CHAR") <> \'ARCHEOLOGICAL SITES\''
 
-    all_feat = []
-    contrib_feat = []
-    boundary = False
-
-    for p in MakePathList(gdb_path):
-
-        for row in arcpy.da.SearchCursor(p,["CLI_ID","CONTRIBRES"],qry):
-            if row[0] in all_feat:
-                continue
-            if row[0] in cli_ids:
-                all_feat.append(row[0])
-            if row[0] in cli_ids and row[1] == "Yes":
-                contrib_feat.append(row[0])
-            if row[0] == cli_number:
-                boundary = True
+    return CountDraftedFeatures({cli_number:cli_ids},gdb_path,
+        exclude_arch)[cli_number]
 
-    ct_all = len(all_feat)
-    ct_contrib = len(contrib_feat)
+def MakeNullCheckJob(feature_class,check_guids=False):
+    """Returns the arguments for validation.CheckNullsInFeatureClass() for
+    one feature class: a reader, the mandatory fields to check, and the
+    names of the fields that actually exist in the feature class."""
 
-    return [ct_all,ct_contrib,boundary]
+    available = [f.name for f in arcpy.ListFields(feature_class)]
+    fields = MandatoryFields(os.path.basename(feature_class),check_guids)
+    return (ArcpyTableReader(feature_class),fields,"OID@",available)
 
 def CheckFeatureClassForNulls(feature_class,check_guids=False):
     '''Checks for NULL values in any of the mandatory NPS CR Spatial
-    Data Transfer Standards fields.'''
+    Data Transfer Standards fields.  All of the fields are read in one
+    cursor pass, and a text summary is returned.'''
 
-    lines = []
-    ct = int(arcpy.management.GetCount(feature_class).getOutput(0))
-
-    lines.append(os.path.basename("{0} | {1} total feature{2}".format(
-        feature_class,str(ct),"s" if not ct == 1 else "")))
-
-    mand_fields = ["BND_TYPE","IS_EXTANT","CONTRIBRES","RESTRICT_","SOURCE",
-    "SRC_DATE","SRC_SCALE","SRC_ACCU","SRC_COORD","MAP_METHOD","CREATEDATE",
-    "EDIT_DATE","ORIGINATOR","CONSTRANT","VERT_ERROR"]
-
-    if "othr" in feature_class:
-        mand_fields.append("TYPE")
-
-    if check_guids:
-        mand_fields.append("CR_ID")
-        mand_fields.append("GEOM_ID")
-
-    for f in mand_fields:
-        if not f in [i.name for i in arcpy.ListFields(feature_class)]:
-            return "operation aborted because field {0} is missing".format(f)
-
-    field_dict = {}
-    for f in mand_fields:
-        field_dict[f] = 0
-
-    cursor_fields = ";".join(mand_fields + ["OBJECTID","RESNAME"])
-
-    for row in arcpy.SearchCursor(feature_class,"","",cursor_fields):
-        
-        for field in mand_fields:
-            val = row.getValue(field)
-            if val == None or str(val).encode('ascii','ignore').rstrip() == "":
-                field_dict[field] += 1       
-
-    for k in field_dict.keys():
-        string = "OK"
-        if not field_dict[k] == 0:
-            string = "needs help ({0} feature{1})".format(
-                str(field_dict[k]), "s" if not field_dict[k] == 1 else "")
-        lines.append("  {0}{1}{2}".format(k,(12-len(k))*" ",string))
-    lines.append("\n")
-    output = "\n".join(lines)
-    return output
+    result = CheckNullsInFeatureClass(
+        *MakeNullCheckJob(feature_class,check_guids))
+    return FormatNullReport(result)
 
 def CheckGeodatabaseForNulls(geodatabase,check_guids=False):
     '''Checks an entire geodatabase for NULL values in any of the 
     mandatory NPS CR Spatial Data Transfer Standards fields.  All of the 
     feature classes in the input geodatabase are expected to contain all
-    of the fields that will be checked.'''
+    of the fields that will be checked.
+
+    The summary is written to a log file, and the full results
+    are returned as a list with one dictionary per feature class, holding
+    the OBJECTIDs of the features with empty values in each field (see
+    validation.CheckNullsInFeatureClass).'''
 
     dir_path = os.path.dirname(geodatabase)
     name = os.path.basename(geodatabase).rstrip(".gdb")
@@ -358,13 +542,18 @@ def CheckGeodatabaseForNulls(geodatabase,check_guids=False):
     log_path = os.path.join(dir_path,"StandardsCheck {0}.txt".format(name))
     Print("\nresults stored in " + log_path + '\n')
 
-    log = open(log_path,"w")
-
-    for path in MakePathList(geodatabase):
-        print >> log, CheckFeatureClassForNulls(path,check_guids)
+    t0 = time.time()
+    jobs = [MakeNullCheckJob(p,check_guids) for p in MakePathList(geodatabase)]
+    results = [CheckNullsInFeatureClass(*j) for j in jobs]
+    ReportRate("features checked",sum([r["count"] for r in results]),t0)
 
+    log = open(log_path,"w")
+    for result in results:
+        print >> log, FormatNullReport(result)
     log.close()
+
     os.startfile(log_path)
+    return results
 
 def BackupGDB(geodatabase,backup_location,comment=''):
     """Simple function to back up a geodatabase.  Option to add
@@ -392,7 +581,12 @@ def CheckValuesAgainstDomains(geodatabase):
     '''This function introspects all of the values in each feature class in
     the input geodatabase.  The values in any field that has a domain are
     checked against all the values in the domain for that field.  Messages
-    are printed whenever a value is out of line.'''
+    are printed whenever a value is out of line.
+
+    Each domain is loaded once, and all of the domain fields in a feature
+    class are read in a single cursor pass.  Along with the text log, a json
+    and a csv report are written that list every bad value with its count
+    and the OBJECTIDs of the features that hold it.'''
 
     arcpy.AddMessage("\nAnalyzing feature classes...")
 
@@ -400,48 +594,38 @@ def CheckValuesAgainstDomains(geodatabase):
     dir_path = os.path.dirname(geodatabase)
     name = os.path.basename(geodatabase).rstrip(".gdb")
     log_path = os.path.join(dir_path,"DomainCheck {0}.txt".format(name))
-    log = open(log_path,"w")
+    json_path = os.path.splitext(log_path)[0] + ".json"
+    csv_path = os.path.splitext(log_path)[0] + ".csv"
     
     ## first make dictionary of all domains
-    desc = arcpy.Describe(geodatabase)
-    domains = desc.domains
+    domains = MakeDomainChecks(arcpy.da.ListDomains(geodatabase))
 
-    val_dict = {}
+    ## make the list of domain fields to check in each feature class
+    jobs = []
+    for path in MakePathList(geodatabase):
+        field_domains = [(f.name,f.domain) for f in arcpy.ListFields(path)
+            if not f.domain == "" and
+            not f.name in ("UNIT_CODEO","GROUP_CODE")]
+        jobs.append((ArcpyTableReader(path),field_domains,domains))
 
-    for domain in domains:
-        temp_tv = "in_memory\\fl"
-        TakeOutTrash(temp_tv)
-        arcpy.DomainToTable_management(geodatabase, domain, temp_tv,
-            'field','description','#')
-        code_list = [i.getValue("field") for i in arcpy.SearchCursor(temp_tv)]
-        val_dict[domain] = code_list
+    t0 = time.time()
+    results = [ValidateFeatureClass(*j) for j in jobs]
 
-    for path in MakePathList(geodatabase):
+    log = open(log_path,"w")
+    for fc_name,fields in results:
         
         bad = False
-
-        fc_name = os.path.basename(path)
         arcpy.AddMessage(fc_name)
-        
         print >> log, fc_name
 
-        for f in arcpy.ListFields(path):
-            if f.domain == "":
-                continue
-            if f.name == "UNIT_CODEO" or f.name == "GROUP_CODE":
+        for field,domain,values in fields:
+            if len(values) == 0:
                 continue
-            bad_vals = []
-            for row in arcpy.SearchCursor(path,"","",f.name):
-                val = str(row.getValue(f.name)).encode('ascii','ignore')
-                if val == "None":
-                    val = "<Null>"
-                if not val in val_dict[f.domain]:
-                    if not val in bad_vals:
-                        bad = True
-                        if len(bad_vals) == 0:
-                            print >> log, "    " + f.name
-                        bad_vals.append(val)
-                        print >> log, "        bad value(s): {0}".format(val)
+            bad = True
+            print >> log, "    " + field
+            for v,ct,oids in values:
+                print >> log, "        bad value(s): {0} ({1} feature{2})".format(
+                    v,ct,"s" if not ct == 1 else "")
         if not bad:
             arcpy.AddMessage("    ALL FIELD VALUES MATCH DOMAIN VALUES")
             print >> log, "    ALL FIELD VALUES MATCH DOMAIN VALUES"
@@ -450,8 +634,12 @@ def CheckValuesAgainstDomains(geodatabase):
         
         print >> log, '\n'+'-'*40+'\n'
 
-    arcpy.AddMessage("\nProcess finished.")
     log.close()
+    WriteDomainReport(results,json_path,csv_path,geodatabase)
+    ReportRate("feature classes checked",len(results),t0)
+
+    arcpy.AddMessage("\nProcess finished.")
+    arcpy.AddMessage("reports:\n  {0}\n  {1}".format(json_path,csv_path))
     os.startfile(log_path)
 
 def ExportGDBToShapefiles(input_gdb,output_location):
@@ -0,0 +1,454 @@
+__doc__ = \
+"""Contains the registries that hold the reference dictionaries built from
+the local lookup tables (UnitInfoLookup, etc.) in the bin geodatabase.
+
+The tables are not read when this module (or clitools.classes) is imported.
+Instead, each registry reads its table the first time it is accessed, and
+then keeps the result in memory for the rest of the session.  A snapshot
+of the rows is also written to the cache directory (settings['cache']),
+along with a stamp from the table, so the next session can skip the cursor
+entirely as long as the table hasn't changed.
+
+The table itself is read through one of the readers in clitools.readers, so
+the registries can be pointed at a csv or SQLite copy of a lookup table:
+
+from clitools.readers import CSVTableReader
+from clitools.lookups import UnitLookupRegistry
+
+registry = UnitLookupRegistry(CSVTableReader("UnitInfoLookup.csv"))
+print registry.Get().cli_num_and_name_dict["500003"]
+>> Port Oneida Historic District
+
+This module also holds the pure python part of the delta sync of the local
+lookup tables (see UpdateCLITables in clitools.enterprise).  The rows on
+each side are fingerprinted by CLI_ID and compared, and only the CLI_IDs
+that are new, changed, or gone are written to the local table.  Any two
+readers can be compared, e.g. two snapshots of the same table:
+
+from clitools.lookups import DiffReaders
+
+delta = DiffReaders(CSVTableReader("new.csv"),CSVTableReader("old.csv"),
+    ["CLI_ID","RESNAME","LAND_CHAR"])
+print delta.Summary("FeatureInfoLookup")
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+## increment this number whenever the content of a snapshot file changes,
+## so that old snapshots are ignored instead of misread
+SNAPSHOT_VERSION = 1
+
+## the LAND_CHAR value of the rows that go in the UnitInfoLookup table; all
+## other rows go in the FeatureInfoLookup table
+BOUNDARY_LAND_CHAR = "Boundary"
+
+## increment this number whenever the content of a sync manifest changes
+SYNC_MANIFEST_VERSION = 1
+
+#small dictionary for region codes and names
+region_dict = {
+    "AKR":"Alaska Region",
+    "IMR":"Intermountain Region",
+    "MWR":"Midwest Region",
+    "NCR":"National Capital Region",
+    "NER":"Northeast Region",
+    "PWR":"Pacific West Region",
+    "SER":"Southeast Region"
+    }
+
+def ReadSnapshot(snapshot_path,stamp):
+    '''Returns the rows stored in a snapshot file if the file exists and
+    was written from a table with the same stamp and by the same snapshot
+    version.  Otherwise, returns None.'''
+
+    if stamp is None or not os.path.isfile(snapshot_path):
+        return None
+    try:
+        with open(snapshot_path,"rb") as f:
+            snapshot = json.load(f)
+    except (IOError,ValueError):
+        return None
+
+    if not snapshot.get("version") == SNAPSHOT_VERSION:
+        return None
+    if not snapshot.get("stamp") == stamp:
+        return None
+    return [tuple(row) for row in snapshot["rows"]]
+
+def WriteSnapshot(snapshot_path,stamp,fields,rows):
+    '''Writes rows to a snapshot file.  The file is written to a temporary
+    path first and then moved into place, so a half-written snapshot is
+    never read.  Problems writing the snapshot are not fatal.'''
+
+    if stamp is None:
+        return False
+    temp_path = snapshot_path + ".tmp"
+    try:
+        with open(temp_path,"wb") as f:
+            json.dump({"version":SNAPSHOT_VERSION,"stamp":stamp,
+                "fields":fields,"rows":rows},f)
+        if os.path.isfile(snapshot_path):
+            os.remove(snapshot_path)
+        os.rename(temp_path,snapshot_path)
+    except (IOError,OSError):
+        return False
+    return True
+
+class LookupRegistry(object):
+    """Base class for a lazily loaded, cached view of one lookup table.
+    Subclasses define the fields to read, the sort order, and the Build()
+    method that turns the rows into whatever structure is needed.
+
+    Get() is safe to call from multiple threads; the table is only read
+    once, by whichever thread gets there first."""
+
+    fields = []
+    order_by = []
+
+    def __init__(self,reader,cache_dir=None):
+
+        self.reader = reader
+        self.cache_dir = cache_dir
+        self.source = None
+        self._lock = threading.Lock()
+        self._data = None
+
+    def SnapshotPath(self):
+        '''Returns the path to the snapshot file for this registry, or None
+        if there is no cache directory to use.'''
+
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return None
+        name = "{0}_{1}.json".format(type(self).__name__,self.reader.name)
+        return os.path.join(self.cache_dir,name)
+
+    def Get(self):
+        '''Returns the built lookup structure, loading it if necessary.'''
+
+        data = self._data
+        if data is None:
+            with self._lock:
+                if self._data is None:
+                    self._data = self.Load()
+                data = self._data
+        return data
+
+    def Invalidate(self):
+        '''Drops the loaded data so the table will be read (or the snapshot
+        re-checked) the next time Get() is called.'''
+
+        with self._lock:
+            self._data = None
+
+    def Load(self):
+        '''Reads the rows from a snapshot if a valid one exists, or from the
+        table, and returns the result of Build().'''
+
+        log = logging.getLogger(__name__)
+        stamp = self.reader.GetStamp()
+        snapshot_path = self.SnapshotPath()
+
+        rows = None
+        if snapshot_path:
+            rows = ReadSnapshot(snapshot_path,stamp)
+        if rows is not None:
+            self.source = "snapshot"
+            log.debug("{0}: {1} rows read from snapshot {2}".format(
+                self.reader.name,len(rows),snapshot_path))
+        else:
+            rows = list(self.reader.ReadRows(self.fields,self.order_by))
+            self.source = "table"
+            log.debug("{0}: {1} rows read from table".format(
+                self.reader.name,len(rows)))
+            if snapshot_path:
+                WriteSnapshot(snapshot_path,stamp,self.fields,rows)
+
+        return self.Build(rows)
+
+    def Build(self,rows):
+        raise NotImplementedError
+
+class UnitLookups(object):
+    """Holds the reference dictionaries for regions, parks, and landscapes
+    that are built from the UnitInfoLookup table.  When a key appears more
+    than once in the table, the first value encountered is kept.
+
+    The park_landscapes, region_parks, and region_landscapes dictionaries
+    hold the sorted lists of (code,name) tuples for each park and region."""
+
+    def __init__(self,rows):
+
+        self.region_dict = region_dict
+        self.alpha_and_region_dict = {}
+        self.alpha_and_name_dict = {}
+        self.cli_num_and_alpha_dict = {}
+        self.cli_num_and_region_dict = {}
+        self.cli_num_and_name_dict = {}
+
+        for row in rows:
+            alpha = row[0]
+            region_code = row[1]
+            park_name = row[2]
+            cli_num = row[3]
+            cli_name = row[4]
+            if cli_name is not None:
+                cli_name = cli_name.encode('ascii','ignore')
+
+            self.alpha_and_region_dict.setdefault(alpha,region_code)
+            self.alpha_and_name_dict.setdefault(alpha,park_name)
+            self.cli_num_and_alpha_dict.setdefault(cli_num,alpha)
+            self.cli_num_and_region_dict.setdefault(cli_num,region_code)
+            self.cli_num_and_name_dict.setdefault(cli_num,cli_name)
+
+        ## index the hierarchy once, so that parks and regions don't have to
+        ## scan every landscape to find their own.  all lists are sorted by
+        ## code, and a region's landscapes are listed park by park.
+        self.park_landscapes = {}
+        for cli_num,alpha in self.cli_num_and_alpha_dict.iteritems():
+            self.park_landscapes.setdefault(alpha,[]).append(
+                (cli_num,self.cli_num_and_name_dict[cli_num]))
+        for land_tuples in self.park_landscapes.itervalues():
+            land_tuples.sort(key=lambda tup: tup[0])
+
+        self.region_parks = {}
+        for alpha,region_code in self.alpha_and_region_dict.iteritems():
+            self.region_parks.setdefault(region_code,[]).append(
+                (alpha,self.alpha_and_name_dict[alpha]))
+        for park_tuples in self.region_parks.itervalues():
+            park_tuples.sort(key=lambda tup: tup[0])
+
+        self.region_landscapes = {}
+        for region_code,park_tuples in self.region_parks.iteritems():
+            land_tuples = []
+            for alpha,park_name in park_tuples:
+                land_tuples += self.park_landscapes.get(alpha,[])
+            self.region_landscapes[region_code] = land_tuples
+
+class UnitLookupRegistry(LookupRegistry):
+    """Registry for the UnitInfoLookup table."""
+
+    fields = ["ALPHA_CODE","REGION_NAME","PARK_NAME","CLI_NUM","CLI_NAME"]
+    order_by = ["ALPHA_CODE","CLI_NUM"]
+
+    def Build(self,rows):
+        lookups = UnitLookups(rows)
+        logging.getLogger(__name__).debug(
+            "regions: {0}, parks: {1}, landscapes: {2}".format(
+            len(lookups.region_dict),len(lookups.alpha_and_region_dict),
+            len(lookups.cli_num_and_name_dict)))
+        return lookups
+
+class FeatureLookups(object):
+    """Holds the rows of the FeatureInfoLookup table in columns (one list
+    per field), with the row positions grouped by CLI_NUM, ALPHA_CODE and
+    REGION_NAME.  The rows are kept in the same order that the old per-unit
+    cursors used (REGION_NAME,ALPHA_CODE,LAND_CHAR,RESNAME), so each group
+    is already sorted when it is pulled out."""
+
+    group_fields = ["CLI_NUM","ALPHA_CODE","REGION_NAME"]
+
+    def __init__(self,fields,rows):
+
+        self.fields = list(fields)
+        self.columns = dict((f,[]) for f in self.fields)
+        self.groups = dict((f,{}) for f in self.group_fields)
+
+        cols = [self.columns[f] for f in self.fields]
+        group_cols = [(self.fields.index(f),self.groups[f])
+            for f in self.group_fields]
+
+        for n,row in enumerate(rows):
+            for col,value in zip(cols,row):
+                col.append(value)
+            for i,group in group_cols:
+                group.setdefault(row[i],[]).append(n)
+
+    def __len__(self):
+        return len(self.columns[self.fields[0]])
+
+    def Positions(self,group_field,value):
+        '''Returns the sorted row positions for one CLI_NUM, ALPHA_CODE, or
+        REGION_NAME value.'''
+
+        return self.groups[group_field].get(value,[])
+
+    def Values(self,group_field,value,field):
+        '''Returns the values of one field for all rows in a group.'''
+
+        col = self.columns[field]
+        return [col[n] for n in self.Positions(group_field,value)]
+
+    def Rows(self,group_field,value,fields):
+        '''Returns a list of value lists, one for each row in a group, with
+        values in the same order as the fields list.'''
+
+        cols = [self.columns[f] for f in fields]
+        return [[col[n] for col in cols]
+            for n in self.Positions(group_field,value)]
+
+    def FeatureList(self,group_field,value):
+        '''Returns the list of CLI_IDs for all features in a group.'''
+
+        return self.Values(group_field,value,"CLI_ID")
+
+    def FeatureDict(self,group_field,value):
+        '''Returns the feature dictionary for all features in a group, in
+        the format used by Landscape.GetFeatureDict():
+
+        {CLI_ID:["RESNAME","CONTRIB_STATUS",
+                "LAND_CHAR","CLI_NUM","LCS_ID","HS_ID"]}'''
+
+        dict_fields = ["CLI_ID","RESNAME","CONTRIB_STATUS","LAND_CHAR",
+            "CLI_NUM","LCS_ID","HS_ID"]
+        return dict((r[0],r[1:]) for r in
+            self.Rows(group_field,value,dict_fields))
+
+class FeatureLookupRegistry(LookupRegistry):
+    """Registry for the FeatureInfoLookup table."""
+
+    fields = ["CLI_ID","RESNAME","CONTRIB_STATUS","LAND_CHAR","CLI_NUM",
+        "LCS_ID","HS_ID","REGION_NAME","ALPHA_CODE"]
+    order_by = ["REGION_NAME","ALPHA_CODE","LAND_CHAR","RESNAME"]
+
+    def Build(self,rows):
+        lookups = FeatureLookups(self.fields,rows)
+        logging.getLogger(__name__).debug(
+            "features: {0}, landscapes: {1}".format(
+            len(lookups),len(lookups.groups["CLI_NUM"])))
+        return lookups
+
+def FingerprintRow(row):
+    '''Returns a hash of all of the values in a row.  NULL values are
+    kept apart from empty strings.'''
+
+    parts = []
+    for v in row:
+        if v is None:
+            parts.append(u"\x00")
+        elif isinstance(v,str):
+            parts.append(v.decode("utf-8","replace"))
+        else:
+            parts.append(unicode(v))
+    return hashlib.md5(u"\x1f".join(parts).encode("utf-8")).hexdigest()
+
+def IndexRows(rows,key_index=0):
+    '''Groups rows by their key value (the CLI_ID), as a tuple of
+    ({key:[rows]},number of rows with a NULL key).  A key usually has one
+    row, but duplicate CLI_IDs are kept.'''
+
+    index = {}
+    nulls = 0
+    for row in rows:
+        key = row[key_index]
+        if key is None:
+            nulls+=1
+            continue
+        index.setdefault(key,[]).append(tuple(row))
+    return index, nulls
+
+class TableDelta(object):
+    """The differences between the rows of a remote and a local table, by
+    key.  inserts and updates hold the remote rows for each key that is new
+    or changed, and deletes is the set of keys that are only in the local
+    table.  A key is changed if the fingerprints of its rows differ."""
+
+    def __init__(self,remote_index,local_index,null_keys=0):
+
+        self.inserts = {}
+        self.updates = {}
+        self.deletes = set()
+        self.unchanged = 0
+        self.null_keys = null_keys
+
+        for key,rows in remote_index.iteritems():
+            if not key in local_index:
+                self.inserts[key] = rows
+                continue
+            remote_prints = sorted([FingerprintRow(r) for r in rows])
+            local_prints = sorted([FingerprintRow(r)
+                for r in local_index[key]])
+            if remote_prints == local_prints:
+                self.unchanged+=1
+            else:
+                self.updates[key] = rows
+        for key in local_index:
+            if not key in remote_index:
+                self.deletes.add(key)
+
+    def __len__(self):
+        return len(self.inserts)+len(self.updates)+len(self.deletes)
+
+    def Counts(self):
+        '''Returns a dictionary of the number of keys in each part.'''
+
+        return {"inserted":len(self.inserts),"updated":len(self.updates),
+            "deleted":len(self.deletes),"unchanged":self.unchanged,
+            "null_keys":self.null_keys}
+
+    def Summary(self,name):
+        '''Returns a short text summary of the delta for one table.'''
+
+        c = self.Counts()
+        text = "  {0}: {1} new, {2} changed, {3} deleted, {4} unchanged".format(
+            name,c["inserted"],c["updated"],c["deleted"],c["unchanged"])
+        if self.null_keys > 0:
+            text+= " ({0} row{1} with no CLI_ID skipped)".format(
+                self.null_keys,'' if self.null_keys == 1 else 's')
+        return text
+
+def DiffTables(remote_rows,local_rows,key_index=0):
+    '''Returns the TableDelta that turns the local rows into the remote
+    rows.  Both sides must have the same fields in the same order.'''
+
+    remote_index, nulls = IndexRows(remote_rows,key_index)
+    local_index = IndexRows(local_rows,key_index)[0]
+    return TableDelta(remote_index,local_index,nulls)
+
+def DiffReaders(remote_reader,local_reader,fields,key_field="CLI_ID"):
+    '''Returns the TableDelta between two tables, read through any of the
+    readers in clitools.readers.'''
+
+    return DiffTables(remote_reader.ReadRows(fields),
+        local_reader.ReadRows(fields),fields.index(key_field))
+
+def SplitLookupRows(rows,land_char_index):
+    '''Splits CLI Feature Table rows into the rows for the
+    FeatureInfoLookup and UnitInfoLookup tables, the way the LAND_CHAR
+    queries do.  Rows with a NULL LAND_CHAR are in neither table.'''
+
+    feature_rows, unit_rows = [], []
+    for row in rows:
+        land_char = row[land_char_index]
+        if land_char is None:
+            continue
+        elif land_char == BOUNDARY_LAND_CHAR:
+            unit_rows.append(row)
+        else:
+            feature_rows.append(row)
+    return feature_rows, unit_rows
+
+def WriteSyncManifest(manifest_path,deltas,dry_run=False):
+    '''Writes the counts from a delta sync to a json manifest, with one
+    entry per table in the deltas dictionary of {table name:TableDelta}.
+    The file is written to a temporary path first and then moved into
+    place.  Problems writing the manifest are not fatal.'''
+
+    temp_path = manifest_path + ".tmp"
+    try:
+        with open(temp_path,"wb") as f:
+            json.dump({"version":SYNC_MANIFEST_VERSION,
+                "time":time.strftime("%Y-%m-%d %H:%M:%S"),
+                "dry_run":dry_run,
+                "tables":dict((k,d.Counts()) for k,d in deltas.iteritems())},
+                f,indent=1)
+        if os.path.isfile(manifest_path):
+            os.remove(manifest_path)
+        os.rename(temp_path,manifest_path)
+    except (IOError,OSError):
+        return False
+    return True
@@ -29,6 +29,25 @@ import time
 from .classes import MakeUnit
 from .summarize import MakeSingleLandscapeXLS
 from .config import settings
+from .crtables import (
+    ReconcileCRLinkRows,
+    ConflictLines,
+    ConflictDefinitionQuery,
+    ApplyCRLinkUpdates,
+    DiffCRLink,
+    DiffCatalog,
+    ApplyRowChanges,
+    )
+from .spatial import FindCRIDTransfers
+from .routing import (
+    STANDARDS_FCS,
+    MakeTargetMap,
+    CountValues,
+    CopyableFields,
+    MatchFields,
+    ChooseTransformation,
+    ConvertRow,
+    )
 
 from .general import (
     MakePathList,
@@ -38,7 +57,13 @@ from .general import (
     Print3,
     StartLog,
     MakeBlankGDB,
+    ReportRate,
+    MakeProcessPool,
+    MakeGUID,
+    MakeSeededRandom,
+    ReadRowsByIDs,
     )
+from .queries import MakeINQueries, MakeINQuery
 
 from .paths import (
     GDBstandard,
@@ -51,14 +76,10 @@ from .paths import (
     NAD83prj,
     )
 
-def ConsolidateCRLinkTable(cr_link_path,fc_cr_id_list=False):
-    """ Analyzes a full CR Link table and collapses it down to one row per
-    CR_ID.  All program IDs are retained.  Returns a path to a new log file
-    if conflicting program IDs have been found."""
-
-    in_gdb = os.path.dirname(cr_link_path)
+def GetCRLinkIdFields(cr_link_path):
+    """Returns a tuple of the CR_ID field followed by all of the program id
+    fields in a CR Link table, in the order they appear in the table."""
 
-    ## make new dictionary of unique CR_IDs, consolidating all program ids.
     id_fields = [f.name for f in arcpy.ListFields(cr_link_path)][3:]
 
     ## augment list
@@ -67,72 +88,31 @@ def ConsolidateCRLinkTable(cr_link_path,fc_cr_id_list=False):
         if s in id_fields:
             id_fields.remove(s)
     id_fields.insert(0,"CR_ID")
-    id_fields = tuple(id_fields)
-
-    link_dict = {}
-    arcpy.AddMessage("\nCollecting and consolidating all unique CR_IDs "\
-                     "and associated program IDs...")
-    cr_double_id = []
-    with arcpy.da.SearchCursor(cr_link_path,id_fields) as c:
-        for row in c:
-            cr_id = row[0]
-
-            ## skip empty cr_ids
-            if cr_id == None or str(cr_id).rstrip() == "":
-                continue
-
-            ## if it's a new cr_id, add to dictionary with all program ids
-            if not cr_id in link_dict.keys():
-                link_dict[cr_id] = [row[i] for i in range(1,len(id_fields))]
+    return tuple(id_fields)
 
-            ## if it's already in the dictionary, compare program ids
-            else:
-                new_ids = [row[i] for i in range(1,len(id_fields))]
-                old_ids = link_dict[cr_id]
-                compare = zip(new_ids,old_ids)
-                new_list = []
-                for i, (x,y) in enumerate(compare):
-                    if str(x).rstrip() == '':
-                        x = None
-                    if str(y).rstrip() == '':
-                        y = None
-                    if x != None and y == None:
-                        val = x
-                    elif x == None and y != None:
-                        val = y
-                    elif x == None and y == None:
-                        val = None
-                    elif x == y:
-                        val = x
-                    else:
-                        cr_double_id.append((cr_id,id_fields[i+1],x,y,i))
-                        val = x
-                    new_list.append(val)
-                link_dict[cr_id] = new_list
+def WriteCRLinkConflictLog(in_gdb,cr_double_id,link_dict):
+    """Writes a log file listing the CR_IDs that have conflicting program
+    IDs, as found by ReconcileCRLinkRows, and prints them as warnings.
+    Returns the path to the log file, or False if there are no conflicts."""
 
-    ## if cr_ids have been found to have multiple values for certain programs
-    ## list them and add error
-    cr_n = len(link_dict)
-    arcpy.AddMessage("  process finished, {0} unique CR_ID{1}".format(
-        cr_n,"" if cr_n == 1 else "s"))
-    log = False
-    if len(cr_double_id) > 0:
-        
-        #name and create log file
-        log_dir = os.path.dirname(in_gdb)
-        log_path = os.path.join(log_dir,"CR_ID Multiple Program IDs " +\
-                   time.strftime("%m-%d-%Y_%Hh%Mm") + ".txt")
-        log = open(log_path, "a")
-
-        ## print error messages and lists of features
-        print >> log, "Input Geodatabase:\n{0}".format(str(in_gdb))
-        msg1 = "\nThe following CR_IDs have conflicting database IDs."
-        msg2 = """
+    if len(cr_double_id) == 0:
+        return False
+    
+    #name and create log file
+    log_dir = os.path.dirname(in_gdb)
+    log_path = os.path.join(log_dir,"CR_ID Multiple Program IDs " +\
+               time.strftime("%m-%d-%Y_%Hh%Mm") + ".txt")
+    log = open(log_path, "a")
+
+    ## print error messages and lists of features
+    print >> log, "Input Geodatabase:\n{0}".format(str(in_gdb))
+    msg1 = "\nThe following CR_IDs have conflicting database IDs."
+    msg2 = """
 (see bottom of document for a detailed explanation)
 
 LIST OF CONFLICTS:
 """
-        msg3 = """
+    msg3 = """
 _______________________________________________________________________________                     
 EXPLANATION:
 
@@ -160,65 +140,165 @@ _______________________________________________________________________________
 
 """
 
-        arcpy.AddWarning(msg1)
-        print >> log, msg2
+    arcpy.AddWarning(msg1)
+    print >> log, msg2
+    
+    lines = ConflictLines(cr_double_id,link_dict)
+    for line in lines:
+        arcpy.AddWarning(line)
         
-        lines = []
-        for i in cr_double_id:
-            line = "{0}: {1}, {2} or {3}? {4} chosen".format(
-                i[0],i[1],i[2],i[3],link_dict[i[0]][i[4]])
-            if not line in lines:
-                arcpy.AddWarning(line)
-                lines.append(line)
-            
-        lines.sort()
-        print >> log, "\n".join(lines)
-        arcpy.AddWarning("Consult the error log for more information.")
-
-        print >> log, '\nDEFINITION QUERY:\n(can be pasted into a layer\'s '\
-            'definition query to only show problem features)\n\n"CR_ID" IN '\
-            '(\'{0}\')'.format("','".join(set([e[0] for e in cr_double_id])))
-        print >> log, msg3
-        log.close()    
+    lines.sort()
+    print >> log, "\n".join(lines)
+    arcpy.AddWarning("Consult the error log for more information.")
+
+    print >> log, '\nDEFINITION QUERY:\n(can be pasted into a layer\'s '\
+        'definition query to only show problem features)\n\n{0}'.format(
+        ConflictDefinitionQuery(cr_double_id))
+    print >> log, msg3
+    log.close()
+
+    return log_path
+
+def ConsolidateCRLinkTable(cr_link_path,fc_cr_id_list=False):
+    """ Analyzes a full CR Link table and collapses it down to one row per
+    CR_ID.  All program IDs are retained.  Returns a path to a new log file
+    if conflicting program IDs have been found."""
+
+    in_gdb = os.path.dirname(cr_link_path)
+
+    ## make new dictionary of unique CR_IDs, consolidating all program ids.
+    id_fields = GetCRLinkIdFields(cr_link_path)
+
+    arcpy.AddMessage("\nCollecting and consolidating all unique CR_IDs "\
+                     "and associated program IDs...")
+    t0 = time.time()
+    with arcpy.da.SearchCursor(cr_link_path,id_fields) as c:
+        rows = [row for row in c]
+    link_dict, cr_double_id = ReconcileCRLinkRows(rows,id_fields)
+    ReportRate("rows read and consolidated",len(rows),t0)
+    del rows
+
+    ## if cr_ids have been found to have multiple values for certain programs
+    ## list them and add error
+    cr_n = len(link_dict)
+    arcpy.AddMessage("  process finished, {0} unique CR_ID{1}".format(
+        cr_n,"" if cr_n == 1 else "s"))
+    log_path = WriteCRLinkConflictLog(in_gdb,cr_double_id,link_dict)
         
     ## use update cursor to update program values and delete duplicate cr_ids
     arcpy.AddMessage("\nRemoving all duplicate/null rows and writing program "\
         "IDs...")
-    up_curse = arcpy.da.UpdateCursor(cr_link_path,"*")
-
-    covered_cr_ids = []
-    removed = 0
-    remain = 0
-    for row in up_curse:
-        cr_id = row[1]
-        if fc_cr_id_list:
-            if not cr_id in fc_cr_id_list:
-                up_curse.deleteRow()
-                removed+=1
-                continue
-        if not cr_id in link_dict.keys() or cr_id in covered_cr_ids\
-           or cr_id == None or cr_id == '':
-            up_curse.deleteRow()
-            removed+=1
-        else:
-            for i,v in enumerate(link_dict[cr_id]):
-                row[i+3] = v
-            covered_cr_ids.append(cr_id)
-            up_curse.updateRow(row)
-            remain+=1  
+    keep_cr_ids = None
+    if fc_cr_id_list:
+        keep_cr_ids = set(fc_cr_id_list)
+
+    t0 = time.time()
+    with arcpy.da.UpdateCursor(cr_link_path,"*") as up_curse:
+        removed, remain = ApplyCRLinkUpdates(up_curse,link_dict,keep_cr_ids)
+    ReportRate("rows updated",removed+remain,t0)
 
     arcpy.AddMessage("  {0} row{1} removed from CR Link".format(
             removed,"" if removed == 1 else "s"))
     arcpy.AddMessage("  {0} unique CR_ID{1} remain{2} in CR Link".format(
             remain,"" if remain == 1 else "s","" if not remain == 1 else "s"))
 
-    if not log:
-        return False
+    return log_path
+
+def CreateGUIDsInFeatureClass(path,subset_query='',cr_guid=False,
+    geom_guid=False,overwrite=False,seed=None):
+    """Makes new GUIDs in one feature class with a single update cursor, and
+    returns a dictionary with the number of CR_IDs and GEOM_IDs created,
+    the number of rows read, and the seconds it took.  If a seed is given,
+    the GUIDs are made from a random series seeded with it and the name of
+    the feature class, so the same GUIDs are produced every time.
+
+    This is the worker function used by CreateGUIDs(in_python=True), so it
+    does not write any messages itself."""
+
+    t0 = time.time()
+    name = os.path.basename(path)
+    result = {"path":path,"CR_ID":0,"GEOM_ID":0,"rows":0,"missing":[]}
+
+    rand = None
+    if seed is not None:
+        rand = MakeSeededRandom(seed,name)
+
+    existing = [f.name for f in arcpy.ListFields(path)]
+    fields = []
+    if cr_guid:
+        fields.append("CR_ID")
+    if geom_guid:
+        fields.append("GEOM_ID")
+    result["missing"] = [f for f in fields if not f in existing]
+    fields = [f for f in fields if f in existing]
+
+    if fields:
+        with arcpy.da.UpdateCursor(path,fields,subset_query or None) as c:
+            for row in c:
+                result["rows"]+=1
+                changed = False
+                for i,f in enumerate(fields):
+                    if overwrite or row[i] is None or row[i] == '':
+                        row[i] = MakeGUID(rand)
+                        result[f]+=1
+                        changed = True
+                if changed:
+                    c.updateRow(row)
+
+    result["seconds"] = time.time()-t0
+    return result
+
+def CreateGUIDsWithCursors(paths,subset_query='',cr_guid=False,
+    geom_guid=False,overwrite=False,processes=1,seed=None):
+    """Runs CreateGUIDsInFeatureClass on each of the feature classes, in a
+    pool of worker processes if processes is more than 1, and reports the
+    timing for each one.  Returns a tuple of the total CR_IDs and GEOM_IDs
+    created."""
+
+    t0 = time.time()
+    args = [(p,subset_query,cr_guid,geom_guid,overwrite,seed) for p in paths]
+    if processes > 1 and len(paths) > 1:
+        arcpy.AddMessage("  using {0} worker processes".format(processes))
+        pool = MakeProcessPool(processes)
+        try:
+            jobs = [pool.apply_async(CreateGUIDsInFeatureClass,a)
+                for a in args]
+            results = [j.get() for j in jobs]
+        finally:
+            pool.close()
+            pool.join()
     else:
-        return log_path
+        results = [CreateGUIDsInFeatureClass(*a) for a in args]
+
+    crtotal = 0
+    geomtotal = 0
+    rows = 0
+    for r in results:
+        arcpy.AddMessage(os.path.basename(r["path"]))
+        for f in r["missing"]:
+            arcpy.AddWarning("  no {0} field in this feature class".format(f))
+        if r["rows"] == 0:
+            arcpy.AddMessage("  ...no records")
+            continue
+        if cr_guid:
+            arcpy.AddMessage("  {0} CR_ID{1} created".format(
+                r["CR_ID"],"" if r["CR_ID"] == 1 else "s"))
+        if geom_guid:
+            arcpy.AddMessage("  {0} GEOM_ID{1} created".format(
+                r["GEOM_ID"],"" if r["GEOM_ID"] == 1 else "s"))
+        secs = r["seconds"]
+        arcpy.AddMessage("  {0} row{1} in {2:.2f} seconds ({3:,.0f}/sec)".format(
+            r["rows"],"" if r["rows"] == 1 else "s",secs,
+            r["rows"]/secs if secs > 0 else 0))
+        crtotal+=r["CR_ID"]
+        geomtotal+=r["GEOM_ID"]
+        rows+=r["rows"]
+
+    ReportRate("rows in all feature classes",rows,t0)
+    return crtotal, geomtotal
 
 def CreateGUIDs(geodatabase,subset_query='',cr_guid=False,geom_guid=False,
-    overwrite=False):
+    overwrite=False,in_python=False,processes=1,seed=None):
     """ Makes new GUIDs for all features in geodatabase, or all that match
     a subset query if it is supplied.  Old GUIDs can be overwritten, and
     the user may indicate which GUIDs to make.  The CR Link and Catalog
@@ -226,7 +306,14 @@ def CreateGUIDs(geodatabase,subset_query='',cr_guid=False,geom_guid=False,
 
     If CR GUIDs (CR_IDs) are created, they will be analyzed and transferred
     to match multiple geometry representations of a single physical
-    feature."""
+    feature.
+
+    With in_python=True, the GUIDs are made with python's uuid module
+    through one update cursor per feature class, instead of with VB field
+    calculations.  In that mode, processes can be set above 1 to handle
+    the feature classes in a pool of worker processes (this must be run
+    from a script that has an if __name__ == "__main__" block), and a seed
+    can be given to make the same GUIDs every time, for testing."""
 
     try:
         ## intro print statement
@@ -267,42 +354,45 @@ def CreateGUIDs(geodatabase,subset_query='',cr_guid=False,geom_guid=False,
         arcpy.AddMessage("\nCalculating GUIDs in all feature classes...")       
         crtotal = 0
         geomtotal = 0
-        for path in paths:
-            name = os.path.basename(path)
-            arcpy.AddMessage(name)
-
-            fl = "fl"
-            TakeOutTrash(fl)
-            arcpy.management.MakeFeatureLayer(path,fl,subset_query)
-            count = int(arcpy.management.GetCount(fl).getOutput(0))
-            if count == 0:
-                arcpy.AddMessage("  ...no records")
-                continue
+        if in_python:
+            crtotal, geomtotal = CreateGUIDsWithCursors(paths,subset_query,
+                cr_guid,geom_guid,overwrite,processes,seed)
+        else:
+            for path in paths:
+                name = os.path.basename(path)
+                arcpy.AddMessage(name)
 
-            ## make CR_IDs
-            if cr_guid:                
-                if not overwrite:
-                    arcpy.management.SelectLayerByAttribute(fl,"NEW_SELECTION",
-                            '"CR_ID" IS NULL OR "CR_ID" = \'\'')
+                fl = "fl"
+                TakeOutTrash(fl)
+                arcpy.management.MakeFeatureLayer(path,fl,subset_query)
                 count = int(arcpy.management.GetCount(fl).getOutput(0))
-                crtotal+=count
-                arcpy.management.CalculateField(fl, "CR_ID", ex, "VB", cb)
-                arcpy.AddMessage("  {0} CR_ID{1} created".format(
-                    str(count),"" if count == 1 else "s"))
-
-            ## calculate new GUIDs for all selected records
-            if geom_guid:
-                if not overwrite:
-                    arcpy.management.SelectLayerByAttribute(fl,"NEW_SELECTION",
-                            '"GEOM_ID" IS NULL OR "GEOM_ID" = \'\'')
-                count = int(arcpy.management.GetCount(fl).getOutput(0))
-                geomtotal+=count
-                arcpy.management.CalculateField(fl, "CR_ID", ex, "VB", cb)
-                arcpy.AddMessage("  {0} GEOM_ID{1} created".format(
-                    str(count),"" if count == 1 else "s"))
+                if count == 0:
+                    arcpy.AddMessage("  ...no records")
+                    continue
+
+                ## make CR_IDs
+                if cr_guid:                
+                    if not overwrite:
+                        arcpy.management.SelectLayerByAttribute(fl,"NEW_SELECTION",
+                                '"CR_ID" IS NULL OR "CR_ID" = \'\'')
+                    count = int(arcpy.management.GetCount(fl).getOutput(0))
+                    crtotal+=count
+                    arcpy.management.CalculateField(fl, "CR_ID", ex, "VB", cb)
+                    arcpy.AddMessage("  {0} CR_ID{1} created".format(
+                        str(count),"" if count == 1 else "s"))
+
+                ## calculate new GUIDs for all selected records
+                if geom_guid:
+                    if not overwrite:
+                        arcpy.management.SelectLayerByAttribute(fl,"NEW_SELECTION",
+                                '"GEOM_ID" IS NULL OR "GEOM_ID" = \'\'')
+                    count = int(arcpy.management.GetCount(fl).getOutput(0))
+                    geomtotal+=count
+                    arcpy.AddMessage("  {0} GEOM_ID{1} created".format(
+                        str(count),"" if count == 1 else "s"))
                 
-                arcpy.management.CalculateField(fl, "GEOM_ID", ex, "VB", cb)
-            TakeOutTrash(fl)                         
+                    arcpy.management.CalculateField(fl, "GEOM_ID", ex, "VB", cb)
+                TakeOutTrash(fl)                         
 
         arcpy.AddMessage("\nTotal number of CR_IDs: " + str(crtotal) + "\n")
         arcpy.AddMessage("Total number of GEOM_IDs: " + str(geomtotal) + "\n")
@@ -566,13 +656,11 @@ def GetCLI_IDGUIDs(cr_link_path,cli_id_list):
     are in the list of CLI_IDs that is provided.
     """
 
-    list_string = ",".join(["'"+str(i)+"'" for i in cli_id_list])
-    cli_id_qry = '"CLI_ID" IN ({0})'.format(list_string)
-
-    ## use cursor on cr link table to get guids
-    cursor = arcpy.da.SearchCursor(cr_link_path,["CR_ID","CLI_ID"],cli_id_qry)
-    all_guids = [row[0] for row in cursor]
-    del cursor
+    ## use cursors on cr link table to get guids, the cli_ids are queried in
+    ## chunks
+    rows = ReadRowsByIDs(cr_link_path,["CR_ID","CLI_ID"],"CLI_ID",
+        [str(i) for i in cli_id_list])
+    all_guids = [row[0] for row in rows]
 
     return all_guids
 
@@ -580,9 +668,8 @@ def GetGUIDsFromCatalog(catalog_table,cr_guids):
     """Given a set of input CR GUIDs, or CR_IDs, the function will return all
     of the corresponding GEOM_IDs from the catalog table."""
 
-    query = '"CR_ID" IN (\'{0}\')'.format("','".join(cr_guids))
-    cursor = arcpy.da.SearchCursor(catalog_table,("CR_ID","GEOM_ID"),query)
-    geom_ids = [row[1] for row in cursor]
+    rows = ReadRowsByIDs(catalog_table,("CR_ID","GEOM_ID"),"CR_ID",cr_guids)
+    geom_ids = [row[1] for row in rows]
 
     return geom_ids
 
@@ -1138,49 +1225,191 @@ def MergeCRLinkTables(input_table,target_table):
     ## consolite table
     ConsolidateCRLinkTable(target_table)
 
-def ProcessFeatureClass(feature_class,target_gdb):
+def GetGCSTransformations():
+    """Returns the geographic transformations that are used between the
+    NAD27 (4267), NAD83 (4269), and WGS84 (4326) datums, as a dictionary of
+    {frozenset([gcs code,gcs code]):transformation name}."""
+
+    return {frozenset([4267,4269]):'NAD_1927_To_NAD_1983_NADCON',
+            frozenset([4267,4326]):settings['trans-nad27-wgs84'],
+            frozenset([4269,4326]):settings['trans-nad83-wgs84']}
+
+def MigrateFeatureClass(fc_path,target_map,dry_run=False,
+    require_transformation=True):
+    """Moves the features in a scratch or imp_ feature class into the
+    feature classes named by their fclass values.  target_map is a
+    dictionary of {feature class name:path}, see
+    clitools.routing.MakeTargetMap.
+
+    The fclass values are counted first, and the targets are grouped by
+    spatial reference.  For each group, the features with those fclass
+    values are projected once into the scratch geodatabase (only if the
+    datums differ) and read with one cursor, and each row is written right
+    away with the insert cursor for its fclass.  As with Append NO_TEST,
+    values are converted to the target field types; a value that doesn't
+    fit is left empty, and these are counted by field and reported.
+    Returns a dictionary of {target name:count}.
+
+    If there is no geographic transformation for the datums involved, a
+    ValueError is raised, unless require_transformation is False, in which
+    case the cursor reprojects the features without a transformation.
+
+    With dry_run=True, only the fclass values are read, the size of each
+    partition is reported, and nothing is written."""
+
+    with arcpy.da.SearchCursor(fc_path,"fclass") as cursor:
+        counts, nulls = CountValues([r[0] for r in cursor])
+    for value in sorted(counts):
+        if not value in target_map:
+            ct = counts[value]
+            arcpy.AddMessage("  bad fclass value: {0} ({1} feature{2} "\
+                "skipped)".format(value,ct,'' if ct == 1 else 's'))
+    targets = sorted([v for v in counts if v in target_map])
+    if len(targets) == 0:
+        return {}
+
+    if dry_run:
+        for name in targets:
+            ct = counts[name]
+            arcpy.AddMessage("  {0} feature{1} would be added to {2}".format(
+                ct,'' if ct == 1 else 's',name))
+        if not nulls == 0:
+            arcpy.AddMessage("  {0} feature{1} with no fclass value".format(
+                nulls,'' if nulls == 1 else 's'))
+        return dict((name,counts[name]) for name in targets)
+
+    src_sr = arcpy.Describe(fc_path).spatialReference
+    src_fields = CopyableFields([(f.name,f.type,f.editable)
+        for f in arcpy.ListFields(fc_path)])
+    cursor_fields = src_fields + ["SHAPE@","fclass"]
+
+    ## group the targets by spatial reference
+    groups = {}
+    for name in targets:
+        sr = arcpy.Describe(target_map[name]).spatialReference
+        groups.setdefault(sr.exportToString(),(sr,[]))[1].append(name)
+
+    transformations = GetGCSTransformations()
+    result = {}
+    for n,key in enumerate(sorted(groups)):
+        targ_sr, names = groups[key]
+        src_epsg = src_sr.GCS.GCScode
+        targ_epsg = targ_sr.GCS.GCScode
+        try:
+            transformation = ChooseTransformation(src_epsg,targ_epsg,
+                transformations)
+        except ValueError:
+            msg = "Not prepared to project/transform to (or "\
+            "from) one (or both) of the spatial references involved:\n"\
+            "source: {}\n target:{}\nPlease manually project this feature "\
+            "class to a spatial reference that uses NAD83 (EPSG:4269), "\
+            "NAD27 (EPSG:4267), or WGS84 (EPSG:4326), and then re-run "\
+            "this tool".format(src_epsg,targ_epsg)
+            if require_transformation:
+                raise ValueError(msg)
+            arcpy.AddWarning("    no transformation between {} and {}, "\
+                "projecting without one".format(src_sr.name,targ_sr.name))
+            transformation = None
+
+        ## project only the features for the targets that share this
+        ## spatial reference, once.  Project can't write to in_memory, so
+        ## the output goes in the scratch geodatabase.
+        qry = MakeINQuery("fclass",names)
+        src = fc_path
+        fl = "migrate_fl"
+        try:
+            if transformation:
+                arcpy.AddMessage("    projecting from {} to {}".format(
+                    src_sr.name,targ_sr.name))
+                arcpy.AddMessage("    transformation: {}".format(
+                    transformation))
+                TakeOutTrash(fl)
+                arcpy.management.MakeFeatureLayer(fc_path,fl,qry)
+                src = arcpy.CreateUniqueName("migrate_{0}".format(n),
+                    arcpy.env.scratchGDB)
+                arcpy.management.Project(fl,src,targ_sr,transformation)
+
+            ## open an insert cursor on each target, then read the rows for
+            ## these targets in one pass and write each one as it is read
+            writers = {}
+            for name in names:
+                path = target_map[name]
+                targ_types = dict((f.name,(f.name,f.type,f.length))
+                    for f in arcpy.ListFields(path))
+                indices, targ_fields = MatchFields(src_fields,CopyableFields(
+                    [(f.name,f.type,f.editable)
+                    for f in arcpy.ListFields(path)]))
+                writers[name] = [arcpy.da.InsertCursor(path,
+                    targ_fields+["SHAPE@"]),indices,
+                    [targ_types[f] for f in targ_fields],0,{}]
+            a = time.time()
+            try:
+                with arcpy.da.SearchCursor(src,cursor_fields,qry,
+                        targ_sr) as cursor:
+                    for row in cursor:
+                        w = writers.get(row[-1])
+                        if w is None:
+                            continue
+                        w[0].insertRow(ConvertRow(row,w[1],w[2],w[4])+
+                            [row[-2]])
+                        w[3]+=1
+            finally:
+                ## dropping the cursors releases their locks
+                for w in writers.itervalues():
+                    w[0] = None
+            ReportRate("features migrated",sum([w[3] for w in
+                writers.itervalues()]),a)
+
+            for name in names:
+                ct, errors = writers[name][3], writers[name][4]
+                if ct == 0:
+                    continue
+                arcpy.AddMessage("  {0} feature{1} added to {2}".format(
+                    ct,'' if ct == 1 else 's',name))
+                for field in sorted(errors):
+                    arcpy.AddWarning("    {0} value{1} in {2} did not fit "\
+                        "the target field and {3} left empty".format(
+                        errors[field],'' if errors[field] == 1 else 's',field,
+                        "was" if errors[field] == 1 else "were"))
+                result[name] = ct
+
+        finally:
+            TakeOutTrash(fl)
+            if not src == fc_path:
+                TakeOutTrash(src)
+
+    return result
+
+def ProcessFeatureClass(feature_class,target_gdb,dry_run=False):
     '''Takes the features from the input feature class and sorts them based
     on the fclass field value into the appropriate feature class in the
-    provided target_gdb.'''
+    provided target_gdb.  The target paths are listed once, and the features
+    are read and written in one pass per target spatial reference (see
+    MigrateFeatureClass).  As with the Append this replaced, features whose
+    datum has no listed transformation are reprojected without one.  With
+    dry_run=True, the number of features that would go to each feature
+    class is reported and nothing is written.  Returns a dictionary of
+    {feature class name:count}.'''
 
     Print(feature_class)
 
-    stan_fcs = ["crsite_pt","crsite_ln","crsite_py",
-                "crstru_pt","crstru_ln","crstru_py",
-                "crothr_pt","crothr_ln","crothr_py",
-                "crbldg_pt","crbldg_py",
-                "crobj_pt","crobj_ln","crobj_py",
-                "crsurv_pt","crsurv_ln","crsurv_py",
-                "crland_py","crdist_py"]
+    ## only the standard feature classes can be targets
+    target_map = MakeTargetMap([p for p in MakePathList(target_gdb)
+        if os.path.basename(p) in STANDARDS_FCS])
 
-    ## get all of the unique fclass values in the input feature class
-    rows = arcpy.SearchCursor(feature_class,"","","fclass")
-    targets = [i.getValue('fclass') for i in rows if not i == "None"]
+    counts = MigrateFeatureClass(feature_class,target_map,dry_run,
+        require_transformation=False)
 
     ## return function if there are no features with fclass values
-    if len(targets) == 0:
-        Print('  ...no features with an "fclass" value in this feature class.')
-        return
-
-    for fclass in targets:
-
-        ## skip if there is a value value from the fclass field
-        if not fclass in stan_fcs:
-            Print("  bad fclass value: " + fclass)
-            Print("  (any feature with this value will be skipped)" )
-            continue
-
-        TakeOutTrash("fl")
-        fl = arcpy.management.MakeFeatureLayer(
-                            feature_class,"fl",'"fclass" = \'' + fclass + '\'')
-        ct = int(arcpy.management.GetCount(fl).getOutput(0))
-
-        for path in MakePathList(target_gdb):
-            if path.endswith(fclass):
-                arcpy.management.Append(fl,path,"NO_TEST")
+    if len(counts) == 0:
+        Print('  ...no features with a valid "fclass" value in this '\
+            'feature class.')
+        return counts
 
-        Print("  {0} feature{1} appended to {2}".format(
-                                str(ct),'' if ct == 1 else 's',fclass))
+    total = sum(counts.values())
+    Print("  {0} feature{1} {2}".format(total,'' if total == 1 else 's',
+        "to be sorted" if dry_run else "sorted"))
+    return counts
 
 def ProjectGDBtoNAD83(geodatabase,gdbtype,transformation):
     """takes a standards gdb or scratch gdb (this must be specified) and
@@ -1291,8 +1520,8 @@ def ScratchToStandardsGDB(scratch_gdb,feature_classes,target_gdb=False):
 
     arcpy.AddMessage("\nFeatures will be migrated to:\n{0}".format(new_gdb))
 
-    ## make list of all possible paths
-    paths = MakePathList(new_gdb)
+    ## map the names of all possible target feature classes to their paths
+    target_map = MakeTargetMap(MakePathList(new_gdb))
 
     ## iterate through the input feature classes
     scratch_fcs = ["scratch_pt","scratch_ln","scratch_py"]
@@ -1303,83 +1532,16 @@ def ScratchToStandardsGDB(scratch_gdb,feature_classes,target_gdb=False):
         arcpy.AddMessage("\n"+fc)
         
         fc_path = os.path.join(scratch_gdb,fc)
-        total = 0
-
-        cursor = arcpy.da.SearchCursor(fc_path,"fclass")
-        fvals = [s[0] for s in cursor if not s[0] == None]
-        del cursor
-        if len(fvals) == 0:
+        try:
+            counts = MigrateFeatureClass(fc_path,target_map)
+        except ValueError as e:
+            arcpy.AddError(str(e))
+            return
+        total = sum(counts.values())
+        if total == 0:
             arcpy.AddMessage("--no features to migrate--")
             continue
 
-        ## trim down full path list to only include the necessary ones.
-        trimlist = []
-        for fv in fvals:
-            for p in paths:
-                if p.endswith(fv) and not p in trimlist:
-                    trimlist.append(p)
-
-        ## iterate through each potential target feature classes, append any
-        ## features whose fclass values match that target feature class
-        for path in trimlist:
-
-            name = os.path.basename(path)
-            query = '"fclass" = \'' + name + "'"
-            fl = "fl"
-            TakeOutTrash(fl)
-            arcpy.management.MakeFeatureLayer(fc_path,fl,query)
-            ct = int(arcpy.management.GetCount(fl).getOutput(0))
-            if ct == 0:
-                continue
-                
-            arcpy.AddMessage("  {0} feature{1} to be added to {2}".format(
-                ct,'' if ct == 1 else 's',name))
-            
-            src_sr = arcpy.Describe(fc_path).spatialReference
-            src_epsg = src_sr.GCS.GCScode
-            targ_sr = arcpy.Describe(path).spatialReference
-            targ_epsg = targ_sr.GCS.GCScode
-            both_epsgs = [src_epsg,targ_epsg]
-            
-            if src_epsg == targ_epsg:
-                pass
-            ## transform between NAD27 and NAD83
-            elif 4267 in both_epsgs and 4269 in both_epsgs:
-                transformation = 'NAD_1927_To_NAD_1983_NADCON'
-                
-            ## transform between NAD27 and WGS84
-            elif 4267 in both_epsgs and 4326 in both_epsgs:
-                transformation = settings['trans-nad27-wgs84']
-                
-            ## transform between NAD83 and WGS84
-            elif 4269 in both_epsgs and 4326 in both_epsgs:
-                transformation = settings['trans-nad83-wgs84']
-            else:
-                arcpy.AddMessage("Not prepared to project/transform to (or "\
-                "from) one (or both) of the spatial references involved:\n"\
-                "source: {}\n target:{}\nPlease manually project this feature "\
-                "class to a spatial reference that uses NAD83 (EPSG:4269), "\
-                "NAD27 (EPSG:4267), or WGS84 (EPSG:4326), and then re-run "\
-                "this tool".format(src_epsg,targ_epsg))
-                exit()
-                
-            ## transform if the target and source don't match
-            if src_epsg != targ_epsg:
-                arcpy.AddMessage("    projecting from {} to {}".format(src_sr.name,targ_sr.name))
-                arcpy.AddMessage("    transformation: {}".format(transformation))
-                
-                temp_fc = os.path.join(settings['cache'],"temp.shp")
-                TakeOutTrash(temp_fc)
-                arcpy.management.Project(fc_path,temp_fc,targ_sr,transformation)
-                arcpy.management.Append(temp_fc,path,"NO_TEST")
-                TakeOutTrash(temp_fc)
-            ## otherwise, just append
-            else:
-                arcpy.management.Append(fl,path,"NO_TEST")
-
-            arcpy.AddMessage("      ...done")
-            total+=ct
-
         arcpy.AddMessage("  --{0} total feature{1} migrated".format(
                 total,'' if total == 1 else 's'))
 
@@ -1570,9 +1732,107 @@ def StandardsToWGS84(geodatabase):
 
     arcpy.AddMessage("\n--process finished--")
 
-def SyncCRLinkAndCRCatalog(in_gdb):
+def SyncTablesIncremental(feature_classes,catalog_info,cr_link,cr_catalog,
+    cat_fields):
+    """Used by SyncCRLinkAndCRCatalog to apply only the necessary changes to
+    the CR Catalog and CR Link tables.  catalog_info is the dictionary of
+    catalog values for each GEOM_ID that has been collected from the feature
+    classes.  Returns the path to the conflict log, if one was written."""
+
+    ## compare catalog rows with the feature classes
+    arcpy.AddMessage("\nComparing CR_Catalog with feature classes...")
+    t0 = time.time()
+    new_rows = {}
+    for k,v in catalog_info.iteritems():
+        new_rows[k] = (v[0],v[1],k,v[2],v[3],v[4],v[5],v[6],v[7],v[8],v[9])
+    cursor_fields = ("OID@",) + tuple(cat_fields)
+    with arcpy.da.SearchCursor(cr_catalog,cursor_fields) as c:
+        existing = [(r[0],r[1:]) for r in c]
+    diff = DiffCatalog(new_rows,existing)
+
+    updated, deleted = 0, 0
+    if diff["update"] or diff["delete"]:
+        with arcpy.da.UpdateCursor(cr_catalog,cursor_fields) as c:
+            updated, deleted = ApplyRowChanges(c,diff["update"],
+                diff["delete"])
+    if diff["insert"]:
+        with arcpy.da.InsertCursor(cr_catalog,cat_fields) as c:
+            for row in diff["insert"]:
+                c.insertRow(row)
+    inserted = len(diff["insert"])
+
+    for ct,action in [(inserted,"written"),(updated,"updated"),
+        (deleted,"removed that are not in feature classes"),
+        (diff["unchanged"],"unchanged")]:
+        arcpy.AddMessage("  {0} row{1} {2}".format(ct,
+            '' if ct == 1 else 's',action))
+    ReportRate("catalog rows compared",len(existing)+inserted,t0)
+
+    ## collect CR Link rows from the feature classes.  the fields are matched
+    ## by name, the same way that Append with NO_TEST would match them.
+    arcpy.AddMessage("\nComparing CR Link table with feature classes...")
+    t0 = time.time()
+    id_fields = GetCRLinkIdFields(cr_link)
+    link_fields = [f.name for f in arcpy.ListFields(cr_link)
+        if not f.type in ("OID","Geometry","GlobalID")]
+
+    fc_rows = []
+    first_rows = {}
+    for fc in feature_classes:
+        fc_names = dict((f.name.upper(),f.name) for f in arcpy.ListFields(fc))
+        if not "CR_ID" in fc_names:
+            continue
+        shared = [f for f in link_fields if f.upper() in fc_names]
+        read_fields = [fc_names[f.upper()] for f in shared]
+        positions = [shared.index(f) if f in shared else None
+            for f in id_fields]
+        with arcpy.da.SearchCursor(fc,read_fields) as c:
+            for row in c:
+                id_row = tuple(None if i is None else row[i]
+                    for i in positions)
+                fc_rows.append(id_row)
+                if not id_row[0] in first_rows:
+                    first_rows[id_row[0]] = dict(zip(shared,row))
+
+    with arcpy.da.SearchCursor(cr_link,("OID@",) + id_fields) as c:
+        existing = [tuple(r) for r in c]
+
+    fc_cr_ids = set([v[0] for v in catalog_info.itervalues()])
+    diff = DiffCRLink(existing,fc_rows,id_fields,fc_cr_ids or None)
+    link_dict = diff["link_dict"]
+
+    updated, deleted = 0, 0
+    if diff["update"] or diff["delete"]:
+        with arcpy.da.UpdateCursor(cr_link,("OID@",) + id_fields) as c:
+            updated, deleted = ApplyRowChanges(c,diff["update"],
+                diff["delete"],first_index=2)
+    if diff["insert"]:
+        with arcpy.da.InsertCursor(cr_link,link_fields) as c:
+            for cr_id in diff["insert"]:
+                values = first_rows[cr_id]
+                for f,v in zip(id_fields,(cr_id,) + tuple(link_dict[cr_id])):
+                    values[f] = v
+                c.insertRow([values.get(f) for f in link_fields])
+    inserted = len(diff["insert"])
+
+    for ct,action in [(inserted,"written"),(updated,"updated"),
+        (deleted,"removed")]:
+        arcpy.AddMessage("  {0} row{1} {2}".format(ct,
+            '' if ct == 1 else 's',action))
+    ReportRate("CR Link rows compared",len(existing)+len(fc_rows),t0)
+
+    return WriteCRLinkConflictLog(os.path.dirname(cr_link),
+        diff["conflicts"],link_dict)
+
+def SyncCRLinkAndCRCatalog(in_gdb,incremental=False):
     """Analyzes a geodatabase, and creates or updates the
     CR Link table and CR Catalog.  
+
+    With incremental=True, the contents of both tables are compared with the
+    feature classes first, and only the rows that need to be inserted,
+    updated, or deleted are written.  The feature classes are read with
+    search cursors instead of being copied and appended to the CR Link
+    table, but the end result is the same.
     """
 
     arcpy.AddMessage("\nInput Geodatabase:\n{0}".format(in_gdb))
@@ -1748,8 +2008,16 @@ def SyncCRLinkAndCRCatalog(in_gdb):
     arcpy.AddMessage("  total number of features in feature classes: "\
                      +str(len(catalog_info.keys())))
 
+    if incremental:
+        log = SyncTablesIncremental(feature_classes,catalog_info,cr_link,
+            cr_catalog,in_cat_fields)
+        arcpy.AddMessage("\nAll processes finished.\n")
+        if log:
+            os.startfile(log)
+        return
+
     ## get existing GEOM_IDs from CR_Catalog
-    ex_geo_guids = [r[0] for r in arcpy.da.SearchCursor(cr_catalog,"GEOM_ID")]
+    ex_geo_guids = set([r[0] for r in arcpy.da.SearchCursor(cr_catalog,"GEOM_ID")])
     ex_num = len(ex_geo_guids)
 
     ## print number of existing rows if there are any
@@ -1758,14 +2026,17 @@ def SyncCRLinkAndCRCatalog(in_gdb):
             ex_num,"" if ex_num == 1 else "s"))
 
         ## remove any existing rows from catalog if they are not in fcs
-        remove_guids = [i for i in ex_geo_guids if not i in catalog_info.keys()]
+        remove_guids = [i for i in ex_geo_guids if not i in catalog_info]
         n_remove_guids = len(remove_guids)
         if not n_remove_guids == 0:
             tv = "tv"
             TakeOutTrash(tv)
-            query = '"GEOM_ID" IN (\'{0}\')'.format("','".join(remove_guids))
-            arcpy.management.MakeTableView(cr_catalog,tv,query)
-            arcpy.management.DeleteRows(tv)
+            ## one table view per chunk of guids, so an empty selection can
+            ## never stand for the whole table
+            for query in MakeINQueries("GEOM_ID",remove_guids):
+                TakeOutTrash(tv)
+                arcpy.management.MakeTableView(cr_catalog,tv,query)
+                arcpy.management.DeleteRows(tv)
             arcpy.AddMessage("  {0} row{1} removed that are not in feature "\
         "classes".format(n_remove_guids,"" if n_remove_guids == 1 else "s"))
 
@@ -1805,7 +2076,7 @@ def SyncCRLinkAndCRCatalog(in_gdb):
                            '' if counter == 1 else 's'))
     
     ## update CR Link table
-    fc_cr_ids = [catalog_info[i][0] for i in catalog_info.keys()]
+    fc_cr_ids = set([v[0] for v in catalog_info.itervalues()])
     
     ## append all features to the CR Link table
     arcpy.AddMessage("\nAppending all feature classes to the CR Link table...")
@@ -1872,67 +2143,30 @@ def TransferCR_IDs(x,y):
                 "      no overlapping features between feature classes.")
             return
         
-        #create necessary lists/dictionary
-        all_cli_ids = []
-        
-        srows = arcpy.da.SearchCursor(x,"CLI_ID",no_cliid)
-        for srow in srows:
-            cli_id = srow[0]
-            all_cli_ids.append(cli_id)
-        del srows, srow, cli_id
-        problem_cli_ids = {}
-        good_cli_ids = []
-        srows = arcpy.da.SearchCursor(x,["CLI_ID","CR_ID","OBJECTID"],no_cliid)
-        for srow in srows:
-            oid = srow[2]
-            cr_id = srow[1]
-            cli_id = srow[0]
-            if all_cli_ids.count(cli_id) > 1:
-                problem_cli_ids[oid] = cr_id
-            else:
-                good_cli_ids.append(cli_id) 
-        del srows, srow, cli_id, oid, cr_id
-        
-        #update all cr_ids that have only one geometry in the x argument
-        #i.e. those with cli_ids in the good_cli_ids list
-        singles = 0
-        srows = arcpy.da.SearchCursor(x,["CR_ID","CLI_ID"],no_cliid)
-        for srow in srows:
-            cid = srow[1]
-            cr = srow[0]
-            if cid in good_cli_ids:
-                q = "CLI_ID = '" + cid + "'"
-                urows = arcpy.da.UpdateCursor(y,["CR_ID","CLI_ID"],q)
+        ## read the ids and geometries from both layers once, and match the
+        ## overlapping features that share a CLI_ID
+        fields = ["OID@","CLI_ID","CR_ID","SHAPE@"]
+        with arcpy.da.SearchCursor(x,fields,no_cliid) as c:
+            x_features = [tuple(r) for r in c]
+        with arcpy.da.SearchCursor(y,fields,no_cliid) as c:
+            y_features = [tuple(r) for r in c]
+        result = FindCRIDTransfers(x_features,y_features)
+        assignments = result["assignments"]
+
+        ## write all of the new CR_IDs in one pass through y
+        if assignments:
+            with arcpy.da.UpdateCursor(y,["OID@","CR_ID"],no_cliid) as urows:
                 for urow in urows:
-                    singles += 1
-                    urow[0] = cr
-                    urows.updateRow(urow)
-        del cid, cr, srow, srows
+                    if urow[0] in assignments and \
+                       not urow[1] == assignments[urow[0]]:
+                        urow[1] = assignments[urow[0]]
+                        urows.updateRow(urow)
+
+        singles = result["singles"]
         if not singles == 0:
             arcpy.AddMessage("      {0} single geometry feature{1} updated.".format(
                 str(singles),"" if singles == 1 else "s"))
-
-        #update all cr_ids with multiple geometries, those in the problem list
-        #by cycling through each individual feature (using the oid as a selection
-        #query)
-        multiples = 0
-        for oid,cr_id in problem_cli_ids.iteritems():
-            qx = "OBJECTID = " + str(oid)
-            arcpy.management.SelectLayerByAttribute(x,"",qx)
-            arcpy.management.SelectLayerByLocation(y,"INTERSECT",x,"","")
-            srows = arcpy.da.SearchCursor(x,"CLI_ID",no_cliid)
-            for srow in srows:
-                cidx = srow[0]
-                if cidx == None:
-                    continue
-                urows = arcpy.da.UpdateCursor(y,["CLI_ID","CR_ID","OBJECTID"],no_cliid)
-                for urow in urows:
-                    cidy = urow[0]
-                    if cidx == cidy:
-                        multiples += 1
-                        urow[1] = cr_id
-                        urows.updateRow(urow)
-            del srow, srows, urow, urows, cidx, cidy   
+        multiples = result["multiples"]
         if multiples > 0:
             arcpy.AddMessage("      {0} multiple geometry feature{1} updated.".format(
                 str(multiples),"" if multiples == 1 else "s"))
@@ -32,7 +32,9 @@ from .general import (
     TakeOutTrash,
     ConvertContribStatus,
     MakePathList,
-    GetCRLinkAndCRCatalogPath
+    GetCRLinkAndCRCatalogPath,
+    ReadRowsByIDs,
+    SelectByIDs
     )
 
 from .management import (
@@ -42,6 +44,12 @@ from .management import (
     GetGUIDsFromCatalog
     )
 
+from .queries import (
+    MakeORQuery,
+    ChunkValues,
+    MAX_QUERY_CHUNKS
+    )
+
 from .paths import (
     LayerDir,
     FeatureLookupTable,
@@ -389,6 +397,42 @@ def LayerByIDPresence(geodatabase,id_field,map_document,data_frame,query='',
         arcpy.AddMessage(pymsg)
         arcpy.AddMessage(arcpy.GetMessages(1))
 
+def GEOMIDDefinitionQuery(guids,query=''):
+    """Returns the definition query for a layer that shows only the given
+    GEOM_IDs (and matches the extra query, if there is one).  Long GEOM_ID
+    lists are split into several IN (...) lists joined with OR.  An empty
+    list gives a query that matches nothing."""
+
+    if len(guids) == 0:
+        return '"OBJECTID" IS NULL'
+    return MakeORQuery("GEOM_ID",[str(i) for i in guids],query or None)
+
+def GEOMIDLayer(path,guids,query=''):
+    """Returns a layer for the feature class that shows only the features
+    with the given GEOM_IDs (that also match the extra query, if there is
+    one).  Up to MAX_QUERY_CHUNKS chunks of GEOM_IDs, this is a layer on
+    the feature class with a definition query.  Past that, the query would
+    be too long to draw with, so the features are selected chunk by chunk
+    and copied into the scratch geodatabase, and the layer is made from the
+    copy (it is named after the feature class)."""
+
+    if len(ChunkValues([str(i) for i in guids])) <= MAX_QUERY_CHUNKS:
+        lyr = arcpy.mapping.Layer(path)
+        lyr.definitionQuery = GEOMIDDefinitionQuery(guids,query)
+        return lyr
+
+    name = os.path.basename(path)
+    copy = arcpy.CreateUniqueName(name,arcpy.env.scratchGDB)
+    arcpy.management.MakeFeatureLayer(path,"geomid_fl",query)
+    try:
+        SelectByIDs("geomid_fl","GEOM_ID",[str(i) for i in guids])
+        arcpy.management.CopyFeatures("geomid_fl",copy)
+    finally:
+        arcpy.management.Delete("geomid_fl")
+    lyr = arcpy.mapping.Layer(copy)
+    lyr.name = name
+    return lyr
+
 def LayerByCLIContribStatus(geodatabase_path, map_document, data_frame, query='',
                 place_in_group=False, group_name='',label=False,omit_multiples=False):
     """The features in the input paths will be added to the data frame, and
@@ -482,9 +526,9 @@ def LayerByCLIContribStatus(geodatabase_path, map_document, data_frame, query=''
 
         ## use the all_cli_ids list to get contributing statuses from the lookup table
         c1ids,c2ids,c3ids,c4ids,c5ids = [],[],[],[],[]
-        cursor = arcpy.da.SearchCursor(FeatureLookupTable,["CLI_ID","CONTRIB_STATUS"],
-            '"CLI_ID" IN ({0})'.format(",".join(["'"+i+"'" for i in all_cli_ids])))
-        for row in cursor:
+        rows = ReadRowsByIDs(FeatureLookupTable,["CLI_ID","CONTRIB_STATUS"],
+            "CLI_ID",all_cli_ids)
+        for row in rows:
             try:
                 cval = str(row[1]).encode('ascii','ignore')
             except:
@@ -507,7 +551,6 @@ def LayerByCLIContribStatus(geodatabase_path, map_document, data_frame, query=''
             else:
                 if not row[0] in c4ids:
                     c4ids.append(row[0])
-        del cursor
 
         arcpy.AddMessage("Contributing: " + str(len(c1ids)))
         arcpy.AddMessage("Non-Contributing: " + str(len(c2ids)))
@@ -589,7 +632,7 @@ def LayerByCLIContribStatus(geodatabase_path, map_document, data_frame, query=''
             arcpy.AddMessage("  --" + n)
 
             ## get list of GUIDs in this feature class
-            fc_guids = [i[0] for i in arcpy.da.SearchCursor(path,"GEOM_ID",query)]
+            fc_guids = set([i[0] for i in arcpy.da.SearchCursor(path,"GEOM_ID",query)])
 
             ## get guids for features that are multiple geometries
             bad_guids = []
@@ -598,21 +641,14 @@ def LayerByCLIContribStatus(geodatabase_path, map_document, data_frame, query=''
                 arcpy.AddMessage("  checking for multiple geometries...")
                 bad_guids = GetMultiplesGUIDs(path,query)[0]
 
-            undesirables = bad_guids + bound_guids
+            undesirables = set(bad_guids + bound_guids)
             shape = arcpy.Describe(path).shapeType.lower()
             
 
             if not len(c1ids) == 0:
                 
                 good_guids = [i for i in guids1 if not i in undesirables and i in fc_guids]
-                list_string = "','".join([str(i) for i in good_guids])
-                if len(good_guids) == 0:
-                        qry = '"OBJECTID" IS NULL'
-                else:
-                    qry = '"GEOM_ID" IN (\'{0}\'){1}'.format(list_string," AND " + query if 
-                            not query == '' else '')
-                lyr1 = arcpy.mapping.Layer(path)
-                lyr1.definitionQuery = qry
+                lyr1 = GEOMIDLayer(path,good_guids,query)
                 ct = int(arcpy.management.GetCount(lyr1).getOutput(0))
                 if not ct == 0:
                     s = r"{0}\cont1_{1}.lyr".format(LayerDir,shape)
@@ -622,14 +658,7 @@ def LayerByCLIContribStatus(geodatabase_path, map_document, data_frame, query=''
             if not len(c2ids) == 0:
                
                 good_guids = [i for i in guids2 if not i in undesirables and i in fc_guids]
-                list_string = "','".join([str(i) for i in good_guids])
-                if len(good_guids) == 0:
-                        qry = '"OBJECTID" IS NULL'
-                else:
-                    qry = '"GEOM_ID" IN (\'{0}\'){1}'.format(list_string," AND " + query if 
-                            not query == '' else '')
-                lyr2 = arcpy.mapping.Layer(path)
-                lyr2.definitionQuery = qry
+                lyr2 = GEOMIDLayer(path,good_guids,query)
                 ct = int(arcpy.management.GetCount(lyr2).getOutput(0))
                 if not ct == 0:
                     s = r"{0}\cont2_{1}.lyr".format(LayerDir,shape)
@@ -639,14 +668,7 @@ def LayerByCLIContribStatus(geodatabase_path, map_document, data_frame, query=''
             if not len(c5ids) == 0:
                 
                 good_guids = [i for i in guids5 if not i in undesirables and i in fc_guids]
-                list_string = "','".join([str(i) for i in good_guids])
-                if len(good_guids) == 0:
-                        qry = '"OBJECTID" IS NULL'
-                else:
-                    qry = '"GEOM_ID" IN (\'{0}\'){1}'.format(list_string," AND " + query if 
-                            not query == '' else '')
-                lyr5 = arcpy.mapping.Layer(path)
-                lyr5.definitionQuery = qry
+                lyr5 = GEOMIDLayer(path,good_guids,query)
                 ct = int(arcpy.management.GetCount(lyr5).getOutput(0))
                 if not ct == 0:
                     s = r"{0}\cont5_{1}.lyr".format(LayerDir,shape)
@@ -656,14 +678,7 @@ def LayerByCLIContribStatus(geodatabase_path, map_document, data_frame, query=''
             if not len(c3ids) == 0:
                 
                 good_guids = [i for i in guids3 if not i in undesirables and i in fc_guids]
-                list_string = "','".join([str(i) for i in good_guids])
-                if len(good_guids) == 0:
-                        qry = '"OBJECTID" IS NULL'
-                else:
-                    qry = '"GEOM_ID" IN (\'{0}\'){1}'.format(list_string," AND " + query if 
-                            not query == '' else '')
-                lyr3 = arcpy.mapping.Layer(path)
-                lyr3.definitionQuery = qry
+                lyr3 = GEOMIDLayer(path,good_guids,query)
                 ct = int(arcpy.management.GetCount(lyr3).getOutput(0))
                 if not ct == 0:
                     s = r"{0}\cont3_{1}.lyr".format(LayerDir,shape)
@@ -673,14 +688,7 @@ def LayerByCLIContribStatus(geodatabase_path, map_document, data_frame, query=''
             if not len(c4ids) == 0:
                 
                 good_guids = [i for i in guids4 if not i in undesirables and i in fc_guids]
-                list_string = "','".join([str(i) for i in good_guids])
-                if len(good_guids) == 0:
-                        qry = '"OBJECTID" IS NULL'
-                else:
-                    qry = '"GEOM_ID" IN (\'{0}\'){1}'.format(list_string," AND " + query if 
-                            not query == '' else '')
-                lyr4 = arcpy.mapping.Layer(path)
-                lyr4.definitionQuery = qry
+                lyr4 = GEOMIDLayer(path,good_guids,query)
                 ct = int(arcpy.management.GetCount(lyr4).getOutput(0))
                 if not ct == 0:
                     s = r"{0}\cont4_{1}.lyr".format(LayerDir,shape)
@@ -1241,18 +1249,14 @@ def UpdateCLIFieldsInLayer(layer):
             arcpy.AddError("\nMissing these necessary fields:\n"+",".join(m))
             return
             
-        ## make query
+        ## get cli_ids from the layer
         cli_ids = [i[0] for i in arcpy.da.SearchCursor(layer,"CLI_ID")]
         if len(cli_ids) == 0:
             arcpy.AddError("\nNo CLI_IDs in input layer\n")
             return
-        qry = '"CLI_ID" IN (' + ",".join(['\'{0}\''.format(i) for i in cli_ids]) + ")"
-        
+
         ## access feature table to get field names
-        tv = "tv"
-        TakeOutTrash(tv)
-        arcpy.management.MakeTableView(FeatureLookupTable,tv,qry)
-        table_fields = [g.name for g in arcpy.ListFields(tv)]
+        table_fields = [g.name for g in arcpy.ListFields(FeatureLookupTable)]
         
         ## more field checking and dealing with different names in different tables
         p_id_fields = ["LCS_ID","FMSS_ID","FMSS_Asset_ID","ASMIS_ID","ASMIS_Name","HS_ID","NRIS_ID","NHL_ID","NAB_ID"]
@@ -1273,9 +1277,10 @@ def UpdateCLIFieldsInLayer(layer):
             l_cur_fields.append("UNIT_TYPE")
             t_cur_fields.append("PARK_TYPE")
 
-        ## make dictionary from table
+        ## make dictionary from table, the cli_ids are queried in chunks
         info = {}
-        for row in arcpy.da.SearchCursor(tv,t_cur_fields):
+        for row in ReadRowsByIDs(FeatureLookupTable,t_cur_fields,"CLI_ID",
+                cli_ids):
             for ind,nm in enumerate(t_cur_fields):
                 val = row[ind]
                 if nm == "CONTRIB_STATUS":
@@ -1289,13 +1294,11 @@ def UpdateCLIFieldsInLayer(layer):
         ds = layer.dataSource.lower()
         if "dist" in ds or "site_py" in ds:
             arcpy.AddMessage("    --checking for boundary features--")
-            tv = "tv"
-            TakeOutTrash(tv)
-            qry2 = '"CLI_NUM" IN (' + ",".join(['\'{0}\''.format(i) for i in cli_ids]) + ")"
-            arcpy.management.MakeTableView(UnitLookupTable,tv,qry2)
             nums = []
-            if int(arcpy.management.GetCount(tv).getOutput(0)) > 0:
-                for row in arcpy.da.SearchCursor(tv,t_cur_fields):
+            unit_rows = ReadRowsByIDs(UnitLookupTable,t_cur_fields,"CLI_NUM",
+                cli_ids)
+            if len(unit_rows) > 0:
+                for row in unit_rows:
                     cli_num = row[0]
                     if cli_num in nums:
                         continue
@@ -0,0 +1,112 @@
+__doc__ = \
+"""Contains the pure python parts of the ID list queries that are used on
+the enterprise and geodatabase tables.  Nothing in this module uses arcpy.
+
+Long lists of CLI_IDs, CR_IDs, or GEOM_IDs are split into chunks, and one
+"FIELD" IN (...) where clause is made for each chunk, so that no single
+query grows past MAX_IDS_IN_QUERY values.  The selections and cursors that
+run these queries are in clitools.general (SelectByIDs and ReadRowsByIDs).
+
+from clitools.queries import MakeINQueries
+
+print MakeINQueries("CLI_ID",["a","b","c"],chunk_size=2)
+>> ['"CLI_ID" IN (\\'a\\',\\'b\\')', '"CLI_ID" IN (\\'c\\')']
+"""
+
+## the most values that are put in one IN (...) list
+MAX_IDS_IN_QUERY = 500
+
+## above this many chunks, ReadRowsByIDs reads the whole table once and
+## filters the rows in python instead of running one cursor per chunk
+MAX_QUERY_CHUNKS = 40
+
+def QuoteValue(value):
+    '''Returns a value as a quoted sql string, with any single quotes in it
+    doubled.'''
+
+    if not isinstance(value,basestring):
+        value = str(value)
+    return "'" + value.replace("'","''") + "'"
+
+def UniqueValues(values):
+    '''Returns a list of the values with the duplicates and NULL values
+    removed, in the order they were first found.'''
+
+    seen = set()
+    unique = []
+    for v in values:
+        if v is None or v in seen:
+            continue
+        seen.add(v)
+        unique.append(v)
+    return unique
+
+def ChunkValues(values,chunk_size=MAX_IDS_IN_QUERY):
+    '''Splits the unique values into lists of no more than chunk_size
+    values each.  An empty input gives an empty list.'''
+
+    values = UniqueValues(values)
+    if not chunk_size > 0:
+        chunk_size = MAX_IDS_IN_QUERY
+    return [values[i:i+chunk_size] for i in xrange(0,len(values),chunk_size)]
+
+def MakeINQuery(field,values,extra_query=None):
+    '''Returns a "FIELD" IN (...) where clause for the values.  An empty
+    list of values gives IN (''), which matches nothing, as the queries
+    that were joined together by hand always did.  If an extra_query is
+    given, it is added with AND.'''
+
+    if len(values) == 0:
+        qry = '"{0}" IN (\'\')'.format(field)
+    else:
+        qry = '"{0}" IN ({1})'.format(field,
+            ",".join([QuoteValue(v) for v in values]))
+    if extra_query:
+        qry = "{0} AND ({1})".format(qry,extra_query)
+    return qry
+
+def MakeINQueries(field,values,extra_query=None,
+                  chunk_size=MAX_IDS_IN_QUERY):
+    '''Returns a list of where clauses that together match all of the
+    values, one for each chunk.  There is always at least one query.'''
+
+    chunks = ChunkValues(values,chunk_size)
+    if len(chunks) == 0:
+        chunks = [[]]
+    return [MakeINQuery(field,c,extra_query) for c in chunks]
+
+def MakeORQuery(field,values,extra_query=None,chunk_size=MAX_IDS_IN_QUERY):
+    '''Returns a single where clause that matches all of the values, with
+    one "FIELD" IN (...) list per chunk joined by OR.  This is for layer
+    definition queries, which can't be run as a series of selections the
+    way SelectByIDs does.  If an extra_query is given, it is added once
+    with AND.'''
+
+    chunks = ChunkValues(values,chunk_size)
+    if len(chunks) == 0:
+        chunks = [[]]
+    qry = " OR ".join([MakeINQuery(field,c) for c in chunks])
+    if len(chunks) > 1:
+        qry = "({0})".format(qry)
+    if extra_query:
+        qry = "{0} AND ({1})".format(qry,extra_query)
+    return qry
+
+def MakeRangeQueries(field,values,chunk_size=MAX_IDS_IN_QUERY):
+    '''Sorts the unique values (usually OBJECTIDs) and splits them into
+    chunks of no more than chunk_size values, and returns one
+    "FIELD" >= first AND "FIELD" <= last where clause for each chunk.  The
+    clauses don't grow with the chunk size, and together they cover all of
+    the values.  An empty input gives an empty list.'''
+
+    chunks = ChunkValues(sorted(set(values)),chunk_size)
+    return ['"{0}" >= {1} AND "{0}" <= {2}'.format(field,c[0],c[-1])
+        for c in chunks]
+
+def FilterRowsByValues(rows,values,index=0):
+    '''Returns the rows whose value at index is one of the values, in a
+    single pass; this is the same result as running the IN queries, for use
+    when there are too many chunks to query one by one.'''
+
+    keep = set(values)
+    return [tuple(r) for r in rows if r[index] in keep]
@@ -0,0 +1,172 @@
+__doc__ = \
+"""Contains a set of small table reader classes that are used to pull rows
+out of the lookup tables (and other tables) that the clitools package relies
+on.  Every reader has the same two methods:
+
+    GetStamp()                  returns a value that changes whenever the
+                                underlying table changes (or None if no
+                                stamp can be determined)
+    ReadRows(fields,order_by)   yields one tuple per row, with values in
+                                the same order as the fields list
+
+The ArcpyTableReader is used by default.  The CSVTableReader and
+SQLiteTableReader can be swapped in to run the same code against a plain
+text or SQLite copy of a table, which is useful outside of ArcGIS (for
+example, when testing on a machine that does not have arcpy).  This module
+does not import arcpy until an ArcpyTableReader actually reads a table.
+
+from clitools.readers import CSVTableReader
+
+reader = CSVTableReader(r"C:\CLI_GIS\UnitInfoLookup.csv")
+for row in reader.ReadRows(["CLI_NUM","CLI_NAME"],order_by=["CLI_NUM"]):
+    print row
+"""
+
+import os
+import csv
+import sqlite3
+
+def _SortKey(row):
+    '''Sort key that keeps NULL values from breaking the comparison of
+    text values.'''
+    return tuple(u'' if v is None else v for v in row)
+
+def SortRows(rows,fields,order_by):
+    '''Sorts a list of row tuples in place by the fields in the order_by
+    list.  This mirrors the "ORDER BY" sql clauses used with arcpy cursors
+    throughout the package, and is used wherever the database can't be
+    trusted to do the sorting.'''
+
+    if not order_by:
+        return rows
+    indices = [fields.index(f) for f in order_by]
+    rows.sort(key=lambda r: _SortKey([r[i] for i in indices]))
+    return rows
+
+class ArcpyTableReader(object):
+    """Reads rows from a geodatabase table with an arcpy.da.SearchCursor.
+    The stamp is taken from the modification times of the files in the
+    containing file geodatabase, so it changes whenever any table in that
+    geodatabase is rewritten."""
+
+    def __init__(self,table_path):
+
+        self.path = table_path
+        self.name = os.path.basename(table_path)
+
+    def GetStamp(self):
+        '''Returns a string made from the newest modification time in the
+        file geodatabase and the number of files in it.  Returns None for
+        anything that isn't a file geodatabase on disk.'''
+
+        gdb = os.path.dirname(self.path)
+        if not gdb.lower().endswith(".gdb") or not os.path.isdir(gdb):
+            return None
+        files = [f for f in os.listdir(gdb) if not f.endswith(".lock")]
+        if len(files) == 0:
+            return None
+        newest = max([os.path.getmtime(os.path.join(gdb,f)) for f in files])
+        return "{0:.6f}-{1}".format(newest,len(files))
+
+    def ReadRows(self,fields,order_by=None,where_clause=None):
+        '''Yields a tuple for each row in the table, as the cursor reads it.
+        The sorting is left to the database with an ORDER BY sql_clause.
+        Only if the workspace rejects the sql_clause are the rows read
+        without it and sorted here with SortRows.'''
+
+        import arcpy
+
+        if order_by:
+            sql = (None,"ORDER BY " + ",".join(order_by))
+
+            ## use try/except statements in case the sql_clause argument makes trouble
+            try:
+                rows = arcpy.da.SearchCursor(self.path,fields,where_clause,
+                    sql_clause=sql)
+            except:
+                rows = arcpy.da.SearchCursor(self.path,fields,where_clause)
+                result = [tuple(row) for row in rows]
+                del rows
+                rows = SortRows(result,fields,order_by)
+        else:
+            rows = arcpy.da.SearchCursor(self.path,fields,where_clause)
+
+        for row in rows:
+            yield tuple(row)
+        del rows
+
+class CSVTableReader(object):
+    """Reads rows from a csv file that has a header row with the field
+    names.  Empty cells are returned as None (NULL), and all other values
+    are returned as unicode, as they would be from a geodatabase table."""
+
+    def __init__(self,csv_path,encoding="utf-8"):
+
+        self.path = csv_path
+        self.name = os.path.splitext(os.path.basename(csv_path))[0]
+        self.encoding = encoding
+
+    def GetStamp(self):
+        '''Returns the modification time of the csv file.'''
+
+        if not os.path.isfile(self.path):
+            return None
+        return "{0:.6f}".format(os.path.getmtime(self.path))
+
+    def ReadRows(self,fields,order_by=None,where_clause=None):
+        '''Yields a tuple for each row in the file.  The where_clause is
+        not supported for csv files.'''
+
+        if where_clause:
+            raise ValueError("where clauses are not supported by the "\
+                "CSVTableReader")
+
+        result = []
+        with open(self.path,"rb") as f:
+            for row in csv.DictReader(f):
+                vals = []
+                for field in fields:
+                    v = row[field]
+                    if v is None or v == "":
+                        vals.append(None)
+                    else:
+                        vals.append(v.decode(self.encoding))
+                result.append(tuple(vals))
+
+        for row in SortRows(result,fields,order_by):
+            yield row
+
+class SQLiteTableReader(object):
+    """Reads rows from a table in a SQLite database.  The table name
+    defaults to the name of the database file."""
+
+    def __init__(self,db_path,table_name=None):
+
+        self.path = db_path
+        if table_name is None:
+            table_name = os.path.splitext(os.path.basename(db_path))[0]
+        self.name = table_name
+
+    def GetStamp(self):
+        '''Returns the modification time of the database file.'''
+
+        if not os.path.isfile(self.path):
+            return None
+        return "{0:.6f}".format(os.path.getmtime(self.path))
+
+    def ReadRows(self,fields,order_by=None,where_clause=None):
+        '''Yields a tuple for each row in the table.'''
+
+        sql = 'SELECT {0} FROM "{1}"'.format(
+            ",".join(['"{0}"'.format(f) for f in fields]),self.name)
+        if where_clause:
+            sql += " WHERE " + where_clause
+
+        conn = sqlite3.connect(self.path)
+        try:
+            result = [tuple(row) for row in conn.execute(sql)]
+        finally:
+            conn.close()
+
+        for row in SortRows(result,fields,order_by):
+            yield row
@@ -0,0 +1,343 @@
+__doc__ = \
+"""Contains the pure python parts of the landscape summary spreadsheets in
+clitools.summarize.  Nothing in this module uses arcpy or xlwt: the
+summarize functions read the feature rows from the FeatureInfoLookup index
+and the drafted feature counts from the geodatabase up front, and the
+statistics for each park and its landscapes are computed from them here.
+This means the parks can be handed out to a pool of worker processes, and
+the same code can be run against plain lists of rows:
+
+from clitools.reports import ParkStats
+
+rows = [("1","Contributing","Buildings and Structures"),
+        ("2","Non Contributing","Vegetation")]
+park = ParkStats("SLBE",[("500003",rows,[1,1,True])])
+print park["landscapes"]["500003"]["contrib"]
+>> [1, 1, '100.0']
+
+The SummaryTable class holds the counts for all of the rows of a summary
+sheet in columns, and computes the totals, percentages, and percentage
+styles for whole columns at once.  It uses numpy arrays if numpy can be
+imported (it is installed with ArcGIS), and plain lists if not.
+"""
+
+try:
+    import numpy
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+## the percentage buckets used to color the percentage cells, the lower
+## bounds of the "mid" and "high" buckets
+PERC_BUCKET_BOUNDS = (50,75)
+
+def MakePercentage(partial_num,whole_num):
+    '''Creates a formatted percentage based on two numbers.  It is used to
+    deal with 0 value inputs.
+
+    Param1: partial number
+    Param2: full number
+
+    The output is a string in this format: %xx.xx
+    '''
+
+    if partial_num == whole_num:
+        return "100.0"
+    elif int(partial_num) == 0:
+        return "00.00"
+    return FormatPercentage(float(partial_num)*100/whole_num)
+
+def FormatPercentage(num):
+    '''Formats a percentage number the way MakePercentage() does, cutting
+    it off (not rounding) after two decimal places.'''
+
+    if str(num)[1] == ".":
+        perc = "0"+str(num)[:4]
+    else:
+        perc = str(num)[:str(num).find(".")+3]
+    if not len(perc) == 5:
+        perc+="0"
+    return perc
+
+def PercentageBucket(perc):
+    '''Returns 0, 1, or 2 for a percentage string from MakePercentage(),
+    for under 50%, 50% to 75%, and 75% or more.'''
+
+    if perc == "00.00":
+        return 0
+    n = float(perc)
+    if n < PERC_BUCKET_BOUNDS[0]:
+        return 0
+    elif n < PERC_BUCKET_BOUNDS[1]:
+        return 1
+    return 2
+
+def CountExpectedFeatures(rows,exclude_arch=False):
+    '''Counts the features that the CLI database expects for a landscape.
+    rows holds (CLI_ID,CONTRIB_STATUS,LAND_CHAR) tuples; a CLI_ID that is
+    listed more than once is counted once, with its last row deciding
+    whether it is contributing.  Returns a tuple of (all,contributing).'''
+
+    features = dict((r[0],r[1:]) for r in rows)
+    if exclude_arch:
+        features = dict((k,v) for k,v in features.iteritems()
+            if not v[1] == "Archeological Sites")
+    contrib = len([v for v in features.itervalues()
+        if v[0] == "Contributing"])
+    return len(features), contrib
+
+def LandscapeStats(rows,drafted,exclude_arch=False):
+    '''Returns the statistics for one landscape as a dictionary with these
+    keys:
+        "all"       [features expected,features drafted,percentage]
+        "contrib"   the same, for contributing features only
+        "boundary"  True if the landscape boundary has been drafted
+
+    rows are the landscape's feature rows (see CountExpectedFeatures), and
+    drafted is its [ct_all,ct_contrib,boundary] list from
+    clitools.general.CountDraftedFeatures.'''
+
+    all_ct, contrib_ct = CountExpectedFeatures(rows,exclude_arch)
+    return {"all":[all_ct,drafted[0],MakePercentage(drafted[0],all_ct)],
+        "contrib":[contrib_ct,drafted[1],MakePercentage(drafted[1],contrib_ct)],
+        "boundary":drafted[2]}
+
+def ParkStats(park_code,landscapes,exclude_arch=False):
+    '''Computes the statistics for a park and each of its landscapes.
+    landscapes is a list of (CLI_NUM,feature rows,drafted counts) tuples
+    for every landscape in the park; drafted counts are None for any
+    landscape that wasn't counted, and it is left out of the results.
+
+    The park's expected feature counts always include archeological sites,
+    and the full list of feature rows is used for the total.  Returns a
+    dictionary with these keys:
+        "code"          the park alpha code
+        "landscapes"    {CLI_NUM:LandscapeStats()}
+        "all"           [features expected,features drafted,percentage]
+        "contrib"       the same, for contributing features only'''
+
+    stats = {}
+    park_total_ct = 0
+    park_contrib_ct = 0
+    for cli_num,rows,drafted in landscapes:
+        park_total_ct += len(rows)
+        park_contrib_ct += CountExpectedFeatures(rows)[1]
+        if drafted is not None:
+            stats[cli_num] = LandscapeStats(rows,drafted,exclude_arch)
+
+    park_done_ct = sum([s["all"][1] for s in stats.itervalues()])
+    park_contrib_done_ct = sum([s["contrib"][1] for s in stats.itervalues()])
+
+    return {"code":park_code,"landscapes":stats,
+        "all":[park_total_ct,park_done_ct,
+            MakePercentage(park_done_ct,park_total_ct)],
+        "contrib":[park_contrib_ct,park_contrib_done_ct,
+            MakePercentage(park_contrib_done_ct,park_contrib_ct)]}
+
+def SumStats(stats,key):
+    '''Returns the [expected,drafted,percentage] totals for the "all" or
+    "contrib" key of any number of LandscapeStats() or ParkStats()
+    results.'''
+
+    expected = sum([s[key][0] for s in stats])
+    done = sum([s[key][1] for s in stats])
+    return [expected,done,MakePercentage(done,expected)]
+
+## the dataset names that are shown in a single landscape spreadsheet for the
+## feature classes in a standards geodatabase (by the first six characters of
+## the feature class name)
+FCLASS_DATASETS = {"crsite":"Site",
+                   "crothr":"Other",
+                   "crstru":"Structure",
+                   "crobj_":"Object",
+                   "crbldg":"Building",
+                   "crsurv":"Survey",
+                   "crdist":"District",
+                   "crland":"Landscape (deprecated value)"}
+
+def MakeLandscapeBucket(cli_ids):
+    '''Returns an empty bucket for the features of one landscape, given the
+    list of CLI_IDs that are expected in it.  BucketLandscapeFeatures()
+    fills in the other keys:
+        "boundary"      True once the landscape boundary has been found
+        "geometries"    set of (CLI_ID,geometry column) tuples, where the
+                        column is 0, 1, or 2 for point, line, or polygon
+        "datasets"      {CLI_ID:dataset name}, the last one found is kept
+        "errors"        list of (CLI_ID,feature class,OBJECTID) tuples for
+                        features whose CLI_ID isn't expected'''
+
+    return {"expected":set(cli_ids),"boundary":False,"geometries":set(),
+        "datasets":{},"errors":[]}
+
+def BucketLandscapeFeatures(rows,buckets,fc_name,col_num,dataset=None):
+    '''Sorts the rows of one feature class into the buckets, which are
+    {CLI_NUM:MakeLandscapeBucket()}.  Each row holds the CLI_NUM, CLI_ID,
+    and OBJECTID of a feature, followed by its fclass value if dataset is
+    None (in a scratch geodatabase the dataset is taken from fclass).  Rows
+    for any other landscapes are skipped.'''
+
+    for row in rows:
+        bucket = buckets.get(row[0])
+        if bucket is None:
+            continue
+        cli_id = row[1]
+
+        ## skip if this is the boundary feature
+        if cli_id == row[0]:
+            bucket["boundary"] = True
+            continue
+
+        if not cli_id in bucket["expected"]:
+            bucket["errors"].append((cli_id,fc_name,row[2]))
+            continue
+
+        if dataset is None:
+            bucket["datasets"][cli_id] = str(row[3])[:6]
+        else:
+            bucket["datasets"][cli_id] = dataset
+        bucket["geometries"].add((cli_id,col_num))
+
+class SummaryTable(object):
+    """Holds integer count columns for the rows of a summary sheet, one row
+    per key (e.g. CLI_NUM), and computes column totals, percentages, and
+    percentage buckets for whole columns at once.  The columns are numpy
+    arrays when numpy is available, and lists otherwise; use_numpy=False
+    forces the pure python version.
+
+    table = SummaryTable(["500003","500004"],{"done":[1,3],"expected":[2,4]})
+    print table.Percentages("done","expected")
+    >> ['50.00', '75.00']"""
+
+    def __init__(self,keys,columns,use_numpy=True):
+
+        self.keys = list(keys)
+        self.use_numpy = use_numpy and NUMPY_AVAILABLE
+        self.columns = {}
+        for name,values in columns.iteritems():
+            if not len(values) == len(self.keys):
+                raise ValueError("column {0} has {1} values for {2} "\
+                    "keys".format(name,len(values),len(self.keys)))
+            if self.use_numpy:
+                self.columns[name] = numpy.array(values,dtype=numpy.int64)
+            else:
+                self.columns[name] = list(values)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def FromStats(cls,stats,keys=None,use_numpy=True):
+        '''Makes a table from a dictionary of {key:LandscapeStats()} or
+        {key:ParkStats()}, with "all_expected", "all_done",
+        "contrib_expected", and "contrib_done" columns.  The rows are in the
+        order of keys, or sorted by key if keys is not given.'''
+
+        if keys is None:
+            keys = sorted(stats)
+        columns = {}
+        for name in ("all","contrib"):
+            columns[name + "_expected"] = [stats[k][name][0] for k in keys]
+            columns[name + "_done"] = [stats[k][name][1] for k in keys]
+        return cls(keys,columns,use_numpy)
+
+    def Subset(self,keys):
+        '''Returns a new table with only the rows for the given keys, in
+        that order.'''
+
+        index = dict((k,n) for n,k in enumerate(self.keys))
+        rows = [index[k] for k in keys]
+        table = SummaryTable(keys,{},self.use_numpy)
+        for name,col in self.columns.iteritems():
+            if self.use_numpy:
+                table.columns[name] = col[rows]
+            else:
+                table.columns[name] = [col[n] for n in rows]
+        return table
+
+    def Values(self,name):
+        '''Returns one column as a list of python ints.'''
+
+        if self.use_numpy:
+            return self.columns[name].tolist()
+        return list(self.columns[name])
+
+    def Text(self,name):
+        '''Returns one column as a list of strings.'''
+
+        return [str(v) for v in self.Values(name)]
+
+    def Total(self,name):
+        '''Returns the sum of a column.'''
+
+        if self.use_numpy:
+            return int(self.columns[name].sum())
+        return sum(self.columns[name])
+
+    def Totals(self,done,expected):
+        '''Returns [expected,done,percentage] for the sums of two columns,
+        in the same form as the "all" and "contrib" values of
+        LandscapeStats().'''
+
+        e = self.Total(expected)
+        d = self.Total(done)
+        return [e,d,MakePercentage(d,e)]
+
+    def _Complete(self,done,expected):
+        '''Returns a list of True/False for each row, True where the done
+        count equals the expected count.'''
+
+        if self.use_numpy:
+            return (self.columns[done] == self.columns[expected]).tolist()
+        return [x == y for x,y in zip(self.columns[done],
+            self.columns[expected])]
+
+    def _Ratios(self,done,expected):
+        '''Returns done*100/expected for each row as a list of floats, with
+        None for the rows that MakePercentage() doesn't divide (the done
+        count is 0 or equal to the expected count).'''
+
+        d = self.columns[done]
+        e = self.columns[expected]
+        if self.use_numpy:
+            special = (d == e) | (d == 0)
+            if (e[~special] == 0).any():
+                raise ZeroDivisionError("float division by zero")
+            safe = numpy.where(special,1,e)
+            nums = (d.astype(numpy.float64)*100/safe).tolist()
+            return [None if s else n for s,n in zip(special.tolist(),nums)]
+        return [None if (x == y or x == 0) else float(x)*100/y
+            for x,y in zip(d,e)]
+
+    def Percentages(self,done,expected):
+        '''Returns the MakePercentage() string for each row, from a done
+        column and an expected column.'''
+
+        complete = self._Complete(done,expected)
+        result = []
+        for n,num in enumerate(self._Ratios(done,expected)):
+            if num is not None:
+                result.append(FormatPercentage(num))
+            elif complete[n]:
+                result.append("100.0")
+            else:
+                result.append("00.00")
+        return result
+
+    def Buckets(self,done,expected):
+        '''Returns the PercentageBucket() of each row's percentage, from a
+        done column and an expected column.  The percentages are cut off,
+        not rounded, so the bucket of the unformatted ratio is the same.'''
+
+        complete = self._Complete(done,expected)
+        low, high = PERC_BUCKET_BOUNDS
+        buckets = []
+        for n,num in enumerate(self._Ratios(done,expected)):
+            if num is None:
+                buckets.append(2 if complete[n] else 0)
+            elif num < low:
+                buckets.append(0)
+            elif num < high:
+                buckets.append(1)
+            else:
+                buckets.append(2)
+        return buckets
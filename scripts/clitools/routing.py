@@ -0,0 +1,172 @@
+__doc__ = \
+"""Contains the pure python parts of moving features from a scratch (or
+imp_) feature class into the CLI Standards feature classes named by their
+fclass values (see ScratchToStandardsGDB and ProcessFeatureClass in
+clitools.management).  Nothing in this module uses arcpy.
+
+from clitools.routing import PartitionRows
+
+rows = [(1,"crbldg_pt"),(2,"crbldg_py"),(3,"crbldg_pt"),(4,"bldg")]
+parts, skipped, nulls = PartitionRows(rows,1,["crbldg_pt","crbldg_py"])
+print dict((k,len(v)) for k,v in parts.iteritems()), skipped
+>> {'crbldg_pt': 2, 'crbldg_py': 1} {'bldg': 1}
+"""
+
+import os
+import datetime
+
+## the feature classes in a CLI Standards geodatabase that an fclass value
+## can name
+STANDARDS_FCS = ["crsite_pt","crsite_ln","crsite_py",
+                 "crstru_pt","crstru_ln","crstru_py",
+                 "crothr_pt","crothr_ln","crothr_py",
+                 "crbldg_pt","crbldg_py",
+                 "crobj_pt","crobj_ln","crobj_py",
+                 "crsurv_pt","crsurv_ln","crsurv_py",
+                 "crland_py","crdist_py"]
+
+## fields that are never copied from one feature class to another; the
+## geometry is copied separately with the SHAPE@ token
+SKIP_FIELD_TYPES = ("OID","Geometry","GlobalID","Raster","Blob")
+SKIP_FIELD_NAMES = ("shape_length","shape_area")
+
+## the range of values each integer field type can hold
+INTEGER_RANGES = {"SmallInteger":(-32768,32767),
+                  "Integer":(-2147483648,2147483647)}
+
+def MakeTargetMap(paths):
+    '''Returns a dictionary of {feature class name:path} for a list of
+    feature class paths (e.g. from MakePathList), so each fclass value is
+    looked up once instead of scanning the path list.'''
+
+    return dict((os.path.basename(p),p) for p in paths)
+
+def MatchDataSource(data_source,names):
+    '''Returns the name (from a list, set, or dictionary of lower case
+    feature class names) that a layer's data source points to, or None.
+    The last part of the data source, without any database and owner
+    prefixes, is looked up first, and if it isn't one of the names the
+    data source is searched for each name in sorted order.'''
+
+    data_source = data_source.lower()
+    base = data_source.replace("\\","/").split("/")[-1].split(".")[-1]
+    if base in names:
+        return base
+    for name in sorted(names):
+        if data_source.find(name) != -1:
+            return name
+    return None
+
+def CountValues(values):
+    '''Returns a tuple of ({value:count},null count) for a list of fclass
+    values.'''
+
+    counts = {}
+    nulls = 0
+    for v in values:
+        if v is None:
+            nulls+=1
+            continue
+        counts[v] = counts.get(v,0) + 1
+    return counts, nulls
+
+def PartitionRows(rows,fclass_index,targets):
+    '''Splits rows into one list per fclass value, in a single pass.  Only
+    values in targets get a partition; the other values are counted.
+    Returns a tuple of ({fclass:[rows]},{skipped value:count},null count).'''
+
+    targets = set(targets)
+    partitions = {}
+    skipped = {}
+    nulls = 0
+    for row in rows:
+        value = row[fclass_index]
+        if value is None:
+            nulls+=1
+        elif value in targets:
+            partitions.setdefault(value,[]).append(row)
+        else:
+            skipped[value] = skipped.get(value,0) + 1
+    return partitions, skipped, nulls
+
+def CopyableFields(fields):
+    '''Returns the names of the fields that can be written with an insert
+    cursor, from a list of (name,type,editable) tuples.'''
+
+    return [n for n,t,e in fields if e and not t in SKIP_FIELD_TYPES
+        and not n.lower() in SKIP_FIELD_NAMES]
+
+def MatchFields(source_fields,target_fields):
+    '''Matches two lists of field names without regard to case, the way
+    Append with NO_TEST does.  Returns a tuple of (source indices,target
+    names) for the fields that are in both, in source order.'''
+
+    targets = dict((n.lower(),n) for n in target_fields)
+    indices, names = [], []
+    for i,n in enumerate(source_fields):
+        if n.lower() in targets:
+            indices.append(i)
+            names.append(targets[n.lower()])
+    return indices, names
+
+def ChooseTransformation(src_gcs,targ_gcs,transformations):
+    '''Returns the geographic transformation needed between two GCS codes,
+    None if they are the same.  transformations is a dictionary of
+    {frozenset([gcs code,gcs code]):transformation name}.  A ValueError
+    is raised if there is no transformation for the pair.'''
+
+    if src_gcs == targ_gcs:
+        return None
+    key = frozenset([src_gcs,targ_gcs])
+    if not key in transformations:
+        raise ValueError("no transformation between {0} and {1}".format(
+            src_gcs,targ_gcs))
+    return transformations[key]
+
+def ConvertValue(value,field_type,length=None):
+    '''Returns the value converted to fit a field of the given type (as in
+    arcpy's Field.type), the way Append with NO_TEST converts it: numbers
+    and text are turned into each other, and text is checked against the
+    field length.  NULL stays NULL, and types that aren't listed here are
+    left alone.  A ValueError is raised if the value doesn't fit.'''
+
+    if value is None:
+        return None
+    if field_type == "String":
+        if not isinstance(value,basestring):
+            value = unicode(value)
+        if length and len(value) > length:
+            raise ValueError("{0} is longer than {1}".format(value,length))
+        return value
+    if field_type in INTEGER_RANGES:
+        if isinstance(value,basestring):
+            value = float(value.strip())
+        number = int(value)
+        low, high = INTEGER_RANGES[field_type]
+        if number < low or number > high:
+            raise ValueError("{0} is out of range".format(value))
+        return number
+    if field_type in ("Double","Single"):
+        if isinstance(value,basestring):
+            value = value.strip()
+        return float(value)
+    if field_type == "Date":
+        if not isinstance(value,datetime.datetime):
+            raise ValueError("{0} is not a date".format(value))
+        return value
+    return value
+
+def ConvertRow(row,indices,target_fields,errors):
+    '''Returns the values at the indices of a row, each converted to fit the
+    matching (name,type,length) tuple in target_fields.  A value that
+    doesn't fit is written as NULL instead, and counted in the errors
+    dictionary of {field name:count}.'''
+
+    values = []
+    for i,(name,field_type,length) in zip(indices,target_fields):
+        try:
+            values.append(ConvertValue(row[i],field_type,length))
+        except (ValueError,TypeError,OverflowError):
+            errors[name] = errors.get(name,0) + 1
+            values.append(None)
+    return values
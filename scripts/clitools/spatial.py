@@ -0,0 +1,191 @@
+__doc__ = \
+"""Contains a simple in-process spatial index and the overlap matching that
+is used to transfer CR_IDs between feature classes (see TransferCR_IDs in
+clitools.management).  Nothing in this module uses arcpy.
+
+Geometries are only expected to have an extent (with XMin, YMin, XMax, and
+YMax attributes) and a disjoint() method, which is true of arcpy geometry
+objects.  The Envelope class below has the same two members, so the
+matching can be run on plain python boxes and points:
+
+from clitools.spatial import Envelope, FindCRIDTransfers
+
+x = [(1,"100001","{CR-A}",Envelope(0,0,10,10))]
+y = [(7,"100001",None,Envelope(5,5,5,5))]
+print FindCRIDTransfers(x,y)["assignments"]
+>> {7: '{CR-A}'}
+"""
+
+import math
+
+class Envelope(object):
+    """A rectangle (or a point, if the min and max values are the same)
+    that can stand in for an arcpy geometry.  Its extent is itself."""
+
+    def __init__(self,xmin,ymin,xmax,ymax):
+
+        self.XMin = xmin
+        self.YMin = ymin
+        self.XMax = xmax
+        self.YMax = ymax
+
+    @property
+    def extent(self):
+        return self
+
+    def disjoint(self,other):
+        '''Returns True if the two envelopes do not touch at all.'''
+        return not BoxesIntersect(GetBox(self),GetBox(other))
+
+def GetBox(geometry):
+    '''Returns the (xmin,ymin,xmax,ymax) tuple for a geometry's extent.'''
+
+    e = geometry.extent
+    return (e.XMin,e.YMin,e.XMax,e.YMax)
+
+def BoxesIntersect(a,b):
+    '''Returns True if two (xmin,ymin,xmax,ymax) boxes overlap or touch.'''
+
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+## the most cells an item is registered in; an item whose box covers more
+## than this is kept in a separate list that every query looks through
+MAX_CELLS_PER_ITEM = 4096
+
+class GridIndex(object):
+    """A uniform grid of square cells that holds the bounding boxes of any
+    number of items.  Each item is registered in every cell its box covers,
+    so Query() only has to look at the cells covered by the search box.
+    Items that would cover too many cells are kept apart and always
+    checked."""
+
+    def __init__(self,cell_size):
+
+        if not cell_size > 0:
+            cell_size = 1.0
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.boxes = {}
+        self.large = []
+        self.extent = None
+
+    def _CellRange(self,box):
+        s = self.cell_size
+        return (int(math.floor(box[0]/s)),int(math.floor(box[1]/s)),
+            int(math.floor(box[2]/s)),int(math.floor(box[3]/s)))
+
+    def Insert(self,key,box):
+        '''Adds an item to the index.'''
+
+        self.boxes[key] = box
+        c0,r0,c1,r1 = self._CellRange(box)
+        if (c1-c0+1)*(r1-r0+1) > MAX_CELLS_PER_ITEM:
+            self.large.append(key)
+            return
+        if self.extent is None:
+            self.extent = (c0,r0,c1,r1)
+        else:
+            e = self.extent
+            self.extent = (min(e[0],c0),min(e[1],r0),max(e[2],c1),
+                max(e[3],r1))
+        for c in xrange(c0,c1+1):
+            for r in xrange(r0,r1+1):
+                self.cells.setdefault((c,r),[]).append(key)
+
+    def Query(self,box):
+        '''Returns the set of keys whose boxes overlap or touch the box.'''
+
+        found = set([k for k in self.large
+            if BoxesIntersect(self.boxes[k],box)])
+        if self.extent is None:
+            return found
+
+        ## only look at the part of the box that has any cells in it
+        c0,r0,c1,r1 = self._CellRange(box)
+        e = self.extent
+        c0,r0,c1,r1 = max(c0,e[0]),max(r0,e[1]),min(c1,e[2]),min(r1,e[3])
+        if c0 > c1 or r0 > r1:
+            return found
+
+        ## if the box covers more cells than have been filled, go through
+        ## the filled cells instead
+        if (c1-c0+1)*(r1-r0+1) > len(self.cells):
+            cells = [k for (c,r),k in self.cells.iteritems()
+                if c0 <= c <= c1 and r0 <= r <= r1]
+        else:
+            cells = [self.cells.get((c,r),[]) for c in xrange(c0,c1+1)
+                for r in xrange(r0,r1+1)]
+        for keys in cells:
+            for key in keys:
+                if not key in found and BoxesIntersect(self.boxes[key],box):
+                    found.add(key)
+        return found
+
+def ChooseCellSize(boxes):
+    '''Picks a grid cell size for a list of boxes: the larger of the average
+    box width/height and the size that would put about one box in each
+    cell if they were spread evenly over the full extent.'''
+
+    if len(boxes) == 0:
+        return 1.0
+    avg = sum([max(b[2]-b[0],b[3]-b[1]) for b in boxes]) / float(len(boxes))
+    width = max([b[2] for b in boxes]) - min([b[0] for b in boxes])
+    height = max([b[3] for b in boxes]) - min([b[1] for b in boxes])
+    spread = max(width,height) / math.sqrt(len(boxes))
+    size = max(avg,spread)
+    return size if size > 0 else 1.0
+
+def FindCRIDTransfers(x_features,y_features,intersects=None):
+    '''Finds the CR_ID that each feature in y should take from an
+    overlapping feature in x with the same CLI_ID.  Both feature lists hold
+    (OBJECTID,CLI_ID,CR_ID,geometry) tuples; features with no CLI_ID are
+    ignored.  The y features are put in a grid index, and the exact
+    intersects(x_geometry,y_geometry) test (by default, "not disjoint") is
+    only run on pairs whose boxes overlap and whose CLI_IDs match.
+
+    If a y feature overlaps more than one x feature with its CLI_ID, the
+    x feature with the lowest OBJECTID is used.  Returns a dictionary with
+    these keys:
+        "assignments"   {y OBJECTID:CR_ID}
+        "singles"       number of y features matched to a CLI_ID that
+                        only has one geometry in x
+        "multiples"     number matched to a CLI_ID with several in x'''
+
+    if intersects is None:
+        intersects = lambda a,b: not a.disjoint(b)
+
+    y_lookup = {}
+    y_boxes = []
+    for oid,cli_id,cr_id,geom in y_features:
+        if cli_id is None or geom is None:
+            continue
+        box = GetBox(geom)
+        y_lookup[oid] = (cli_id,geom)
+        y_boxes.append((oid,box))
+
+    index = GridIndex(ChooseCellSize([b for o,b in y_boxes]))
+    for oid,box in y_boxes:
+        index.Insert(oid,box)
+
+    x_counts = {}
+    for oid,cli_id,cr_id,geom in x_features:
+        if cli_id is not None:
+            x_counts[cli_id] = x_counts.get(cli_id,0) + 1
+
+    ## keep the match from the lowest x OBJECTID for each y feature
+    matches = {}
+    for oid,cli_id,cr_id,geom in sorted(x_features,key=lambda f: f[0]):
+        if cli_id is None or geom is None:
+            continue
+        for y_oid in index.Query(GetBox(geom)):
+            if y_oid in matches:
+                continue
+            y_cli_id, y_geom = y_lookup[y_oid]
+            if not y_cli_id == cli_id:
+                continue
+            if intersects(geom,y_geom):
+                matches[y_oid] = (cr_id,cli_id)
+
+    singles = len([m for m in matches.itervalues() if x_counts[m[1]] == 1])
+    return {"assignments":dict((k,v[0]) for k,v in matches.iteritems()),
+        "singles":singles,"multiples":len(matches) - singles}
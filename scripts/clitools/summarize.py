@@ -25,20 +25,33 @@ their contents into the site-packages folder.
 import arcpy
 import os
 import traceback, sys
+import time
 from time import strftime
 import xlrd
 import xlwt
 
-from .classes import MakeUnit
+from .classes import MakeUnit, feature_lookups
 from .enterprise import CheckForEnterpriseTables
 from .config import settings
+from .crtables import MakeFeatureDict, JoinEnterpriseTables
+from .reports import (
+    MakePercentage,
+    ParkStats,
+    SummaryTable,
+    FCLASS_DATASETS,
+    MakeLandscapeBucket,
+    BucketLandscapeFeatures,
+    )
 
 from general import (
     Print,
-    GetDraftedFeatureCounts,
-    GetDraftedFeatureCountsScratch,
+    CountDraftedFeatures,
     TakeOutTrash,
-    MakePathList
+    MakePathList,
+    ReportRate,
+    MakeProcessPool,
+    MAX_CLI_NUMS_IN_QUERY,
+    SelectByIDs,
     )
 
 ## This block of code is used to list the landscapes that were included in the
@@ -56,6 +69,10 @@ reg_sow_lists = {"SER":ser_sow,"NER":ner_sow,"NCR":ncr_sow,
                  "MWR":mwr_sow,"IMR":imr_sow,"AKR":akr_sow,
                  "PWR":pwr_sow}
 
+## number of rows that an xlwt sheet holds in memory before they are flushed to
+## a temp file; rows must be written in order once this many are reached.
+XLS_FLUSH_ROWS = 1000
+
 ## the following are xlwt.easyxf styles that are used by more than one function.
 ## they are set here in variables here for easy reuse.
 
@@ -115,29 +132,17 @@ feat_style_fn_aqua = xlwt.easyxf('font: bold True, name Calibri;'\
 feat_style_fn_lime = xlwt.easyxf('font: bold True, name Calibri;'\
                 'pattern: pattern solid, fore_color lime; '+grey_borders)
 
-def MakePercentage(partial_num,whole_num):
-    '''Creates a formatted percentage based on two numbers.  It is used to
-    deal with 0 value inputs.
-
-    Param1: partial number
-    Param2: full number
-
-    The output is a string in this format: %xx.xx
-    '''
-
-    if partial_num == whole_num:
-        perc = "100.0"
-    elif int(partial_num) == 0:
-        perc = "00.00"
-    else:
-        num = float(partial_num)*100/whole_num
-        if str(num)[1] == ".":
-            perc = "0"+str(num)[:4]
-        else:
-            perc = str(num)[:str(num).find(".")+3]
-    if not len(perc) == 5:
-        perc+="0"
-    return perc
+## all of the styles above are resolved once into a frozen collection of
+## FONT, FORMAT, and XF records, which is shared by every workbook that is
+## made in this module.  a new style must be added to this list before it
+## can be written to one of those workbooks.
+xls_styles = xlwt.StyleCollection(style_compression=2)
+xls_styles.freeze([title_style_big,summary_style,header_style_big,
+    basic_style,basic_style_grey,basic_style_grey_left,cli_name_style,
+    cli_name_style_grey,boundary_yes_style,boundary_no_style,low_pct_style,
+    mid_pct_style,high_pct_style,header_style_small,header_style_small_left,
+    feat_style_fn,feat_style,geom_style,highlight,highlight_fn,
+    feat_style_fn_aqua,feat_style_fn_lime])
 
 def ChoosePercStyle(value,low_style,mid_style,high_style):
     '''Chooses a cell format style based on the input value for the cell.
@@ -157,6 +162,30 @@ def ChoosePercStyle(value,low_style,mid_style,high_style):
     else:
         return False
 
+def PercentageColumn(table,done,expected):
+    '''Returns a (values,styles) column for WriteSummaryRows() with the
+    percentage text for each row of a clitools.reports.SummaryTable, styled
+    by the percentage bucket of each row.'''
+
+    styles = (low_pct_style,mid_pct_style,high_pct_style)
+    return ([p+"%" for p in table.Percentages(done,expected)],
+        [styles[b] for b in table.Buckets(done,expected)])
+
+def WriteSummaryRows(input_sheet_object,columns,first_row=3):
+    '''Writes the landscape rows of a multiple landscape summary sheet from
+    a list of (values,style) columns, one column per spreadsheet column.
+    The style is either one style for the whole column or a list with a
+    style for each row.'''
+
+    if len(columns) == 0:
+        return
+    for n in range(len(columns[0][0])):
+        writerow = input_sheet_object.row(first_row+n)
+        for colnum,(values,style) in enumerate(columns):
+            if isinstance(style,list):
+                style = style[n]
+            writerow.set_cell_text(colnum,values[n],style)
+
 def MakeSingleSummaryXLSHeaders(input_sheet_object):
     '''Takes an input xlwt sheet object and adjusts the columns and
     writes headers to fit the single landscape summary template.'''
@@ -236,11 +265,27 @@ def MakeMultipleSummaryXLSHeaders(input_sheet_object,full=True):
         header_row.write(12,"PARK PROGRESS FOR CONTRIBUTING FEATURES",header_style_big)
         header_row.write(13,"PARK PROGRESS FOR TOTAL FEATURES",header_style_big)
 
+def ReportParkProgress(park,done,total):
+    '''Prints a progress line when the statistics for a park (as returned
+    by clitools.reports.ParkStats) are finished.'''
+
+    ct = len(park["landscapes"])
+    Print("  {0}: {1} landscape{2} ({3} of {4} parks, {5}%)".format(
+        park["code"],ct,"s" if not ct == 1 else "",done,total,
+        int(done * 100./total)))
+
 def MakeMultipleLandscapeXLS(input_geodatabase,out_directory,cli_list=[],
-                                                        exclude_arch=False):
+                                        exclude_arch=False,processes=1):
     """ Creates a spreadsheet with one line per landscape that is included
     in the cli_list.  The output spreadsheet will have percentages, totals,
-    and color coding for the GIS feature contents of each landscape."""
+    and color coding for the GIS feature contents of each landscape.
+
+    The report is made in three stages.  First, the feature rows for every
+    landscape in the affected parks are pulled from the FeatureInfoLookup
+    index, and the drafted features are counted in one pass through the
+    geodatabase.  Next, the statistics for each park and its landscapes
+    are computed from that data (in a pool of worker processes if
+    processes is more than 1).  Finally, the spreadsheet is written."""
 
     try:
 
@@ -255,8 +300,7 @@ def MakeMultipleLandscapeXLS(input_geodatabase,out_directory,cli_list=[],
         ## print output path
         arcpy.AddMessage("\nOutput spreadsheet:\n  {0}\n".format(book_path))
 
-        ## make dictionary of cli numbers and park alphas, ordered by alpha
-        cli_and_park_dict = {}
+        ## make list of the parks that hold the landscapes, in order
         park_list = []
         for cl in cli_list:
             aaa = MakeUnit(cl)
@@ -267,209 +311,87 @@ def MakeMultipleLandscapeXLS(input_geodatabase,out_directory,cli_list=[],
             alph = aaa.park[0]
             if not alph in park_list:
                 park_list.append(alph)
-                cli_and_park_dict[cl] = alph
 
         clis_in_order = cli_list
 
-        ## this is all the units that are in any parks that are included 
-        cli_full_list = []
-        for cli in cli_and_park_dict.iterkeys():
-            un = MakeUnit(cli)
-            pk_cd = un.park[0]
-            pk = MakeUnit(pk_cd)
-            for ls in [i[0] for i in pk.landscapes]:
-                cli_full_list.append(ls)
-
-        ## go through all landscapes and get completed feature counts for each
-        ## also go through all that are in the         
-        cli_all_feat,cli_contrib_feat,alpha_all_feat,alpha_contrib_feat = \
-                                                       {},{},{},{}
-        Print("\nGetting counts of features in geodatabase...")
-        counter = 1
-        prog_count = 1
-
-        boundaries = []
-        previous = 0
-        for cli in cli_full_list:
-
-            if cli in cli_list:
-                Print("  {0} ({1} of {2})".format(cli,prog_count,len(cli_list)))
-                prog_count+=1            
-
-            ## get count for features that are in GIS for this unit.
-            c_unit = MakeUnit(cli)
-            if c_unit == False:
-                continue
-            cli_id_list = c_unit.GetFeatureList()
-
-
-            #if gdb_type == "region":
-            cli_features_done = GetDraftedFeatureCounts(
-                    cli,cli_id_list,input_geodatabase,exclude_arch)
-
-            if cli_features_done[2]:
-                boundaries.append(cli)
-                
-            ## count for features that are in the CLI database for this unit
-            landscape_unit = MakeUnit(cli)
-            f = landscape_unit.GetFeatureDict()
-
-            if exclude_arch:
-                all_in_cli_ct = len([i for i in f.keys() if not f[i][2] ==\
-                                                         "Archeological Sites"])
-                contrib_in_cli_ct = len([i for i in f.keys() if (f[i][1] == "Contributing"\
-                                                    and not f[i][2] == "Archeological Sites")])
-            else:
-                all_in_cli_ct = len(f.keys())
-                contrib_in_cli_ct = len([i for i in f.keys() if f[i][1] == "Contributing"])
-
-            cli_features_total = [all_in_cli_ct,contrib_in_cli_ct]
-
-            #calculate percentages
-            total_perc = MakePercentage(cli_features_done[0],cli_features_total[0])
-            contrib_perc = MakePercentage(cli_features_done[1],cli_features_total[1])
-
-            #make entries to dictionaries
-            cli_all_feat[cli] = [cli_features_total[0],cli_features_done[0],total_perc]
-            cli_contrib_feat[cli] = [cli_features_total[1],cli_features_done[1],contrib_perc]
-
-            ## nifty progress bar printing
-            percent_int = int(counter * 100./len(cli_full_list))
-            
-            if not percent_int == previous:
-                if percent_int%5 == 0:
-                    num = str(percent_int)
-                    if len(num) == 1:
-                        num = "0"+num
-                    print num+"%",
-                elif percent_int == 100:
-                    print "COMPLETE"
-                    break
-                elif previous%25 == 0:
-                    print "\n*",
-                else:
-                    print "*",
-                previous = percent_int
-
-            counter+=1
-
-        Print("\nCalculating park completion percentages...\n")
+        ## this is all the units that are in any parks that are included
+        park_clis = {}
         for p in park_list:
+            park_clis[p] = [i[0] for i in MakeUnit(p).landscapes]
 
-            park = MakeUnit(p)
-
-            clis_in_park = [i[0] for i in park.landscapes]
-
-            ## skip if there are no relevant landscapes in this park
-            if len([d for d in clis_in_park if d in cli_full_list]) == 0:
-                continue
-
-            park_total_feat_ct = 0
-            park_contrib_feat_ct = 0
-            for l in [i[0] for i in park.landscapes]:
-                z = MakeUnit(l)
-                park_total_feat_ct += len(z.GetFeatureList())
-                y = z.GetFeatureDict()
-                park_contrib_feat_ct += len([i for i in y.keys() if\
-                    y[i][1] == "Contributing"])
-
-           # park_total_feat_ct = sum([cli_all_feat[i][0] for i in clis_in_park])
-            park_done_ct = sum([cli_all_feat[i][1] for i in clis_in_park])
-
-           # park_contrib_feat_ct = sum([cli_contrib_feat[i][0] for i in clis_in_park])
-            park_contrib_done_ct = sum([cli_contrib_feat[i][1] for i in clis_in_park])
-
-            ## calculate percentages
-            total_park_perc = MakePercentage(park_done_ct,park_total_feat_ct)
-            contrib_park_perc = MakePercentage(park_contrib_done_ct,park_contrib_feat_ct)
-
-            ## make entries to dictionaries
-            alpha_all_feat[park.code] = [park_total_feat_ct,park_done_ct,total_park_perc]
-            alpha_contrib_feat[park.code] = [park_contrib_feat_ct,park_contrib_done_ct,contrib_park_perc]      
-
+        ## 1. gather the feature rows for every landscape from the lookup
+        ## index, and count the features that are in GIS for all of them
+        ## in one pass through the geodatabase
+        t0 = time.time()
+        Print("\nGetting counts of features in geodatabase...")
+        index = feature_lookups.Get()
+        row_fields = ["CLI_ID","CONTRIB_STATUS","LAND_CHAR"]
+        feature_rows = {}
+        for p in park_list:
+            for cli in park_clis[p]:
+                feature_rows[cli] = [tuple(r) for r in
+                    index.Rows("CLI_NUM",cli,row_fields)]
+        drafted_counts = CountDraftedFeatures(
+            dict((k,[r[0] for r in v]) for k,v in feature_rows.iteritems()),
+            input_geodatabase,exclude_arch)
+        ReportRate("landscapes counted",len(drafted_counts),t0)
+
+        ## 2. compute the landscape and park statistics, one job per park
+        t0 = time.time()
+        Print("\nCalculating landscape and park completion percentages...")
+        jobs = [(p,[(cli,feature_rows[cli],drafted_counts.get(cli))
+            for cli in park_clis[p]],exclude_arch) for p in park_list]
+        if processes > 1 and len(jobs) > 1:
+            Print("  using {0} worker processes".format(processes))
+            pool = MakeProcessPool(processes)
+            try:
+                pending = [pool.apply_async(ParkStats,j) for j in jobs]
+                results = []
+                for p in pending:
+                    results.append(p.get())
+                    ReportParkProgress(results[-1],len(results),len(jobs))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = []
+            for j in jobs:
+                results.append(ParkStats(*j))
+                ReportParkProgress(results[-1],len(results),len(jobs))
+        ReportRate("parks summarized",len(results),t0)
+
+        ## put the counts in tables, one for every landscape in the parks
+        ## and one for the parks, then take the rows for the landscapes
+        ## that are in the spreadsheet
+        park_stats,cli_stats = {},{}
+        boundaries = set()
+        for park in results:
+            park_stats[park["code"]] = park
+            for cli,stats in park["landscapes"].iteritems():
+                cli_stats[cli] = stats
+                if stats["boundary"]:
+                    boundaries.add(cli)
+        cli_table = SummaryTable.FromStats(cli_stats)
+        park_table = SummaryTable.FromStats(park_stats)
+        units = [MakeUnit(landscape) for landscape in clis_in_order]
+        rows = cli_table.Subset([l.code for l in units])
+        park_rows = park_table.Subset([l.park[0] for l in units])
+
+        ## 3. write the spreadsheet
         ## make book object and begin writing info to it
-        book = xlwt.Workbook(style_compression = 2)
+        book = xlwt.Workbook(styles = xls_styles,
+            flush_row_count = XLS_FLUSH_ROWS)
         fsheet = book.add_sheet(gdb_name[:30])
 
-        MakeMultipleSummaryXLSHeaders(fsheet)
-
-        #write cli info to rows
-        rownum = 3
-        for landscape in clis_in_order:
-
-            #create all of the values to be written from existing dictionaries
-            l = MakeUnit(landscape)
-            Print("writing {0} - {1} ({2})".format(l.park[0],l.name,l.code))
-            cont_done = str(cli_contrib_feat[l.code][1])
-            cont_expect = str(cli_contrib_feat[l.code][0])
-            cont_perc = str(cli_contrib_feat[l.code][2])
-            cont_perc_style = ChoosePercStyle(float(cont_perc),
-                                    low_pct_style,mid_pct_style,high_pct_style)
-                
-            total_done = str(cli_all_feat[l.code][1])
-            total_expect = str(cli_all_feat[l.code][0])
-            total_perc = str(cli_all_feat[l.code][2])
-            total_perc_style = ChoosePercStyle(float(total_perc),
-                                    low_pct_style,mid_pct_style,high_pct_style)
-
-            cont_park = alpha_contrib_feat[l.park[0]][0]
-            total_park = alpha_all_feat[l.park[0]][0]
-
-            cont_park_perc = alpha_contrib_feat[l.park[0]][2]
-            cont_park_perc_style = ChoosePercStyle(float(cont_park_perc),
-                                    low_pct_style,mid_pct_style,high_pct_style)
-            total_park_perc = alpha_all_feat[l.park[0]][2]
-            total_park_perc_style = ChoosePercStyle(float(total_park_perc),
-                                    low_pct_style,mid_pct_style,high_pct_style)
-               
-            writerow = fsheet.row(rownum)
-            for colnum in range(0,15):
-                if colnum == 0:
-                    writerow.set_cell_text(colnum,l.park[0],basic_style)
-                elif colnum == 1:
-                    writerow.set_cell_text(colnum,l.code,basic_style)
-                elif colnum == 2:
-                    writerow.set_cell_text(colnum,l.name,cli_name_style)
-                if colnum == 3:
-                    if l.code in boundaries:
-                        writerow.set_cell_text(colnum,"YES",boundary_yes_style)
-                    else:
-                        writerow.set_cell_text(colnum,"NO",boundary_no_style)
-                elif colnum == 4:
-                    writerow.set_cell_text(colnum,str(cont_done),basic_style)
-                elif colnum == 5:
-                    writerow.set_cell_text(colnum,str(cont_expect),basic_style)
-                elif colnum == 6:
-                    writerow.set_cell_text(colnum,cont_perc+"%",cont_perc_style)
-                elif colnum == 7:
-                    writerow.set_cell_text(colnum,str(total_done),basic_style)
-                elif colnum == 8:
-                    writerow.set_cell_text(colnum,str(total_expect),basic_style)
-                elif colnum == 9:
-                    writerow.set_cell_text(colnum,total_perc+"%",total_perc_style)
-                elif colnum == 10:
-                    writerow.set_cell_text(colnum,str(cont_park),basic_style)
-                elif colnum == 11:
-                    writerow.set_cell_text(colnum,str(total_park),basic_style)
-                elif colnum == 12:
-                    writerow.set_cell_text(colnum,cont_park_perc+"%",cont_park_perc_style)
-                elif colnum == 13:
-                    writerow.set_cell_text(colnum,total_park_perc+"%",total_park_perc_style)
-                
-            rownum+=1
-
-        #final step, print top row
+        ## print top rows first, the landscape rows are flushed to disk as
+        ## they are written
         date = strftime("%m-%d-%y")
         title = "{0}, {1}".format(gdb_name,date)
-        reg_done_cont_ct = sum([cli_contrib_feat[i][1] for i in cli_contrib_feat.keys()])
-        reg_total_cont_ct = sum([cli_contrib_feat[i][0] for i in cli_contrib_feat.keys()])
-        reg_perc_cont = MakePercentage(reg_done_cont_ct,reg_total_cont_ct)
-
-        reg_done_all_ct = sum([cli_all_feat[i][1] for i in cli_all_feat.keys()])
-        reg_total_all_ct = sum([cli_all_feat[i][0] for i in cli_all_feat.keys()])
-        reg_perc_all_ct = MakePercentage(reg_done_all_ct,reg_total_all_ct)
+        reg_total_cont_ct,reg_done_cont_ct,reg_perc_cont = cli_table.Totals(
+            "contrib_done","contrib_expected")
+        reg_total_all_ct,reg_done_all_ct,reg_perc_all_ct = cli_table.Totals(
+            "all_done","all_expected")
 
-        
         cont_sum_msg = "{0} ({1}%) of {2} Contributing Features Drafted".format(
             reg_done_cont_ct,reg_perc_cont,reg_total_cont_ct)
         total_sum_msg = "{0} ({1}%) of all {2} Features Drafted".format(
@@ -487,6 +409,31 @@ def MakeMultipleLandscapeXLS(input_geodatabase,out_directory,cli_list=[],
         fsheet.write(1,4,"50% - 75%",mid_pct_style)
         fsheet.write(1,5,"75% - 100%",high_pct_style)
         
+        MakeMultipleSummaryXLSHeaders(fsheet)
+
+        ## write the landscape rows from the table columns
+        for l in units:
+            Print("writing {0} - {1} ({2})".format(l.park[0],l.name,l.code))
+        bnd_yes = [l.code in boundaries for l in units]
+        WriteSummaryRows(fsheet,[
+            ([l.park[0] for l in units],basic_style),
+            ([l.code for l in units],basic_style),
+            ([l.name for l in units],cli_name_style),
+            (["YES" if b else "NO" for b in bnd_yes],
+                [boundary_yes_style if b else boundary_no_style
+                for b in bnd_yes]),
+            (rows.Text("contrib_done"),basic_style),
+            (rows.Text("contrib_expected"),basic_style),
+            PercentageColumn(rows,"contrib_done","contrib_expected"),
+            (rows.Text("all_done"),basic_style),
+            (rows.Text("all_expected"),basic_style),
+            PercentageColumn(rows,"all_done","all_expected"),
+            (park_rows.Text("contrib_expected"),basic_style),
+            (park_rows.Text("all_expected"),basic_style),
+            PercentageColumn(park_rows,"contrib_done","contrib_expected"),
+            PercentageColumn(park_rows,"all_done","all_expected"),
+            ])
+
         #save book to specified location
         try:
             book.save(book_path)
@@ -516,284 +463,314 @@ def MakeMultipleLandscapeXLS(input_geodatabase,out_directory,cli_list=[],
         book.save(book_path)
 
 
-def MakeSingleLandscapeXLS(cli_num,input_geodatabase,out_directory,
-    get_comments_from='',overwrite=False):
-    """This is a flexible spreadsheet creation function that will take an
-    input geodatabase and analyize it for features that are in the landscape
-    that is indicated by the cli number.  The spreadsheet will list all
-    expected features in the landscape.  Those that have geometry in the
-    geodatabase will have an indication of what type of geometry (pt/ln/py)
-    is being used to represent the feature.  Those features that have no
-    geometry will be highlighted.  At the end of the spreadsheet there are
-    percentages printed, and the location of the input geodatabase.
-
-    Comments from a previous spreadsheet summary of this landscape can be
-    incoporated into the output of this function, by placing the file path
-    in the get_comments_from parameter.
-    """
-
-    try:
-        query = '"CLI_NUM" = \''+cli_num+"'"
-
-        ## create landscape object
-        landscape = MakeUnit(cli_num)
+def ReadSpreadsheetComments(xls_path):
+    '''Reads the comments from a previous single landscape spreadsheet,
+    and returns them as a dictionary of {CLI_ID:[comment values]}, with the
+    values from columns 11 through 17.  Rows with no comments are left
+    out.'''
 
-        ## get dictionary of all feature info in landscape
-        f_dict = landscape.GetFeatureDict()
+    comments = {}
+    ex_bookrd = xlrd.open_workbook(xls_path, formatting_info=True)
+    ex_sheet = ex_bookrd.sheet_by_index(0)
+    for row_x in range(1,ex_sheet.nrows):
 
-        ## create version of dictionary with '' instead of null values
-        f_dict_no_nulls = {}
-        for k, v in f_dict.iteritems():
-            new_v = ['' if i==None else i for i in v]
-            f_dict_no_nulls[k] = new_v                
+        id_cell = ex_sheet.cell(row_x,3)
+        #sometimes the existings ids have been formatted as integers
+        #and the . on the end of 5-digit ids must be stripped away
+        id_cell_value = str(id_cell.value)[:6].rstrip(".")
 
-        ## get list of all features in landscape
-        f_list = landscape.GetFeatureList()
+        ## make a list of all the comment cell values
+        comvalues = []
+        for col in range(11,18):
+            com_cell = ex_sheet.cell(row_x,col)
+            comvalues.append(com_cell.value)
 
-        ## create list of paths in gdb
-        path_list = MakePathList(input_geodatabase)
-
-        ## determine if it's a scratch or standards geodatabase
-        arcpy.env.workspace = input_geodatabase
-        if "Historic_Buildings" in arcpy.ListDatasets():
-            gdb_type = "standards"
-        else:
-            gdb_type = "scratch"
+        ## if the list is completely empty, continue
+        t = [i for i in comvalues if not i == '']
+        if len(t) == 0:
+            continue
 
-        ## construct book path
-        book_name = "{0}, {1}".format(landscape.code,landscape.name)
-        book_path = r"{0}\{1}.xls".format(out_directory,book_name)
-
-        if not overwrite:
-            new_path = book_path
-            counter = 1
-            while os.path.isfile(new_path):
-                new_path = r"{0} {1}.xls".format(book_path[:-4],counter)
-                counter+=1
-            book_path = new_path
-
-        ## find existing spreadsheet if it exists, and get all comment info
-        comments = {}
-        if os.path.isfile(get_comments_from):
-            ex_bookrd = xlrd.open_workbook(get_comments_from, formatting_info=True)
-            ex_sheet = ex_bookrd.sheet_by_index(0)
-            for row_x in range(1,ex_sheet.nrows):
-
-                id_cell = ex_sheet.cell(row_x,3)
-                #sometimes the existings ids have been formatted as integers
-                #and the . on the end of 5-digit ids must be stripped away
-                id_cell_value = str(id_cell.value)[:6].rstrip(".")
-
-                ## make a list of all the comment cell values
-                comvalues = []
-                for col in range(11,18):
-                    com_cell = ex_sheet.cell(row_x,col)
-                    comvalues.append(com_cell.value)
-
-                ## if the list is completely empty, continue
-                t = [i for i in comvalues if not i == '']
-                if len(t) == 0:
-                    continue
-                
-                ## else, enter this list as value for the cli_id in the dict
-                comments[id_cell_value] = comvalues
-            del ex_bookrd,ex_sheet
+        ## else, enter this list as value for the cli_id in the dict
+        comments[id_cell_value] = comvalues
+    del ex_bookrd,ex_sheet
+    return comments
+
+def WriteSingleLandscapeXLS(code,name,book_path,f_list,f_dict,bucket,
+    gis_feat_sum,input_geodatabase,get_comments_from='',overwrite=False):
+    '''Writes the spreadsheet for one landscape from data that has already
+    been read, so it doesn't use arcpy and can be run in a worker process.
+    f_list and f_dict are the landscape's feature list and dictionary,
+    bucket holds its features in the geodatabase (see
+    clitools.reports.BucketLandscapeFeatures), and gis_feat_sum is its
+    [ct_all,ct_contrib,boundary] list from CountDraftedFeatures.
+
+    Returns the book path, or False if the spreadsheet couldn't be saved.'''
+
+    ## create version of dictionary with '' instead of null values
+    f_dict_no_nulls = {}
+    for k, v in f_dict.iteritems():
+        new_v = ['' if i==None else i for i in v]
+        f_dict_no_nulls[k] = new_v
+
+    ## find existing spreadsheet if it exists, and get all comment info
+    comments = {}
+    if get_comments_from and os.path.isfile(get_comments_from):
+        comments = ReadSpreadsheetComments(get_comments_from)
 
         ## delete comment file if desired
         if overwrite:
             os.remove(get_comments_from)
-                
-        ## create workbook with initial info in it
-        fbook = xlwt.Workbook()
-        fsheet = fbook.add_sheet(cli_num,cell_overwrite_ok=True)
-
-        ## add header rows
-        MakeSingleSummaryXLSHeaders(fsheet)
-
-        ## write basic feature info to sheet straight from cli info dict
-        cli_id_row_dict = {}
-        for x,f_id in enumerate(f_list):
-
-            row = fsheet.row(x+2)
-            cli_id_row_dict[f_id] = x+2
-            row.set_cell_text(3,f_id,feat_style)
-            row.set_cell_text(4,f_dict_no_nulls[f_id][0],feat_style_fn)
-            row.set_cell_text(5,f_dict_no_nulls[f_id][1],feat_style)
-            row.set_cell_text(6,f_dict_no_nulls[f_id][2],feat_style)
-            row.set_cell_text(9,f_dict_no_nulls[f_id][4],feat_style)
-            row.set_cell_text(10,f_dict_no_nulls[f_id][5],feat_style)
-
-        ## make list of lists to hold feature presence info for each cli_id
-        geometries = []
-        datasets = []
-        bound = False
-        for path in path_list:
-
-            fc_name = os.path.basename(path)
-            
-            shape = arcpy.Describe(path).shapetype.lower()
-            col_num = ["point","polyline","polygon"].index(shape)
-
-            fclass_dict = {"crsite":"Site",
-                           "crothr":"Other",
-                           "crstru":"Structure",
-                           "crobj_":"Object",
-                           "crbldg":"Building",
-                           "crsurv":"Survey",
-                           "crdist":"District",
-                           "crland":"Landscape (deprecated value)"}
-            
-            query = landscape.query
-            TakeOutTrash("fl")
-            fl = arcpy.management.MakeFeatureLayer(path,"fl",query)
-            if int(arcpy.management.GetCount(fl).getOutput(0)) == 0:
-                continue
-
-            rows = arcpy.SearchCursor(fl)
-            for row in rows:
-                num = row.getValue("CLI_ID")
-
-                ## skip if this is the boundary feature
-                if num == landscape.code:
-                    bound = True
-                    continue
-
-                oid = str(row.getValue("OBJECTID"))
-
-                if gdb_type == "standards":
-                    ds = fclass_dict[fc_name[:6]]
-                if gdb_type == "scratch":
-                    ds = str(row.getValue("fclass"))[:6]
-
-                if not num in f_list:
-                    Print("  CLI_ID error: {0} (fc {1}, OID {2})".format(
-                            str(num),os.path.basename(path),oid))
-                    continue
-
-                if not [num,ds] in datasets:
-                    datasets.append((num,ds))
-                if not [num,col_num] in geometries:
-                    geometries.append((num,col_num))
-
-            del rows
-
-        ## write geometry indicators and dataset values
-        for geom in geometries:
-            fsheet.write(cli_id_row_dict[geom[0]],geom[1],"x",geom_style)
-        for ds in datasets:
-            fsheet.write(cli_id_row_dict[ds[0]],7,ds[1],feat_style)
-
-        ## create list of missing feature numbers
-        missing_features = [i for i in cli_id_row_dict.iterkeys() if not i in
-                            [k[0] for k in geometries]]
-
-        ## highlight rows for missing features
-        for miss in missing_features:
-            if miss == "":
-                continue
-            row = fsheet.row(cli_id_row_dict[miss])
-            
-            ## write cli info with highlighting
-            row.set_cell_text(3,miss,highlight)
-            row.set_cell_text(4,f_dict_no_nulls[miss][0],highlight_fn)
-            row.set_cell_text(5,f_dict_no_nulls[miss][1],highlight)
-            row.set_cell_text(6,f_dict_no_nulls[miss][2],highlight)
-            row.set_cell_text(9,f_dict_no_nulls[miss][4],highlight)
-            row.set_cell_text(10,f_dict_no_nulls[miss][5],highlight)
-            row.set_style(highlight)
 
-        ## add comments from previous spreadsheet
-        for k,v in cli_id_row_dict.iteritems():
-            if k == landscape.code:
-                continue
-            r = fsheet.row(v)
-            if k in comments.keys():
-                for i in range(11,17):
-                    if k in missing_features:
-                        r.set_cell_text(i,comments[k][i-11],highlight_fn)
-                    else:
-                        r.set_cell_text(i,comments[k][i-11],feat_style_fn)
-            else:
-                for i in range(11,17):
-                    if k in missing_features:
-                        r.set_cell_text(i,'',highlight_fn)
-                    else:
-                        r.set_cell_text(i,'',feat_style_fn)
-                
-        ## fill in row for boundary
-        bound_info = [landscape.code,landscape.name,
-                      "Not Applicable","LANDSCAPE BOUNDARY"]
-        row = fsheet.row(1)
-        for y in range(4):
-            col_num = y+3
-            if not bound:
-                if col_num == 4:
-                    row.set_cell_text(col_num,bound_info[y],highlight_fn)
+    ## create workbook with initial info in it
+    fbook = xlwt.Workbook(styles = xls_styles)
+    fsheet = fbook.add_sheet(code,cell_overwrite_ok=True)
+
+    ## add header rows
+    MakeSingleSummaryXLSHeaders(fsheet)
+
+    ## write basic feature info to sheet straight from cli info dict
+    cli_id_row_dict = {}
+    for x,f_id in enumerate(f_list):
+
+        row = fsheet.row(x+2)
+        cli_id_row_dict[f_id] = x+2
+        row.set_cell_text(3,f_id,feat_style)
+        row.set_cell_text(4,f_dict_no_nulls[f_id][0],feat_style_fn)
+        row.set_cell_text(5,f_dict_no_nulls[f_id][1],feat_style)
+        row.set_cell_text(6,f_dict_no_nulls[f_id][2],feat_style)
+        row.set_cell_text(9,f_dict_no_nulls[f_id][4],feat_style)
+        row.set_cell_text(10,f_dict_no_nulls[f_id][5],feat_style)
+
+    ## write geometry indicators and dataset values
+    geometries = bucket["geometries"]
+    for geom in geometries:
+        fsheet.write(cli_id_row_dict[geom[0]],geom[1],"x",geom_style)
+    for num,ds in bucket["datasets"].iteritems():
+        fsheet.write(cli_id_row_dict[num],7,ds,feat_style)
+    bound = bucket["boundary"]
+
+    ## create set of missing feature numbers
+    drafted = set([k[0] for k in geometries])
+    missing_features = set([i for i in cli_id_row_dict.iterkeys() if not i in
+                        drafted])
+
+    ## highlight rows for missing features
+    for miss in missing_features:
+        if miss == "":
+            continue
+        row = fsheet.row(cli_id_row_dict[miss])
+
+        ## write cli info with highlighting
+        row.set_cell_text(3,miss,highlight)
+        row.set_cell_text(4,f_dict_no_nulls[miss][0],highlight_fn)
+        row.set_cell_text(5,f_dict_no_nulls[miss][1],highlight)
+        row.set_cell_text(6,f_dict_no_nulls[miss][2],highlight)
+        row.set_cell_text(9,f_dict_no_nulls[miss][4],highlight)
+        row.set_cell_text(10,f_dict_no_nulls[miss][5],highlight)
+        row.set_style(highlight)
+
+    ## add comments from previous spreadsheet
+    for k,v in cli_id_row_dict.iteritems():
+        if k == code:
+            continue
+        r = fsheet.row(v)
+        if k in comments:
+            for i in range(11,17):
+                if k in missing_features:
+                    r.set_cell_text(i,comments[k][i-11],highlight_fn)
                 else:
-                    row.set_cell_text(col_num,bound_info[y],highlight)
-                #highlight row
-                row.set_style(highlight)
-            else:
-                row.set_cell_text(2,"x",geom_style)
-                row.set_cell_text(7,"Landscape",feat_style)
-                if col_num == 4:
-                    row.set_cell_text(col_num,bound_info[y],feat_style_fn)
+                    r.set_cell_text(i,comments[k][i-11],feat_style_fn)
+        else:
+            for i in range(11,17):
+                if k in missing_features:
+                    r.set_cell_text(i,'',highlight_fn)
                 else:
-                    row.set_cell_text(col_num,bound_info[y],feat_style)
-        if landscape.code in comments.keys():
-            if bound:
-                for i in range(11,17):
-                    row.set_cell_text(i,comments[landscape.code][i-11],feat_style_fn)
+                    r.set_cell_text(i,'',feat_style_fn)
+
+    ## fill in row for boundary
+    bound_info = [code,name,"Not Applicable","LANDSCAPE BOUNDARY"]
+    row = fsheet.row(1)
+    for y in range(4):
+        col_num = y+3
+        if not bound:
+            if col_num == 4:
+                row.set_cell_text(col_num,bound_info[y],highlight_fn)
             else:
-                for i in range(11,17):
-                    row.set_cell_text(i,comments[landscape.code][i-11],highlight_fn)
+                row.set_cell_text(col_num,bound_info[y],highlight)
+            #highlight row
+            row.set_style(highlight)
         else:
-            if bound:
-                row.set_cell_text(11,'',feat_style_fn)
+            row.set_cell_text(2,"x",geom_style)
+            row.set_cell_text(7,"Landscape",feat_style)
+            if col_num == 4:
+                row.set_cell_text(col_num,bound_info[y],feat_style_fn)
             else:
-                row.set_cell_text(11,'',highlight_fn)
+                row.set_cell_text(col_num,bound_info[y],feat_style)
+    if code in comments:
+        if bound:
+            for i in range(11,17):
+                row.set_cell_text(i,comments[code][i-11],feat_style_fn)
+        else:
+            for i in range(11,17):
+                row.set_cell_text(i,comments[code][i-11],highlight_fn)
+    else:
+        if bound:
+            row.set_cell_text(11,'',feat_style_fn)
+        else:
+            row.set_cell_text(11,'',highlight_fn)
+
+    ## print percentages in last row
+    geodatabase_msg = input_geodatabase
+    fsheet.write(len(f_list)+2,3,geodatabase_msg,feat_style_fn_aqua)
+    for r in range(4,7):
+        fsheet.write(len(f_list)+2,r,'',feat_style_fn_aqua)
+
+    expect_all_feat = len(f_list)
+    expect_contrib_feat = len([i for i in f_dict.keys() if f_dict[i][1] ==\
+        "Contributing"])
+
+    perc_contrib = MakePercentage(gis_feat_sum[1],expect_contrib_feat)
+    perc_all = MakePercentage(gis_feat_sum[0],expect_all_feat)
+
+    contrib_msg = "{0}% ({1} of {2}) Contributing Features".format(
+        perc_contrib,str(gis_feat_sum[1]),str(expect_contrib_feat))
+    full_msg = "{0}% ({1} of {2}) Total Features".format(
+        perc_all,str(gis_feat_sum[0]),str(expect_all_feat))
+
+    fsheet.write(len(f_list)+3,3,contrib_msg,feat_style_fn_aqua)
+    fsheet.write(len(f_list)+3,4,'',feat_style_fn_aqua)
+    fsheet.write(len(f_list)+3,5,full_msg,feat_style_fn_aqua)
+    fsheet.write(len(f_list)+3,6,'',feat_style_fn_aqua)
+
+    try:
+        fbook.save(book_path)
+        return book_path
+    except:
+        return False
 
-        ## print percentages in last row
-        geodatabase_msg = input_geodatabase
-        fsheet.write(len(f_list)+2,3,geodatabase_msg,feat_style_fn_aqua)
-        for r in range(4,7):
-            fsheet.write(len(f_list)+2,r,'',feat_style_fn_aqua)
+def ScanLandscapeFeatures(input_geodatabase,feature_lists,gdb_type):
+    '''Reads each feature class in the geodatabase once, and sorts the
+    features of all of the landscapes into buckets.  feature_lists is
+    {CLI_NUM:[CLI_IDs]}, and the result is {CLI_NUM:bucket}, as described
+    in clitools.reports.MakeLandscapeBucket.'''
 
+    buckets = dict((k,MakeLandscapeBucket(v))
+        for k,v in feature_lists.iteritems())
+
+    qry = None
+    if len(buckets) <= MAX_CLI_NUMS_IN_QUERY:
+        qry = '"CLI_NUM" IN ({0})'.format(
+            ",".join(["'{0}'".format(i) for i in sorted(buckets)]))
+
+    fields = ["CLI_NUM","CLI_ID","OID@"]
+    if gdb_type == "scratch":
+        fields.append("fclass")
+
+    for path in MakePathList(input_geodatabase):
+
+        fc_name = os.path.basename(path)
+        shape = arcpy.Describe(path).shapetype.lower()
+        col_num = ["point","polyline","polygon"].index(shape)
+
+        dataset = None
         if gdb_type == "standards":
-            gis_feat_sum = GetDraftedFeatureCounts(landscape.code,
-            f_list,input_geodatabase)
-        else:
-            gis_feat_sum = GetDraftedFeatureCountsScratch(landscape.code,
-            f_list,input_geodatabase)
+            dataset = FCLASS_DATASETS.get(fc_name[:6],fc_name[:6])
 
-        expect_all_feat = len(f_list)
-        expect_contrib_feat = len([i for i in f_dict.keys() if f_dict[i][1] ==\
-            "Contributing"])
+        with arcpy.da.SearchCursor(path,fields,qry) as cursor:
+            BucketLandscapeFeatures(cursor,buckets,fc_name,col_num,dataset)
 
-        perc_contrib = MakePercentage(gis_feat_sum[1],expect_contrib_feat)
-        perc_all = MakePercentage(gis_feat_sum[0],expect_all_feat)
-        
-        contrib_msg = "{0}% ({1} of {2}) Contributing Features".format(
-            perc_contrib,str(gis_feat_sum[1]),str(expect_contrib_feat))
-        full_msg = "{0}% ({1} of {2}) Total Features".format(
-            perc_all,str(gis_feat_sum[0]),str(expect_all_feat))
+    return buckets
 
-        fsheet.write(len(f_list)+3,3,contrib_msg,feat_style_fn_aqua)
-        fsheet.write(len(f_list)+3,4,'',feat_style_fn_aqua)
-        fsheet.write(len(f_list)+3,5,full_msg,feat_style_fn_aqua)
-        fsheet.write(len(f_list)+3,6,'',feat_style_fn_aqua)
+def MakeLandscapeXLSBatch(cli_nums,input_geodatabase,out_directory,
+    get_comments_from=None,overwrite=False,processes=1):
+    """Makes the single landscape spreadsheet (see MakeSingleLandscapeXLS)
+    for each of the landscapes in cli_nums.  Each feature class in the
+    geodatabase is read once for all of the landscapes, and the drafted
+    features are counted in one more pass, no matter how many landscapes
+    there are.  The spreadsheets are then written one by one, or in a pool
+    of worker processes if processes is more than 1.
+
+    get_comments_from is an optional dictionary of {CLI_NUM:path to a
+    previous spreadsheet}, whose comments are carried over to the new
+    spreadsheet for that landscape.  Returns a dictionary of
+    {CLI_NUM:book path}, with False for any spreadsheet that couldn't be
+    saved."""
+
+    try:
+        if get_comments_from is None:
+            get_comments_from = {}
+
+        ## determine if it's a scratch or standards geodatabase
+        arcpy.env.workspace = input_geodatabase
+        if "Historic_Buildings" in arcpy.ListDatasets():
+            gdb_type = "standards"
+        else:
+            gdb_type = "scratch"
+
+        ## get the features for all landscapes from the lookup index
+        landscapes = [MakeUnit(c) for c in cli_nums]
+        f_lists = dict((l.code,l.GetFeatureList()) for l in landscapes)
+
+        t0 = time.time()
+        Print("\nReading features in geodatabase...")
+        buckets = ScanLandscapeFeatures(input_geodatabase,f_lists,gdb_type)
+        gis_feat_sums = CountDraftedFeatures(f_lists,input_geodatabase,
+            scratch=gdb_type == "scratch")
+        ReportRate("landscapes read",len(landscapes),t0)
+
+        jobs = []
+        for landscape in landscapes:
+            for cli_id,fc_name,oid in buckets[landscape.code]["errors"]:
+                Print("  CLI_ID error: {0} (fc {1}, OID {2})".format(
+                        str(cli_id),fc_name,oid))
+
+            ## construct book path
+            book_name = "{0}, {1}".format(landscape.code,landscape.name)
+            book_path = r"{0}\{1}.xls".format(out_directory,book_name)
+
+            if not overwrite:
+                new_path = book_path
+                counter = 1
+                while os.path.isfile(new_path):
+                    new_path = r"{0} {1}.xls".format(book_path[:-4],counter)
+                    counter+=1
+                book_path = new_path
+
+            jobs.append((landscape.code,landscape.name,book_path,
+                f_lists[landscape.code],landscape.GetFeatureDict(),
+                buckets[landscape.code],gis_feat_sums[landscape.code],
+                input_geodatabase,get_comments_from.get(landscape.code,''),
+                overwrite))
+
+        t0 = time.time()
+        Print("\nWriting spreadsheets...")
+        if processes > 1 and len(jobs) > 1:
+            Print("  using {0} worker processes".format(processes))
+            pool = MakeProcessPool(processes)
+            try:
+                pending = [pool.apply_async(WriteSingleLandscapeXLS,j)
+                    for j in jobs]
+                paths = [p.get() for p in pending]
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            paths = [WriteSingleLandscapeXLS(*j) for j in jobs]
+
+        results = {}
+        for j,path in zip(jobs,paths):
+            results[j[0]] = path
+            if path:
+                Print("  {0} spreadsheet created".format(j[0]))
+            else:
+                arcpy.AddError("  ERROR: Problem saving spreadsheet for {0}. "\
+                    "Permissions issue.\n         Close previous versions "\
+                    "and rerun process.".format(j[0]))
+        ReportRate("spreadsheets written",len(jobs),t0)
+        return results
 
-        try:
-            fbook.save(book_path)
-            Print("  spreadsheet created")
-            return book_path
-        except:
-            arcpy.AddError("  ERROR: Problem saving spreadsheet. Permissions issue.\n"\
-                  "         Close previous versions and rerun process.")
-            return False
-        
     except:
-            
+
         tb = sys.exc_info()[2]
         tbinfo = traceback.format_tb(tb)[0]
         pymsg = "PYTHON ERRORS:\nTraceback Info:\n" + tbinfo + "\nError Info:\n     "\
@@ -806,6 +783,31 @@ def MakeSingleLandscapeXLS(cli_num,input_geodatabase,out_directory,
         Print(pymsg)
         Print(arcpy.GetMessages(1))
 
+def MakeSingleLandscapeXLS(cli_num,input_geodatabase,out_directory,
+    get_comments_from='',overwrite=False):
+    """This is a flexible spreadsheet creation function that will take an
+    input geodatabase and analyize it for features that are in the landscape
+    that is indicated by the cli number.  The spreadsheet will list all
+    expected features in the landscape.  Those that have geometry in the
+    geodatabase will have an indication of what type of geometry (pt/ln/py)
+    is being used to represent the feature.  Those features that have no
+    geometry will be highlighted.  At the end of the spreadsheet there are
+    percentages printed, and the location of the input geodatabase.
+
+    Comments from a previous spreadsheet summary of this landscape can be
+    incoporated into the output of this function, by placing the file path
+    in the get_comments_from parameter.
+
+    To make the spreadsheets for many landscapes at once, use
+    MakeLandscapeXLSBatch.
+    """
+
+    results = MakeLandscapeXLSBatch([cli_num],input_geodatabase,out_directory,
+        {cli_num:get_comments_from},overwrite)
+    if results is None:
+        return None
+    return results[cli_num]
+
 def MakeXLSFromSelectedRecords(in_layer,out_path,out_name,fieldnames=[],open=False):
     """This function will create a spreadsheet with some very basic formatting
     (grey background and bold font in header row) from the attribute table
@@ -822,25 +824,23 @@ def MakeXLSFromSelectedRecords(in_layer,out_path,out_name,fieldnames=[],open=Fal
             "{0}.  The following fields will be included:\n{1}".format(
                 in_layer,"\n".join(fieldnames)))
 
-        #read values from input table
-        attr = {}
-        lyr = in_layer
-        for i,row in enumerate(arcpy.SearchCursor(lyr,"",fieldnames)):
-            attr[i] = []
-            for field in fieldnames:
-                attr[i].append(row.getValue(field))
-
-        # write to workbook
-        book = xlwt.Workbook(style_compression = 2)
+        # write to workbook, rows are flushed to disk as they are written
+        book = xlwt.Workbook(styles = xls_styles,
+            flush_row_count = XLS_FLUSH_ROWS)
         sheet = book.add_sheet("Sheet 1")
 
         for col,field in enumerate(fieldnames):
             sheet.write(0,col,field,basic_style_grey_left)        
 
-        for k,v in attr.iteritems():
-            for n in range(0,len(v)):
-                val = v[n].encode("ascii","ignore")
-                sheet.write(k+1,n,val)
+        #read values from input table and write them one row at a time
+        with arcpy.da.SearchCursor(in_layer,fieldnames) as cursor:
+            for k,row in enumerate(cursor):
+                for n,val in enumerate(row):
+                    if isinstance(val,unicode):
+                        val = val.encode("ascii","ignore")
+                    elif not val is None and not isinstance(val,(str,int,long,float)):
+                        val = str(val)
+                    sheet.write(k+1,n,val)
 
         # save to workbook
         out_workbook = os.path.join(out_path,out_name)
@@ -915,7 +915,7 @@ def CREnterpriseSingleXLS(map_document,input_code,output_dir):
 
     ## create workbook with initial info in it
     arcpy.AddMessage("Writing rows to output file...")
-    fbook = xlwt.Workbook()
+    fbook = xlwt.Workbook(styles = xls_styles)
     fsheet = fbook.add_sheet(input_code,cell_overwrite_ok=True)
 
     ## add header rows
@@ -1001,9 +1001,7 @@ def GetFeatureDictFromTables(cli_number,cli_table,cr_link,cr_catalog):
         cli_num_qry)
 
     ## create dictionary of all features in landscape with info
-    feat_dict = {}
     fields = ["CLI_ID","RESNAME","CONTRIB_STATUS","LAND_CHAR"]
-    order_cli_ids = []
     sql = (None,"ORDER BY LAND_CHAR, RESNAME")
 
     try:
@@ -1012,50 +1010,74 @@ def GetFeatureDictFromTables(cli_number,cli_table,cr_link,cr_catalog):
     except:
         c = arcpy.da.SearchCursor(cli_table,fields)
         arcpy.AddMessage("~~features are not sorted~~")
-
-    for row in c:
-        cid = row[0]
-        if cid == None or cid in feat_dict.keys():
-            continue
-        if not row[3] == "Boundary":
-            order_cli_ids.append(cid)    
-        feat_dict[cid] = [row[1],row[2],row[3]]
+    landscapes = {cli_number:MakeFeatureDict(cli_number,[tuple(r) for r in c])}
     del c
 
-    ## add boundary feature at front of cli id list
-    order_cli_ids.insert(0,cli_number)
+    JoinEnterpriseRows(landscapes,cr_link,cr_catalog)
+    return landscapes[cli_number]
 
-    ## also, add boundary to dictionary if somehow it's missing...
-    if not cli_number in feat_dict.keys():
-        feat_dict[cli_number] = ["CLI Boundary for [...]","Not Applicable","Boundary"]
+def JoinEnterpriseRows(landscapes,cr_link,cr_catalog):
+    """ Selects the CR Link rows for all of the CLI_IDs in the landscapes
+    (as made by clitools.crtables.MakeFeatureDict), and the CR Catalog rows
+    for the CR_IDs they link to, with one selection on each table (made in
+    chunks by clitools.general.SelectByIDs).  The rows are
+    joined to the feature dictionaries in memory, see
+    clitools.crtables.JoinEnterpriseTables."""
+
+    cli_ids = set()
+    for order_cli_ids,feat_dict in landscapes.itervalues():
+        cli_ids.update(order_cli_ids)
 
     ## use list of cli_ids to query cr link and get all cr_ids
-    cli_id_qry = '"CLI_ID" IN (\'{0}\')'.format("','".join(order_cli_ids))
-    arcpy.management.SelectLayerByAttribute(cr_link,"NEW_SELECTION",
-        cli_id_qry)
-    cli_id_cr_id = {}
+    SelectByIDs(cr_link,"CLI_ID",sorted(cli_ids))
     with arcpy.da.SearchCursor(cr_link,("CLI_ID","CR_ID")) as c:
-        for r in c:
-            if not r[0] in cli_id_cr_id.values():
-                cli_id_cr_id[r[1]] = r[0]
-    cr_ids = cli_id_cr_id.keys()
-    cr_id_qry = '"CR_ID" IN (\'{0}\')'.format("','".join(cr_ids))
+        link_rows = [tuple(r) for r in c]
 
     ## use cr catalog to find which features have spatial features
-    arcpy.management.SelectLayerByAttribute(cr_catalog,"NEW_SELECTION",
-        cr_id_qry)
-    with arcpy.da.SearchCursor(cr_catalog,("CR_ID","RESOURCE_TYPE")) as c:
-        for row in c:
-            cr = row[0]
-            if cr in cr_ids:
-                restype = row[1]
-                cid = cli_id_cr_id[cr]
-                if len(feat_dict[cid]) == 4:
-                    continue
-                else:
-                    feat_dict[cid].append(restype)
+    cr_ids = set([r[1] for r in link_rows if r[1]])
+    catalog_rows = []
+    if cr_ids:
+        SelectByIDs(cr_catalog,"CR_ID",sorted(cr_ids))
+        with arcpy.da.SearchCursor(cr_catalog,("CR_ID","RESOURCE_TYPE")) as c:
+            catalog_rows = [tuple(r) for r in c]
+
+    return JoinEnterpriseTables(landscapes,link_rows,catalog_rows)
+
+def GetFeatureDictsFromTables(cli_table,cr_link,cr_catalog):
+    """ Makes the GetFeatureDictFromTables() result for every landscape in
+    the current selection on the CLI Feature table, with one cursor on the
+    CLI Feature table and one selection each on the CR Link and CR Catalog
+    tables.  Returns a tuple of (cli_list,cli_dict,landscapes), where
+    cli_list holds the CLI numbers in ALPHA_CODE, CLI_NUM order, cli_dict is
+    {CLI number:(CLI_NAME,ALPHA_CODE)}, and landscapes is
+    {CLI number:(order_cli_ids,feat_dict)}."""
+
+    fs = ["CLI_NUM","CLI_NAME","ALPHA_CODE","CLI_ID","RESNAME",
+        "CONTRIB_STATUS","LAND_CHAR"]
+    sql = (None,"ORDER BY ALPHA_CODE, CLI_NUM, LAND_CHAR, RESNAME")
 
-    return (order_cli_ids,feat_dict)
+    try:
+        c = arcpy.da.SearchCursor(cli_table,fs,sql_clause=sql)
+        arcpy.AddMessage("~~features are sorted~~")
+    except:
+        c = arcpy.da.SearchCursor(cli_table,fs)
+        arcpy.AddMessage("~~features are not sorted~~")
+
+    cli_list = []
+    cli_dict = {}
+    feature_rows = {}
+    for r in c:
+        if not r[0] in cli_dict:
+            cli_list.append(r[0])
+            cli_dict[r[0]] = (r[1],r[2])
+            feature_rows[r[0]] = []
+        feature_rows[r[0]].append(tuple(r[3:]))
+    del c
+
+    landscapes = dict((k,MakeFeatureDict(k,v))
+        for k,v in feature_rows.iteritems())
+    JoinEnterpriseRows(landscapes,cr_link,cr_catalog)
+    return cli_list, cli_dict, landscapes
 
 def CREnterpriseMultipleXLS(map_document,input_code,output_dir):
     """ Using the tables available in the map document (only the CR
@@ -1111,24 +1133,14 @@ def CREnterpriseMultipleXLS(map_document,input_code,output_dir):
         arcpy.AddError("\nNo landscapes found in CLI Feature Table matching "\
             "this query.\n")
         return False
-    cli_dict = {}
-    cli_list = []
-    
-    fs = ["CLI_NUM","CLI_NAME","ALPHA_CODE"]
-    sql = (None,"ORDER BY ALPHA_CODE,CLI_NUM")
-
-    try:
-        c = arcpy.da.SearchCursor(cli_table,fs,sql_clause=sql)
-        arcpy.AddMessage("~~features are sorted~~")
-    except:
-        c = arcpy.da.SearchCursor(cli_table,fs)
-        arcpy.AddMessage("~~features are not sorted~~")
 
-    for r in c:
-        if not r[0] in cli_dict.keys():
-            cli_list.append(r[0])
-            cli_dict[r[0]] = (r[1],r[2])
-    del c
+    ## get every landscape's features, joined to the cr link and cr catalog
+    ## tables, with one query on each table
+    t0 = time.time()
+    arcpy.AddMessage("reading features for all landscapes")
+    cli_list, cli_dict, landscapes = GetFeatureDictsFromTables(
+        cli_table,cr_link_table,cr_catalog)
+    ReportRate("landscapes joined",len(cli_list),t0)
 
     ## print list of matching landscapes
     ln = len(cli_list)
@@ -1137,49 +1149,32 @@ def CREnterpriseMultipleXLS(map_document,input_code,output_dir):
  
     ## create workbook with initial info in it
     arcpy.AddMessage("\nWriting landscape summaries to output file...")
-    fbook = xlwt.Workbook()
+    fbook = xlwt.Workbook(styles = xls_styles,
+        flush_row_count = XLS_FLUSH_ROWS)
     fsheet = fbook.add_sheet(input_code,cell_overwrite_ok=True)
 
-    ## iterate through all landscapes and get counts and write rows
-    all_total, all_total_done = 0,0
-    all_contrib, all_contrib_done = 0,0
-
-    MakeMultipleSummaryXLSHeaders(fsheet,False) 
-    row_num = 3   
+    ## iterate through all landscapes and get counts, the rows are written
+    ## once the totals for the top rows are known
+    columns = {"all_expected":[],"all_done":[],"contrib_expected":[],
+        "contrib_done":[]}
+    boundaries = []
     for cli in cli_list:
 
-        ## get cli name and park alpha
-        name = cli_dict[cli][0]
-        park = cli_dict[cli][1]
-
         arcpy.AddMessage("  {0} {1} {2}".format(
             cli_dict[cli][1],cli,cli_dict[cli][0]))
 
-        rslt = GetFeatureDictFromTables(cli,cli_table,cr_link_table,cr_catalog)
-        f_dict = rslt[1]
-
-        ## calculate percentages and get styles for percentage cells
-        cli_total = len(f_dict.keys())-1
-        cli_total_done = len([i for i in f_dict.keys() if len(f_dict[i]) == 4\
-            and not f_dict[i][2] == "Boundary"])
-        cli_total_perc = MakePercentage(cli_total_done,cli_total)
-        cli_total_perc_style = ChoosePercStyle(
-            cli_total_perc,low_pct_style,mid_pct_style,high_pct_style)
-
-        cli_contrib = len([i for i in f_dict.keys() if f_dict[i][1].lower()\
-            == "contributing"])
-        cli_contrib_done = len([i for i in f_dict.keys() if len(f_dict[i]) == 4\
-            and f_dict[i][1].lower() == "contributing"\
-            and not f_dict[i][2] == "Boundary"])
-        cli_contrib_perc = MakePercentage(cli_contrib_done,cli_contrib)
-        cli_contrib_perc_style = ChoosePercStyle(
-            cli_contrib_perc,low_pct_style,mid_pct_style,high_pct_style)
-
-        ## update total counts
-        all_total+=cli_total
-        all_total_done+=cli_total_done
-        all_contrib+=cli_contrib
-        all_contrib_done+=cli_contrib_done
+        f_dict = landscapes[cli][1]
+
+        ## count the features, the percentages are made for all of the
+        ## landscapes at once below
+        columns["all_expected"].append(len(f_dict.keys())-1)
+        columns["all_done"].append(len([i for i in f_dict.keys()
+            if len(f_dict[i]) == 4 and not f_dict[i][2] == "Boundary"]))
+        columns["contrib_expected"].append(len([i for i in f_dict.keys()
+            if f_dict[i][1].lower() == "contributing"]))
+        columns["contrib_done"].append(len([i for i in f_dict.keys()
+            if len(f_dict[i]) == 4 and f_dict[i][1].lower() == "contributing"
+            and not f_dict[i][2] == "Boundary"]))
 
         ## get boundary flag
         bnd = False
@@ -1187,44 +1182,20 @@ def CREnterpriseMultipleXLS(map_document,input_code,output_dir):
             if "Boundary" in v:
                 if len(v) == 4:
                     bnd = True
+        boundaries.append(bnd)
 
-        ## write all info to row
-        writerow = fsheet.row(row_num)
-
-        for colnum in range(0,15):
-            if colnum == 0:
-                writerow.set_cell_text(colnum,park,basic_style)
-            elif colnum == 1:
-                writerow.set_cell_text(colnum,cli,basic_style)
-            elif colnum == 2:
-                writerow.set_cell_text(colnum,name,cli_name_style)
-            if colnum == 3:
-                if bnd:
-                    writerow.set_cell_text(colnum,"YES",boundary_yes_style)
-                else:
-                    writerow.set_cell_text(colnum,"NO",boundary_no_style)
-            elif colnum == 4:
-                writerow.set_cell_text(colnum,str(cli_contrib_done),basic_style)
-            elif colnum == 5:
-                writerow.set_cell_text(colnum,str(cli_contrib),basic_style)
-            elif colnum == 6:
-                writerow.set_cell_text(colnum,cli_contrib_perc+"%",cli_contrib_perc_style)
-            elif colnum == 7:
-                writerow.set_cell_text(colnum,str(cli_total_done),basic_style)
-            elif colnum == 8:
-                writerow.set_cell_text(colnum,str(cli_total),basic_style)
-            elif colnum == 9:
-                writerow.set_cell_text(colnum,cli_total_perc+"%",cli_total_perc_style)
-        row_num += 1
-
-    #final step, print top row
+    table = SummaryTable(cli_list,columns)
+
+    ## print top rows
     date = strftime("%m-%d-%y")
     title = "CLI spatial data for {0} in CR Enterprise, {1}".format(
         input_code,date)
 
     ## make percentages for total
-    all_total_perc = MakePercentage(all_total_done,all_total)
-    all_contrib_perc = MakePercentage(all_contrib_done,all_contrib)
+    all_total,all_total_done,all_total_perc = table.Totals(
+        "all_done","all_expected")
+    all_contrib,all_contrib_done,all_contrib_perc = table.Totals(
+        "contrib_done","contrib_expected")
 
     cont_sum_msg = "{0} ({1}%) of {2} Contributing Features Drafted".format(
         all_contrib_done,all_contrib_perc,all_contrib)
@@ -1239,6 +1210,23 @@ def CREnterpriseMultipleXLS(map_document,input_code,output_dir):
     fsheet.write(1,8,"50% - 75%",mid_pct_style)
     fsheet.write(1,9,"75% - 100%",high_pct_style)
 
+    ## write all landscape rows
+    MakeMultipleSummaryXLSHeaders(fsheet,False)
+    WriteSummaryRows(fsheet,[
+        ([cli_dict[cli][1] for cli in cli_list],basic_style),
+        (cli_list,basic_style),
+        ([cli_dict[cli][0] for cli in cli_list],cli_name_style),
+        (["YES" if b else "NO" for b in boundaries],
+            [boundary_yes_style if b else boundary_no_style
+            for b in boundaries]),
+        (table.Text("contrib_done"),basic_style),
+        (table.Text("contrib_expected"),basic_style),
+        PercentageColumn(table,"contrib_done","contrib_expected"),
+        (table.Text("all_done"),basic_style),
+        (table.Text("all_expected"),basic_style),
+        PercentageColumn(table,"all_done","all_expected"),
+        ])
+
     fbook.save(new_xls)
     arcpy.AddMessage("\nspreadsheet created\n")
     return new_xls
\ No newline at end of file
@@ -0,0 +1,235 @@
+__doc__ = \
+"""Contains the pure python parts of the geodatabase checks in
+clitools.general (CheckValuesAgainstDomains, etc.).  Nothing in this module
+uses arcpy: the rows are pulled through one of the table readers in
+clitools.readers, so the same checks can be run against a csv or SQLite
+copy of a feature class's attribute table.
+
+from clitools.readers import CSVTableReader
+from clitools.validation import DomainCheck, ValidateFeatureClass
+
+domains = {"YesNo":DomainCheck("YesNo",codes=["Yes","No"])}
+result = ValidateFeatureClass(CSVTableReader("crbldg_py.csv"),
+    [("CONTRIBRES","YesNo")],domains,oid_field="OBJECTID")
+"""
+
+import os
+import csv
+import json
+
+NULL_TEXT = "<Null>"
+
+def ValueText(value):
+    '''Returns the text form of a value that is used in the logs and
+    reports.  NULL values are shown as <Null>.'''
+
+    if value is None:
+        return NULL_TEXT
+    if isinstance(value,unicode):
+        return value.encode('ascii','ignore')
+    return str(value)
+
+class DomainCheck(object):
+    """Holds the valid values for one geodatabase domain.  Coded value
+    domains are held as a set of the codes (and a set of their text forms,
+    so that "1" and 1 are treated alike), and range domains as a
+    (min,max) tuple.  NULL is never a valid value."""
+
+    def __init__(self,name,codes=None,value_range=None):
+
+        self.name = name
+        self.codes = set(codes or [])
+        self.text_codes = set([ValueText(c) for c in self.codes])
+        self.value_range = value_range
+
+    def IsValid(self,value):
+        '''Returns True if the value is allowed by the domain.'''
+
+        if value is None:
+            return False
+        if self.value_range is not None:
+            try:
+                return self.value_range[0] <= value <= self.value_range[1]
+            except TypeError:
+                return False
+        try:
+            if value in self.codes:
+                return True
+        except TypeError:
+            pass
+        return ValueText(value) in self.text_codes
+
+def MakeDomainChecks(domain_objects):
+    '''Returns a dictionary of {domain name:DomainCheck} from a list of
+    arcpy.da.Domain objects (or anything with the same name, domainType,
+    codedValues, and range attributes).'''
+
+    checks = {}
+    for d in domain_objects:
+        if d.domainType == "Range":
+            checks[d.name] = DomainCheck(d.name,value_range=tuple(d.range))
+        else:
+            checks[d.name] = DomainCheck(d.name,codes=d.codedValues.keys())
+    return checks
+
+def ValidateRows(rows,field_domains,domains):
+    '''Checks rows of (OBJECTID,value,value,...) against the domains, where
+    field_domains is a list of (field name,domain name) tuples in the same
+    order as the values.  Returns a list with one entry per field:
+
+    [(field name,domain name,[(value text,count,[OBJECTIDs]),...]),...]
+
+    The bad values for each field are listed in the order they were first
+    found.'''
+
+    checks = [domains.get(d) for f,d in field_domains]
+    bad = [{} for f in field_domains]
+    order = [[] for f in field_domains]
+
+    for row in rows:
+        oid = row[0]
+        for i,check in enumerate(checks):
+            value = row[i+1]
+            if check is None or check.IsValid(value):
+                continue
+            text = ValueText(value)
+            entry = bad[i].get(text)
+            if entry is None:
+                entry = bad[i][text] = [0,[]]
+                order[i].append(text)
+            entry[0]+=1
+            entry[1].append(oid)
+
+    result = []
+    for i,(field,domain) in enumerate(field_domains):
+        values = [(t,bad[i][t][0],bad[i][t][1]) for t in order[i]]
+        result.append((field,domain,values))
+    return result
+
+def ValidateFeatureClass(reader,field_domains,domains,oid_field="OID@"):
+    '''Reads all of the domain fields of one feature class in a single pass
+    through the reader, and returns a tuple of (name,results), where results
+    is the list returned by ValidateRows().'''
+
+    if len(field_domains) == 0:
+        return reader.name, []
+    fields = [oid_field] + [f for f,d in field_domains]
+    rows = reader.ReadRows(fields)
+    return reader.name, ValidateRows(rows,field_domains,domains)
+
+def WriteDomainReport(results,json_path=None,csv_path=None,source=''):
+    '''Writes the results of a domain check to a json file and/or a csv
+    file.  results is a list of (feature class name,results) tuples as
+    returned by ValidateFeatureClass().'''
+
+    if json_path:
+        report = {"geodatabase":source,"feature_classes":[]}
+        for fc_name,fields in results:
+            fc = {"name":fc_name,"fields":[]}
+            for field,domain,values in fields:
+                fc["fields"].append({"field":field,"domain":domain,
+                    "bad_values":[{"value":v,"count":c,"oids":oids}
+                        for v,c,oids in values]})
+            report["feature_classes"].append(fc)
+        with open(json_path,"wb") as f:
+            json.dump(report,f,indent=2)
+
+    if csv_path:
+        with open(csv_path,"wb") as f:
+            writer = csv.writer(f)
+            writer.writerow(["FEATURE_CLASS","FIELD","DOMAIN","VALUE","COUNT",
+                "OBJECTIDS"])
+            for fc_name,fields in results:
+                for field,domain,values in fields:
+                    for v,c,oids in values:
+                        writer.writerow([fc_name,field,domain,v,c,
+                            ";".join([str(o) for o in oids])])
+
+## the mandatory NPS CR Spatial Data Transfer Standards fields
+MANDATORY_FIELDS = ["BND_TYPE","IS_EXTANT","CONTRIBRES","RESTRICT_","SOURCE",
+    "SRC_DATE","SRC_SCALE","SRC_ACCU","SRC_COORD","MAP_METHOD","CREATEDATE",
+    "EDIT_DATE","ORIGINATOR","CONSTRANT","VERT_ERROR"]
+
+def MandatoryFields(feature_class,check_guids=False):
+    '''Returns the list of mandatory fields to check in a feature class.
+    The TYPE field is added for "othr" feature classes, and the CR_ID and
+    GEOM_ID fields are added if check_guids is True.'''
+
+    fields = list(MANDATORY_FIELDS)
+    if "othr" in feature_class:
+        fields.append("TYPE")
+    if check_guids:
+        fields.append("CR_ID")
+        fields.append("GEOM_ID")
+    return fields
+
+def IsEmptyValue(value):
+    '''Returns True for NULL values and for strings that are empty once
+    whitespace and non-ascii characters are removed.'''
+
+    if value is None:
+        return True
+    if isinstance(value,unicode):
+        return value.encode('ascii','ignore').rstrip() == ""
+    if isinstance(value,str):
+        return value.rstrip() == ""
+    return False
+
+def CheckRowsForNulls(rows,fields):
+    '''Checks rows of (OBJECTID,value,value,...) for empty values, in a
+    single pass.  Returns a tuple of (row count,[(field,[OBJECTIDs]),...])
+    with one entry for each of the fields, in order.'''
+
+    empty = [[] for f in fields]
+    indices = range(len(fields))
+    count = 0
+    for row in rows:
+        count+=1
+        for i in indices:
+            if IsEmptyValue(row[i+1]):
+                empty[i].append(row[0])
+    return count, zip(fields,empty)
+
+def CheckNullsInFeatureClass(reader,fields,oid_field="OID@",
+                             available_fields=None):
+    '''Checks one feature class for empty values in any of the fields, with
+    a single pass through the reader.  Returns a dictionary with these keys:
+        "name"      name of the feature class
+        "count"     total number of features
+        "fields"    list of (field,[OBJECTIDs of empty values]) tuples
+        "error"     a message if the check couldn't be run, otherwise None
+
+    If a list of available_fields is given, the check is aborted if any of
+    the fields are missing from it.'''
+
+    result = {"name":reader.name,"count":0,"fields":[],"error":None}
+    if available_fields is not None:
+        for f in fields:
+            if not f in available_fields:
+                result["error"] = "operation aborted because field {0} is "\
+                    "missing".format(f)
+                return result
+
+    rows = reader.ReadRows([oid_field] + list(fields))
+    result["count"], result["fields"] = CheckRowsForNulls(rows,fields)
+    return result
+
+def FormatNullReport(result):
+    '''Returns the text summary of a CheckNullsInFeatureClass() result, one
+    line per field.'''
+
+    if result["error"]:
+        return result["error"]
+
+    ct = result["count"]
+    lines = ["{0} | {1} total feature{2}".format(
+        result["name"],ct,"s" if not ct == 1 else "")]
+    for field,oids in result["fields"]:
+        string = "OK"
+        n = len(oids)
+        if not n == 0:
+            string = "needs help ({0} feature{1})".format(
+                n,"s" if not n == 1 else "")
+        lines.append("  {0}{1}{2}".format(field,(12-len(field))*" ",string))
+    lines.append("\n")
+    return "\n".join(lines)
@@ -306,6 +306,7 @@ import sys, zipfile, pprint
 import timemachine
 from biffh import (
     XLRDError,
+    XLRDRowOrderError,
     biff_text_from_num,
     error_text_from_code,
     XL_CELL_BLANK,
@@ -379,6 +380,13 @@ USE_MMAP = MMAP_AVAILABLE
 # Sheet.row_len() method.
 # <br /> -- New in version 0.7.2
 #
+# @param lazy_shared_strings False (the default) means the whole shared string table is
+# decoded when the workbook is opened. True means only the position of each string is
+# recorded, and a string is decoded the first time a cell that refers to it is read
+# (see LazySharedStrings in the book module). This saves time and memory when only a
+# few columns are read, e.g. with Book.iter_sheet_rows(sheetx, columns).
+# <br /> -- Added to the copy of xlrd that is bundled with clitools.
+#
 # @return An instance of the Book class.
 
 def open_workbook(filename=None,
@@ -391,6 +399,7 @@ def open_workbook(filename=None,
     formatting_info=False,
     on_demand=False,
     ragged_rows=False,
+    lazy_shared_strings=False,
     ):
     peeksz = 4
     if file_contents:
@@ -440,6 +449,7 @@ def open_workbook(filename=None,
         formatting_info=formatting_info,
         on_demand=on_demand,
         ragged_rows=ragged_rows,
+        lazy_shared_strings=lazy_shared_strings,
         )
     return bk
 
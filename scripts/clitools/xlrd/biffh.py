@@ -25,6 +25,14 @@ from timemachine import *
 class XLRDError(Exception):
     pass
 
+##
+# Raised by Book.iter_sheet_rows() when a cell comes before a row that has
+# already been yielded. The sheet can still be loaded with sheet_by_index().
+# <br /> -- Added to the copy of xlrd that is bundled with clitools.
+
+class XLRDRowOrderError(XLRDError):
+    pass
+
 ##
 # Parent of almost all other classes in the package. Defines a common "dump" method
 # for debugging.
@@ -7,6 +7,9 @@
 from timemachine import *
 from biffh import *
 import struct; unpack = struct.unpack
+import codecs
+import array
+from collections import OrderedDict
 import sys
 import time
 import sheet
@@ -67,6 +70,7 @@ def open_workbook_xls(filename=None,
     file_contents=None,
     encoding_override=None,
     formatting_info=False, on_demand=False, ragged_rows=False,
+    lazy_shared_strings=False,
     ):
     t0 = time.clock()
     if TOGGLE_GC:
@@ -82,6 +86,7 @@ def open_workbook_xls(filename=None,
             formatting_info=formatting_info,
             on_demand=on_demand,
             ragged_rows=ragged_rows,
+            lazy_shared_strings=lazy_shared_strings,
             )
         t1 = time.clock()
         bk.load_time_stage_1 = t1 - t0
@@ -428,6 +433,39 @@ class Book(BaseObject):
     def sheet_by_index(self, sheetx):
         return self._sheet_list[sheetx] or self.get_sheet(sheetx)
 
+    ##
+    # Yields the rows of a worksheet as tuples of cell values. If the sheet
+    # has not been loaded, it is parsed as the rows are consumed (see
+    # Sheet.iter_read) and its cells are never stored, so a large sheet can be
+    # read in roughly constant memory. This needs open_workbook(...,
+    # on_demand=True), or the sheet to have been loaded already.
+    # @param sheetx Sheet index in range(nsheets)
+    # @param columns Optional sequence of column indexes. Only these columns
+    # are kept, and each row is a tuple of their values in this order.
+    # <br /> -- Added to the copy of xlrd that is bundled with clitools.
+    def iter_sheet_rows(self, sheetx, columns=None):
+        sh = self._sheet_list[sheetx]
+        if sh:
+            for rowx in xrange(sh.nrows):
+                values = sh.row_values(rowx)
+                if columns is None:
+                    yield tuple(values)
+                else:
+                    n = len(values)
+                    yield tuple([(values[c] if c < n else '') for c in columns])
+            return
+        if self._resources_released:
+            raise XLRDError("Can't load sheets after releasing resources.")
+        self._position = self._sh_abs_posn[sheetx]
+        self.getbof(XL_WORKSHEET)
+        sh = sheet.Sheet(self,
+                self._position,
+                self._sheet_names[sheetx],
+                sheetx,
+                )
+        for row in sh.iter_read(self, columns):
+            yield row
+
     ##
     # @param sheet_name Name of sheet required
     # @return An object of the Sheet class
@@ -552,6 +590,7 @@ class Book(BaseObject):
         formatting_info=False,
         on_demand=False,
         ragged_rows=False,
+        lazy_shared_strings=False,
         ):
         # DEBUG = 0
         self.logfile = logfile
@@ -562,6 +601,7 @@ class Book(BaseObject):
         self.formatting_info = formatting_info
         self.on_demand = on_demand
         self.ragged_rows = ragged_rows
+        self.lazy_shared_strings = lazy_shared_strings
 
         if not file_contents:
             if python_version < (2, 2) and self.use_mmap:
@@ -1150,7 +1190,11 @@ class Book(BaseObject):
             if DEBUG >= 2:
                 fprintf(self.logfile, "CONTINUE: adding %d bytes to SST -> %d\n", nb, nbt)
             strlist.append(data)
-        self._sharedstrings, rt_runlist = unpack_SST_table(strlist, uniquestrings)
+        if self.lazy_shared_strings:
+            self._sharedstrings = LazySharedStrings(strlist, uniquestrings)
+            rt_runlist = self._sharedstrings.richtext_runs
+        else:
+            self._sharedstrings, rt_runlist = unpack_SST_table(strlist, uniquestrings)
         if self.formatting_info:
             self._rich_text_runlist_map = rt_runlist        
         if DEBUG:
@@ -1357,89 +1401,230 @@ def display_cell_address(rowx, colx, relrow, relcol):
         colpart = "$" + colname(colx)
     return colpart + rowpart
 
+_unpack_H = struct.Struct('<H').unpack_from
+_unpack_HB = struct.Struct('<HB').unpack_from
+_unpack_i = struct.Struct('<i').unpack_from
+_unpack_HH = struct.Struct('<HH').unpack_from
+
 def unpack_SST_table(datatab, nstrings):
     "Return list of strings"
+    # The SST record and its CONTINUE records are joined into one buffer up
+    # front, so that the usual string (one that ends in the record where it
+    # starts) is decoded from a single slice. Only the character data of a
+    # string that runs past the end of a record is built from fragments: it
+    # resumes after an options byte at the start of the next record.
+    # Rich text runs and phonetic data are not interrupted in this way.
+    if len(datatab) == 1:
+        data = datatab[0]
+    else:
+        data = BYTES_NULL.join(datatab)
+    ends = []
+    end = 0
+    for d in datatab:
+        end += len(d)
+        ends.append(end)
+    lastinx = len(ends) - 1
     datainx = 0
-    ndatas = len(datatab)
-    data = datatab[0]
-    datalen = len(data)
+    recend = ends[0]
     pos = 8
     strings = []
     strappend = strings.append
     richtext_runs = {}
-    local_unpack = unpack
+    local_unpack_H = _unpack_H
+    local_unpack_HB = _unpack_HB
+    local_unpack_i = _unpack_i
+    local_unpack_HH = _unpack_HH
     local_min = min
     local_BYTES_ORD = BYTES_ORD
-    latin_1 = "latin_1"
+    latin_1_decode = codecs.latin_1_decode
+    utf_16_le_decode = codecs.utf_16_le_decode
     for _unused_i in xrange(nstrings):
-        nchars = local_unpack('<H', data[pos:pos+2])[0]
-        pos += 2
-        options = local_BYTES_ORD(data[pos])
-        pos += 1
+        while pos >= recend and datainx < lastinx:
+            datainx += 1
+            recend = ends[datainx]
+        nchars, options = local_unpack_HB(data, pos)
+        pos += 3
         rtcount = 0
         phosz = 0
         if options & 0x08: # richtext
-            rtcount = local_unpack('<H', data[pos:pos+2])[0]
+            rtcount = local_unpack_H(data, pos)[0]
             pos += 2
         if options & 0x04: # phonetic
-            phosz = local_unpack('<i', data[pos:pos+4])[0]
+            phosz = local_unpack_i(data, pos)[0]
             pos += 4
-        accstrg = u''
+        if options & 0x01:
+            # Uncompressed UTF-16
+            nbytes = nchars << 1
+        else:
+            # Note: this is COMPRESSED (not ASCII!) encoding!!!
+            nbytes = nchars
+        if pos + nbytes <= recend:
+            if options & 0x01:
+                strg = utf_16_le_decode(data[pos:pos+nbytes], 'strict', True)[0]
+            else:
+                strg = latin_1_decode(data[pos:pos+nbytes])[0]
+            pos += nbytes
+        else:
+            fragments = []
+            charsgot = 0
+            while 1:
+                charsneed = nchars - charsgot
+                if options & 0x01:
+                    charsavail = local_min((recend - pos) >> 1, charsneed)
+                    fragments.append(utf_16_le_decode(
+                        data[pos:pos+2*charsavail], 'strict', True)[0])
+                    pos += 2*charsavail
+                else:
+                    charsavail = local_min(recend - pos, charsneed)
+                    fragments.append(latin_1_decode(data[pos:pos+charsavail])[0])
+                    pos += charsavail
+                charsgot += charsavail
+                if charsgot == nchars:
+                    break
+                pos = recend
+                datainx += 1
+                recend = ends[datainx]
+                options = local_BYTES_ORD(data[pos])
+                pos += 1
+            strg = u''.join(fragments)
+
+        if rtcount:
+            richtext_runs[len(strings)] = [local_unpack_HH(data, pos + 4*runindex)
+                for runindex in xrange(rtcount)]
+            pos += 4*rtcount
+
+        pos += phosz # size of the phonetic stuff to skip
+        strappend(strg)
+    return strings, richtext_runs
+
+##
+# A stand-in for the list of shared strings that is used when a workbook is
+# opened with lazy_shared_strings=True. At load time the SST is only walked to
+# record where the character data of each string starts; a string is decoded
+# the first time it is looked up, and the most recently used strings are kept
+# in a cache of up to cache_size entries. The few strings that are split
+# across CONTINUE records, and the rich text runs, are decoded up front.
+# <br /> -- Added to the copy of xlrd that is bundled with clitools.
+
+class LazySharedStrings(object):
+
+    def __init__(self, datatab, nstrings, cache_size=10000):
+        if len(datatab) == 1:
+            data = datatab[0]
+        else:
+            data = BYTES_NULL.join(datatab)
+        self.data = data
+        self.nstrings = nstrings
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.richtext_runs = {}
+        self.split_strings = {}
+        self.positions = array.array('i')
+        self.nchars = array.array('i')
+        self.options = array.array('B')
+        ends = []
+        end = 0
+        for d in datatab:
+            end += len(d)
+            ends.append(end)
+        lastinx = len(ends) - 1
+        datainx = 0
+        recend = ends[0]
+        pos = 8
+        positions = self.positions.append
+        nchars_append = self.nchars.append
+        options_append = self.options.append
+        local_unpack_H = _unpack_H
+        local_unpack_HB = _unpack_HB
+        local_unpack_i = _unpack_i
+        local_unpack_HH = _unpack_HH
+        for stringx in xrange(nstrings):
+            while pos >= recend and datainx < lastinx:
+                datainx += 1
+                recend = ends[datainx]
+            nchars, options = local_unpack_HB(data, pos)
+            pos += 3
+            rtcount = 0
+            phosz = 0
+            if options & 0x08: # richtext
+                rtcount = local_unpack_H(data, pos)[0]
+                pos += 2
+            if options & 0x04: # phonetic
+                phosz = local_unpack_i(data, pos)[0]
+                pos += 4
+            positions(pos)
+            nchars_append(nchars)
+            options_append(options & 0x01)
+            if options & 0x01:
+                nbytes = nchars << 1
+            else:
+                nbytes = nchars
+            if pos + nbytes <= recend:
+                pos += nbytes
+            else:
+                # decode it now, the same way as unpack_SST_table
+                strg, pos, datainx = self._decode_split(
+                    data, pos, nchars, options, ends, datainx)
+                recend = ends[datainx]
+                self.split_strings[stringx] = strg
+            if rtcount:
+                self.richtext_runs[stringx] = [local_unpack_HH(data, pos + 4*runindex)
+                    for runindex in xrange(rtcount)]
+                pos += 4*rtcount
+            pos += phosz # size of the phonetic stuff to skip
+
+    def _decode_split(self, data, pos, nchars, options, ends, datainx):
+        recend = ends[datainx]
+        fragments = []
         charsgot = 0
         while 1:
             charsneed = nchars - charsgot
             if options & 0x01:
-                # Uncompressed UTF-16
-                charsavail = local_min((datalen - pos) >> 1, charsneed)
-                rawstrg = data[pos:pos+2*charsavail]
-                # if DEBUG: print "SST U16: nchars=%d pos=%d rawstrg=%r" % (nchars, pos, rawstrg)
-                try:
-                    accstrg += unicode(rawstrg, "utf_16_le")
-                except:
-                    # print "SST U16: nchars=%d pos=%d rawstrg=%r" % (nchars, pos, rawstrg)
-                    # Probable cause: dodgy data e.g. unfinished surrogate pair.
-                    # E.g. file unicode2.xls in pyExcelerator's examples has cells containing
-                    # unichr(i) for i in range(0x100000)
-                    # so this will include 0xD800 etc
-                    raise
+                charsavail = min((recend - pos) >> 1, charsneed)
+                fragments.append(codecs.utf_16_le_decode(
+                    data[pos:pos+2*charsavail], 'strict', True)[0])
                 pos += 2*charsavail
             else:
-                # Note: this is COMPRESSED (not ASCII!) encoding!!!
-                charsavail = local_min(datalen - pos, charsneed)
-                rawstrg = data[pos:pos+charsavail]
-                # if DEBUG: print "SST CMPRSD: nchars=%d pos=%d rawstrg=%r" % (nchars, pos, rawstrg)
-                accstrg += unicode(rawstrg, latin_1)
+                charsavail = min(recend - pos, charsneed)
+                fragments.append(codecs.latin_1_decode(data[pos:pos+charsavail])[0])
                 pos += charsavail
             charsgot += charsavail
             if charsgot == nchars:
                 break
+            pos = recend
             datainx += 1
-            data = datatab[datainx]
-            datalen = len(data)
-            options = local_BYTES_ORD(data[0])
-            pos = 1
-        
-        if rtcount:
-            runs = []
-            for runindex in xrange(rtcount):
-                if pos == datalen:
-                    pos = 0
-                    datainx += 1
-                    data = datatab[datainx]
-                    datalen = len(data)
-                runs.append(local_unpack("<HH", data[pos:pos+4]))
-                pos += 4
-            richtext_runs[len(strings)] = runs
-                
-        pos += phosz # size of the phonetic stuff to skip
-        if pos >= datalen:
-            # adjust to correct position in next record
-            pos = pos - datalen
-            datainx += 1
-            if datainx < ndatas:
-                data = datatab[datainx]
-                datalen = len(data)
-            else:
-                assert _unused_i == nstrings - 1
-        strappend(accstrg)
-    return strings, richtext_runs
+            recend = ends[datainx]
+            options = BYTES_ORD(data[pos])
+            pos += 1
+        return u''.join(fragments), pos, datainx
+
+    def __len__(self):
+        return self.nstrings
+
+    def __getitem__(self, stringx):
+        if stringx < 0:
+            stringx += self.nstrings
+        cache = self.cache
+        try:
+            # move it to the most recently used end
+            strg = cache.pop(stringx)
+            cache[stringx] = strg
+            return strg
+        except KeyError:
+            pass
+        if stringx in self.split_strings:
+            return self.split_strings[stringx]
+        pos = self.positions[stringx]
+        if self.options[stringx]:
+            strg = codecs.utf_16_le_decode(
+                self.data[pos:pos+2*self.nchars[stringx]], 'strict', True)[0]
+        else:
+            strg = codecs.latin_1_decode(self.data[pos:pos+self.nchars[stringx]])[0]
+        cache[stringx] = strg
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return strg
+
+    def __iter__(self):
+        for stringx in xrange(self.nstrings):
+            yield self[stringx]
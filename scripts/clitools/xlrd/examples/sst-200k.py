@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# Times the shared string table (SST) decoder on a generated workbook with
+# 200,000 unique strings, most of them long RESNAME-like names and some with
+# non-latin-1 characters, against the decoder from xlrd 0.8.0, and checks
+# that both give identical results.
+
+import os
+import sys
+import random
+import tempfile
+from struct import unpack
+from time import time
+
+import xlrd
+import xlwt
+from xlrd import book
+
+nstrings = 200000
+
+# the decoder as it was in xlrd 0.8.0, for comparison
+BYTES_ORD = ord
+def unpack_SST_table_0_8_0(datatab, nstrings):
+    "Return list of strings"
+    datainx = 0
+    ndatas = len(datatab)
+    data = datatab[0]
+    datalen = len(data)
+    pos = 8
+    strings = []
+    strappend = strings.append
+    richtext_runs = {}
+    local_unpack = unpack
+    local_min = min
+    local_BYTES_ORD = BYTES_ORD
+    latin_1 = "latin_1"
+    for _unused_i in xrange(nstrings):
+        nchars = local_unpack('<H', data[pos:pos+2])[0]
+        pos += 2
+        options = local_BYTES_ORD(data[pos])
+        pos += 1
+        rtcount = 0
+        phosz = 0
+        if options & 0x08: # richtext
+            rtcount = local_unpack('<H', data[pos:pos+2])[0]
+            pos += 2
+        if options & 0x04: # phonetic
+            phosz = local_unpack('<i', data[pos:pos+4])[0]
+            pos += 4
+        accstrg = u''
+        charsgot = 0
+        while 1:
+            charsneed = nchars - charsgot
+            if options & 0x01:
+                # Uncompressed UTF-16
+                charsavail = local_min((datalen - pos) >> 1, charsneed)
+                rawstrg = data[pos:pos+2*charsavail]
+                # if DEBUG: print "SST U16: nchars=%d pos=%d rawstrg=%r" % (nchars, pos, rawstrg)
+                try:
+                    accstrg += unicode(rawstrg, "utf_16_le")
+                except:
+                    # print "SST U16: nchars=%d pos=%d rawstrg=%r" % (nchars, pos, rawstrg)
+                    # Probable cause: dodgy data e.g. unfinished surrogate pair.
+                    # E.g. file unicode2.xls in pyExcelerator's examples has cells containing
+                    # unichr(i) for i in range(0x100000)
+                    # so this will include 0xD800 etc
+                    raise
+                pos += 2*charsavail
+            else:
+                # Note: this is COMPRESSED (not ASCII!) encoding!!!
+                charsavail = local_min(datalen - pos, charsneed)
+                rawstrg = data[pos:pos+charsavail]
+                # if DEBUG: print "SST CMPRSD: nchars=%d pos=%d rawstrg=%r" % (nchars, pos, rawstrg)
+                accstrg += unicode(rawstrg, latin_1)
+                pos += charsavail
+            charsgot += charsavail
+            if charsgot == nchars:
+                break
+            datainx += 1
+            data = datatab[datainx]
+            datalen = len(data)
+            options = local_BYTES_ORD(data[0])
+            pos = 1
+        
+        if rtcount:
+            runs = []
+            for runindex in xrange(rtcount):
+                if pos == datalen:
+                    pos = 0
+                    datainx += 1
+                    data = datatab[datainx]
+                    datalen = len(data)
+                runs.append(local_unpack("<HH", data[pos:pos+4]))
+                pos += 4
+            richtext_runs[len(strings)] = runs
+                
+        pos += phosz # size of the phonetic stuff to skip
+        if pos >= datalen:
+            # adjust to correct position in next record
+            pos = pos - datalen
+            datainx += 1
+            if datainx < ndatas:
+                data = datatab[datainx]
+                datalen = len(data)
+            else:
+                assert _unused_i == nstrings - 1
+        strappend(accstrg)
+    return strings, richtext_runs
+
+def make_workbook(path):
+    rand = random.Random(0)
+    words = ["House", "Barn", "Road", "Fence", "Orchard", "Cemetery", "Mill",
+        "Bridge", "Trail", "Garden", "Wall", "Cabin", "Spring", "Ranch",
+        u"Caf\xe9", u"\u0160koda", u"\u65e5\u672c"]
+    wb = xlwt.Workbook(encoding='utf-8', flush_row_count=1000)
+    for i in xrange(nstrings):
+        rowx = i % 50000
+        if rowx == 0:
+            ws = wb.add_sheet(str(i // 50000))
+        name = u" ".join([rand.choice(words) for j in xrange(rand.randint(2, 12))])
+        ws.write(rowx, 0, u"%s %d" % (name, i))
+    wb.save(path)
+
+def capture_sst(path):
+    captured = []
+    decoder = book.unpack_SST_table
+    def capture(datatab, nstrings):
+        captured.append((datatab, nstrings))
+        return decoder(datatab, nstrings)
+    book.unpack_SST_table = capture
+    try:
+        xlrd.open_workbook(path, on_demand=True).release_resources()
+    finally:
+        book.unpack_SST_table = decoder
+    return captured[0]
+
+path = os.path.join(tempfile.gettempdir(), "sst-200k.xls")
+t0 = time()
+make_workbook(path)
+print "made %s (%d bytes) in %.2f s" % (path, os.path.getsize(path), time() - t0)
+
+datatab, n = capture_sst(path)
+print "%d strings in %d SST/CONTINUE records" % (n, len(datatab))
+
+t0 = time()
+old_result = unpack_SST_table_0_8_0(datatab, n)
+t_old = time() - t0
+t0 = time()
+new_result = book.unpack_SST_table(datatab, n)
+t_new = time() - t0
+assert old_result == new_result
+print "xlrd 0.8.0 decoder: %.3f s" % t_old
+print "current decoder:    %.3f s (%.1fx)" % (t_new, t_old / max(t_new, 1e-9))
+os.remove(path)
@@ -317,6 +317,8 @@ class Sheet(BaseObject):
         self.verbosity = book.verbosity
         self.formatting_info = book.formatting_info
         self.ragged_rows = book.ragged_rows
+        # columns being streamed by iter_read(); None means all of them
+        self._colmap = None
         if self.ragged_rows:
             self.put_cell = self.put_cell_ragged
         else:
@@ -750,6 +752,41 @@ class Sheet(BaseObject):
     # === Methods after this line neither know nor care about how cells are stored.
 
     def read(self, bk):
+        for _unused in self._read_records(bk):
+            pass
+        return 1
+
+    ##
+    # Parses the sheet's records as read() does, but yields each row as a
+    # tuple of cell values as soon as the parser has moved past it, instead
+    # of storing the cells on this object. Memory use does not grow with the
+    # number of rows. Empty rows are yielded as well, so the n-th tuple is
+    # always row n.
+    # @param bk The Book (with its resources not yet released).
+    # @param columns Optional sequence of column indexes. Only these columns
+    # are kept, and each row is a tuple of their values in this order.
+    # Without it, each row stops at its last non-empty cell, as with
+    # open_workbook(..., ragged_rows=True).
+    # <br /> -- Added to the copy of xlrd that is bundled with clitools.
+    def iter_read(self, bk, columns=None):
+        stream = RowStream(columns)
+        self.put_cell = stream.put_cell
+        self._colmap = stream.colmap
+        oldpos = bk._position
+        try:
+            for _unused in self._read_records(bk):
+                if stream.rows:
+                    for row in stream.rows:
+                        yield row
+                    del stream.rows[:]
+            for row in stream.finish():
+                yield row
+        finally:
+            bk._position = oldpos
+            self.nrows = stream.nrows
+            self.ncols = stream.ncols
+
+    def _read_records(self, bk):
         global rc_stats
         DEBUG = 0
         blah = DEBUG or self.verbosity >= 2
@@ -768,10 +805,12 @@ class Sheet(BaseObject):
         bv = self.biff_version
         fmt_info = self.formatting_info
         do_sst_rich_text = fmt_info and bk._rich_text_runlist_map
+        colmap = self._colmap
         rowinfo_sharing_dict = {}
         txos = {}
         eof_found = 0
         while 1:
+            yield
             # if DEBUG: print "SHEET.READ: about to read from position %d" % bk._position
             rc, data_len, data = bk_get_record_parts()
             # if rc in rc_stats:
@@ -790,7 +829,12 @@ class Sheet(BaseObject):
             elif rc == XL_LABELSST:
                 rowx, colx, xf_index, sstindex = local_unpack('<HHHi', data)
                 # print "LABELSST", rowx, colx, sstindex, bk._sharedstrings[sstindex]
-                self_put_cell(rowx, colx, XL_CELL_TEXT, bk._sharedstrings[sstindex], xf_index)
+                if colmap is not None and colx not in colmap:
+                    # the cell is thrown away, so don't look up (and with
+                    # lazy_shared_strings, decode) its string
+                    self_put_cell(rowx, colx, XL_CELL_TEXT, u'', xf_index)
+                else:
+                    self_put_cell(rowx, colx, XL_CELL_TEXT, bk._sharedstrings[sstindex], xf_index)
                 if do_sst_rich_text:
                     runlist = bk._rich_text_runlist_map.get(sstindex)
                     if runlist:
@@ -1476,7 +1520,6 @@ class Sheet(BaseObject):
         self.tidy_dimensions()
         self.update_cooked_mag_factors()
         bk._position = oldpos
-        return 1
     
     def string_record_contents(self, data):
         bv = self.biff_version
@@ -2255,6 +2298,62 @@ class Cell(BaseObject):
 # You may use a test like "acell is empty_cell".
 empty_cell = Cell(XL_CELL_EMPTY, '')
 
+##
+# Collects the cells of one row at a time for Sheet.iter_read(). Completed
+# rows are appended to the rows attribute, which the caller empties.
+# <br /> -- Added to the copy of xlrd that is bundled with clitools.
+
+class RowStream(object):
+
+    def __init__(self, columns=None):
+        if columns is None:
+            self.colmap = None
+            self.width = 0
+        else:
+            self.colmap = dict([(colx, i) for i, colx in enumerate(columns)])
+            self.width = len(columns)
+        self.rowx = 0
+        self.nrows = 0
+        self.ncols = 0
+        self.values = [''] * self.width
+        self.rows = []
+
+    def put_cell(self, rowx, colx, ctype, value, xf_index):
+        if rowx != self.rowx:
+            if rowx < self.rowx:
+                raise XLRDRowOrderError(
+                    "Cell (%d, %d) is out of row order; it can't be streamed. "
+                    "Load the sheet with sheet_by_index() instead."
+                    % (rowx, colx))
+            self.rows.append(tuple(self.values))
+            for _unused in xrange(self.rowx + 1, rowx):
+                self.rows.append(('',) * self.width)
+            self.rowx = rowx
+            self.values = [''] * self.width
+        self.nrows = rowx + 1
+        if colx >= self.ncols:
+            self.ncols = colx + 1
+        if self.colmap is None:
+            values = self.values
+            nextra = colx + 1 - len(values)
+            if nextra > 0:
+                values.extend([''] * nextra)
+            values[colx] = value
+        else:
+            i = self.colmap.get(colx)
+            if i is not None:
+                self.values[i] = value
+
+    ##
+    # @return A list of the rows that are still pending once all the
+    # records have been read.
+    def finish(self):
+        rows = self.rows
+        self.rows = []
+        if self.nrows:
+            rows.append(tuple(self.values))
+        return rows
+
 ##### =============== Colinfo and Rowinfo ============================== #####
 
 ##
@@ -248,9 +248,15 @@ class XlsDoc:
                                         
 
     def save(self, file_name_or_filelike_obj, stream):
+        self.save_chunks(file_name_or_filelike_obj, len(stream), [stream])
+
+    # Writes the document with the workbook stream given as its total length
+    # and an iterable of strings, which are written to the file one at a time
+    # as they are produced. The full stream never has to be held in memory.
+    def save_chunks(self, file_name_or_filelike_obj, stream_len, chunks):
         # 1. Align stream on 0x1000 boundary (and therefore on sector boundary)
-        padding = '\x00' * (0x1000 - (len(stream) % 0x1000))
-        self.book_stream_len = len(stream) + len(padding)
+        padding = '\x00' * (0x1000 - (stream_len % 0x1000))
+        self.book_stream_len = stream_len + len(padding)
 
         self.__build_directory()
         self.__build_sat()
@@ -260,24 +266,35 @@ class XlsDoc:
         we_own_it = not hasattr(f, 'write')
         if we_own_it:
             f = open(file_name_or_filelike_obj, 'w+b')
-        f.write(self.header)
-        f.write(self.packed_MSAT_1st)
+        try:
+            f.write(self.header)
+            f.write(self.packed_MSAT_1st)
+            written = 0
+            for chunk in chunks:
+                self.__write_chunk(f, chunk)
+                written += len(chunk)
+            if written != stream_len:
+                raise Exception("workbook stream is %d bytes, expected %d"
+                    % (written, stream_len))
+            f.write(padding)
+            f.write(self.packed_MSAT_2nd)
+            f.write(self.packed_SAT)
+            f.write(self.dir_stream)
+        finally:
+            if we_own_it:
+                f.close()
+
+    def __write_chunk(self, f, data):
         # There are reports of large writes failing when writing to "network shares" on Windows.
         # MS says in KB899149 that it happens at 32KB less than 64MB.
         # This is said to be alleviated by using "w+b" mode instead of "wb".
         # One xlwt user has reported anomalous results at much smaller sizes,
         # The fallback is to write the stream in 4 MB chunks.
         try:
-            f.write(stream)
+            f.write(data)
         except IOError, e:
             if e.errno != 22: # "Invalid argument" i.e. 'stream' is too big
                 raise # some other problem
             chunk_size = 4 * 1024 * 1024
-            for offset in xrange(0, len(stream), chunk_size):
-                f.write(buffer(stream, offset, chunk_size))
-        f.write(padding)
-        f.write(self.packed_MSAT_2nd)
-        f.write(self.packed_SAT)
-        f.write(self.dir_stream)
-        if we_own_it:
-            f.close()
+            for offset in xrange(0, len(data), chunk_size):
+                f.write(buffer(data, offset, chunk_size))
@@ -84,11 +84,38 @@ class StyleCollection(object):
         self.default_style = XFStyle()
         self._default_xf = self._add_style(self.default_style)[0]
 
+        # set by freeze()
+        self._frozen = None
+        self._biff_data = None
+
     def add(self, style):
         if style == None:
             return 0x10
+        if self._frozen is not None:
+            try:
+                return self._frozen[style]
+            except KeyError:
+                raise ValueError("style is not in the frozen style collection")
         return self._add_style(style)[1]
 
+    # Adds the styles (and the default_style that is used when a cell is
+    # written without one), and then fixes the collection: add() becomes a
+    # dictionary lookup of the style object, and the FONT, FORMAT, XF and
+    # STYLE records are built once, here. A frozen collection is never
+    # changed again, so it can be shared by any number of workbooks (see
+    # Workbook(styles=...)). Adding a style that wasn't included raises
+    # ValueError.
+    # -- Added to the copy of xlwt that is bundled with clitools.
+    def freeze(self, styles=()):
+        frozen = {}
+        for style in (default_style,) + tuple(styles):
+            frozen[style] = self._add_style(style)[1]
+        self._biff_data = self.get_biff_data()
+        self._frozen = frozen
+
+    def is_frozen(self):
+        return self._frozen is not None
+
     def _add_style(self, style):
         num_format_str = style.num_format_str
         if num_format_str in self._num_formats:
@@ -151,6 +178,11 @@ class StyleCollection(object):
         return xf, xf_index
         
     def add_font(self, font):
+        if self._frozen is not None:
+            try:
+                return self._font_id2x[font]
+            except KeyError:
+                raise ValueError("font is not in the frozen style collection")
         return self._add_font(font)
         
     def _add_font(self, font):
@@ -178,6 +210,8 @@ class StyleCollection(object):
 
 
     def get_biff_data(self):
+        if self._biff_data is not None:
+            return self._biff_data
         result = ''
         result += self._all_fonts()
         result += self._all_num_formats()
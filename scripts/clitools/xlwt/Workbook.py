@@ -48,8 +48,11 @@ class Workbook(object):
     #################################################################
     ## Constructor
     #################################################################
-    def __init__(self, encoding='ascii', style_compression=0):
+    def __init__(self, encoding='ascii', style_compression=0, flush_row_count=0,
+        styles=None):
         self.encoding = encoding
+        # passed on to each new worksheet, see Worksheet.flush_row_count
+        self.flush_row_count = flush_row_count
         self.__owner = 'None'
         self.__country_code = None # 0x07 is Russia :-)
         self.__wnd_protect = 0
@@ -73,7 +76,13 @@ class Workbook(object):
         self.__vscroll_visible = 1
         self.__tabs_visible = 1
 
-        self.__styles = Style.StyleCollection(style_compression)
+        # a frozen Style.StyleCollection can be shared between workbooks,
+        # in which case style_compression is ignored
+        if styles is None:
+            styles = Style.StyleCollection(style_compression)
+        elif not styles.is_frozen():
+            raise ValueError("only a frozen StyleCollection can be shared")
+        self.__styles = styles
 
         self.__dates_1904 = 0
         self.__use_cell_values = 1
@@ -330,7 +339,9 @@ class Workbook(object):
         if lower_name in self.__worksheet_idx_from_name:
             raise Exception("duplicate worksheet name %r" % sheetname)
         self.__worksheet_idx_from_name[lower_name] = len(self.__worksheets)
-        self.__worksheets.append(Worksheet.Worksheet(sheetname, self, cell_overwrite_ok))
+        sheet = Worksheet.Worksheet(sheetname, self, cell_overwrite_ok)
+        sheet.flush_row_count = self.flush_row_count
+        self.__worksheets.append(sheet)
         return self.__worksheets[-1]
 
     def get_sheet(self, sheetnum):
@@ -584,7 +595,10 @@ class Workbook(object):
         #return BIFFRecords.ExtSSTRecord(abs_stream_pos, self.sst_record.str_placement,
         #self.sst_record.portions_len).get()
 
-    def get_biff_data(self):
+    # Returns the workbook globals as a string, a list of (sheet, head, tail)
+    # tuples as returned by Worksheet.get_biff_parts(), and the total length
+    # of the workbook stream.
+    def __get_biff_parts(self):
         before = ''
         before += self.__bof_rec()
         before += self.__intf_hdr_rec()
@@ -622,24 +636,42 @@ class Workbook(object):
         eof = self.__eof_rec()
 
         self.__worksheets[self.__active_sheet].selected = True
-        sheets = ''
+        sheet_parts = []
         sheet_biff_lens = []
         for sheet in self.__worksheets:
-            data = sheet.get_biff_data()
-            sheets += data
-            sheet_biff_lens.append(len(data))
+            head, row_data_len, tail = sheet.get_biff_parts()
+            sheet_parts.append((sheet, head, tail))
+            sheet_biff_lens.append(len(head) + row_data_len + len(tail))
 
         bundlesheets = self.__boundsheets_rec(len(before), len(after)+len(ext_sst)+len(eof), sheet_biff_lens)
 
         sst_stream_pos = len(before) + len(bundlesheets) + len(country)  + len(all_links)
         ext_sst = self.__ext_sst_rec(sst_stream_pos)
 
-        return before + bundlesheets + after + ext_sst + eof + sheets
+        workbook_data = before + bundlesheets + after + ext_sst + eof
+        return workbook_data, sheet_parts, len(workbook_data) + sum(sheet_biff_lens)
+
+    # Yields the workbook stream in pieces: the workbook globals, then the
+    # records of each sheet, with any flushed row data read from the sheet's
+    # row_tempfile in chunks.
+    def __iter_biff_chunks(self, workbook_data, sheet_parts):
+        yield workbook_data
+        for sheet, head, tail in sheet_parts:
+            yield head
+            for data in sheet.iter_row_data():
+                yield data
+            yield tail
+
+    def get_biff_data(self):
+        workbook_data, sheet_parts, stream_len = self.__get_biff_parts()
+        return ''.join(self.__iter_biff_chunks(workbook_data, sheet_parts))
 
     def save(self, filename):
         import CompoundDoc
 
+        workbook_data, sheet_parts, stream_len = self.__get_biff_parts()
         doc = CompoundDoc.XlsDoc()
-        doc.save(filename, self.get_biff_data())
+        doc.save_chunks(filename, stream_len,
+            self.__iter_biff_chunks(workbook_data, sheet_parts))
 
 
@@ -197,6 +197,9 @@ class Worksheet(object):
         self.first_used_col = 255
         self.row_tempfile = None
         self.__flushed_rows = {}
+        # if set, row data is flushed to row_tempfile whenever this many rows
+        # are held and a row past all of them is started
+        self.flush_row_count = 0
         self.__row_visible_levels = 0
 
     #################################################################
@@ -1077,6 +1080,9 @@ class Worksheet(object):
         if indx not in self.__rows:
             if indx in self.__flushed_rows:
                 raise Exception("Attempt to reuse row index %d of sheet %r after flushing" % (indx, self.__name))
+            if self.flush_row_count and len(self.__rows) >= self.flush_row_count \
+                    and indx > self.last_used_row:
+                self.flush_row_data()
             self.__rows[indx] = self.Row(indx, self)
             if indx > self.last_used_row:
                 self.last_used_row = indx
@@ -1232,7 +1238,10 @@ class Worksheet(object):
 
     def __row_blocks_rec(self):
         result = []
-        for row in self.__rows.itervalues():
+        # rows must be written in row order, which dict order isn't once
+        # the row indices outgrow the dict's hash table
+        for rowx in sorted(self.__rows):
+            row = self.__rows[rowx]
             result.append(row.get_row_biff_data())
             result.append(row.get_cells_biff_data())
         return ''.join(result)
@@ -1302,8 +1311,12 @@ class Worksheet(object):
         result += BIFFRecords.PasswordRecord(self.__password).get()
         return result
 
-    def get_biff_data(self):
-        result = [
+    # Returns the sheet's BIFF data in three parts: the records that come
+    # before the row data, the length of the row data that has been flushed
+    # to row_tempfile (see iter_row_data), and the records after it, which
+    # include any rows that have not been flushed.
+    def get_biff_parts(self):
+        head = ''.join([
             self.__bof_rec(),
             self.__calc_settings_rec(),
             self.__guts_rec(),
@@ -1313,17 +1326,13 @@ class Worksheet(object):
             self.__dimensions_rec(),
             self.__print_settings_rec(),
             self.__protection_rec(),
-            ]
+            ])
+        row_data_len = 0
         if self.row_tempfile:
             self.row_tempfile.flush()
-            self.row_tempfile.seek(0)
-            result.append(self.row_tempfile.read())
-            self.row_tempfile.seek(0, 2) # to EOF
-            # Above seek() is necessary to avoid a spurious IOError
-            # with Errno 0 if the caller continues on writing rows
-            # and flushing row data after the save().
-            # See http://bugs.python.org/issue3207
-        result.extend([
+            self.row_tempfile.seek(0, 2)
+            row_data_len = self.row_tempfile.tell()
+        tail = ''.join([
             self.__row_blocks_rec(),
             self.__merged_rec(),
             self.__bitmaps_rec(),
@@ -1331,7 +1340,30 @@ class Worksheet(object):
             self.__panes_rec(),
             self.__eof_rec(),
             ])
-        return ''.join(result)
+        return head, row_data_len, tail
+
+    # Yields the row data that has been flushed to row_tempfile, in chunks.
+    def iter_row_data(self, chunk_size=1024*1024):
+        if not self.row_tempfile:
+            return
+        self.row_tempfile.flush()
+        self.row_tempfile.seek(0)
+        try:
+            while 1:
+                data = self.row_tempfile.read(chunk_size)
+                if not data:
+                    break
+                yield data
+        finally:
+            self.row_tempfile.seek(0, 2) # to EOF
+            # Above seek() is necessary to avoid a spurious IOError
+            # with Errno 0 if the caller continues on writing rows
+            # and flushing row data after the save().
+            # See http://bugs.python.org/issue3207
+
+    def get_biff_data(self):
+        head, row_data_len, tail = self.get_biff_parts()
+        return ''.join([head] + list(self.iter_row_data()) + [tail])
 
     def flush_row_data(self):
         if self.row_tempfile is None:
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# compares peak memory of writing a 65k row sheet in the default mode, where
+# every row is held until save(), and with flush_row_count, where rows are
+# flushed to a temp file as they are completed and the file is written in
+# chunks. each mode is run in its own process so their peaks are separate.
+# peak memory is only reported where the resource module exists (not Windows).
+
+import os
+import sys
+import subprocess
+from time import time
+
+import xlwt
+
+rowcount = 65535
+colcount = 10
+
+def fill(mode):
+    if mode == "stream":
+        wb = xlwt.Workbook(flush_row_count=1000)
+    else:
+        wb = xlwt.Workbook()
+    ws = wb.add_sheet('0')
+    for row in xrange(rowcount):
+        ws.write(row, 0, "BIG(%d)" % row)
+        for col in xrange(1, colcount):
+            ws.write(row, col, row * col)
+    wb.save('big-%s.xls' % mode)
+
+def peak_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+if len(sys.argv) > 1:
+    t0 = time()
+    fill(sys.argv[1])
+    peak = peak_mb()
+    print "%-8s %6.2f s  %s" % (sys.argv[1], time() - t0,
+        "peak %.1f Mb" % peak if peak is not None else "")
+else:
+    print "%d rows x %d columns" % (rowcount, colcount)
+    for mode in ("default", "stream"):
+        subprocess.check_call([sys.executable, os.path.abspath(__file__), mode])
+    print "file sizes: %d, %d bytes" % (os.path.getsize('big-default.xls'),
+        os.path.getsize('big-stream.xls'))